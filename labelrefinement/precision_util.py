@@ -1,12 +1,23 @@
 from pm4py.algo.discovery.inductive import algorithm as inductive_miner
 from pm4py.evaluation.precision import evaluator as precision_evaluator
+from pm4py.evaluation.precision import utils as precision_utils
+from pm4py.evaluation.precision.parameters import Parameters as PrecisionParameters
+from pm4py.evaluation.precision.variants import align_etconformance
 from pm4py.visualization.petrinet import visualizer as pn_visualizer
 import pm4py
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil
 from time import time
 from pm4py.objects.log.exporter.xes import exporter as xes_exporter
+from pm4py.objects.petri_net.utils import check_soundness
+from pm4py.objects.petri_net.utils.align_utils import get_visible_transitions_eventually_enabled_by_marking
 from pm4py.evaluation.generalization import evaluator as generalization_evaluator
 from pm4py.evaluation.simplicity import evaluator as simplicity_evaluator
 
+# number of chunks of prefixes per worker, more chunks balance the different alignment costs of the prefixes
+CHUNKS_PER_WORKER = 4
+
 
 def get_precision(ref_log, event_log, imprecise_labels, graph_parameters):
     # for case_id, case in enumerate(ref_log):
@@ -40,8 +51,8 @@ def get_precision(ref_log, event_log, imprecise_labels, graph_parameters):
     # prec = precision_evaluator.apply(event_log, net, initial_marking, final_marking, variant=precision_evaluator.Variants.ETCONFORMANCE_TOKEN)
     time1 = time()
     # print("moin1: ")
-    prec = precision_evaluator.apply(event_log, net, initial_marking, final_marking,
-                                     variant=precision_evaluator.Variants.ALIGN_ETCONFORMANCE)
+    prec = get_align_precision(event_log, net, initial_marking, final_marking,
+                               number_of_workers=graph_parameters.get("NUMBER_OF_WORKERS", 1))
     generalization = generalization_evaluator.apply(event_log, net, initial_marking, final_marking)
     simplicity = simplicity_evaluator.apply(net)
 
@@ -77,8 +88,8 @@ def get_precision_of_original_model(net, initial_marking, final_marking, event_l
 
     generalization = generalization_evaluator.apply(event_log, net, initial_marking, final_marking)
     simplicity = simplicity_evaluator.apply(net)
-    prec = precision_evaluator.apply(event_log, net, initial_marking, final_marking,
-                                     variant=precision_evaluator.Variants.ALIGN_ETCONFORMANCE)
+    prec = get_align_precision(event_log, net, initial_marking, final_marking,
+                               number_of_workers=graph_parameters.get("NUMBER_OF_WORKERS", 1))
     return prec, simplicity, generalization
 
 
@@ -91,9 +102,83 @@ def get_precision_of_precice_log(original_event_log, event_log, imprecise_labels
         if transition.label != None and transition.label in original_labels:
             transition.label = imprecise_labels[0]  # todo rework so that original_labels becomes dictionary
 
-    prec = precision_evaluator.apply(event_log, net, initial_marking, final_marking,
-                                     variant=precision_evaluator.Variants.ALIGN_ETCONFORMANCE)
+    prec = get_align_precision(event_log, net, initial_marking, final_marking,
+                               number_of_workers=graph_parameters.get("NUMBER_OF_WORKERS", 1))
 
     generalization = generalization_evaluator.apply(event_log, net, initial_marking, final_marking)
     simplicity = simplicity_evaluator.apply(net)
     return prec,  simplicity, generalization
+
+
+def get_align_precision(event_log, net, initial_marking, final_marking, number_of_workers=1):
+    # Align-ETConformance precision, as precision_evaluator with ALIGN_ETCONFORMANCE.
+    # The prefixes are collected once per variant and weighted with the number of cases of the variant.
+    # With number_of_workers > 1 the prefixes are aligned in a process pool, each worker gets the net and markings once.
+    # align_fake_log_stop_marking and transform_markings_from_sync_to_original_net are internal helpers of pm4py's
+    # align_etconformance variant, not a stable API. They are used as in the pinned pm4py version, see
+    # tests/test_precision_util.py, which checks the result against precision_evaluator with ALIGN_ETCONFORMANCE.
+    if not check_soundness.check_easy_soundness_net_in_fin_marking(net, initial_marking, final_marking):
+        raise Exception("trying to apply Align-ETConformance on a Petri net that is not a easy sound net!!")
+
+    variants = Counter(tuple(event["concept:name"] for event in trace) for trace in event_log)
+    prefixes = {}
+    prefix_count = Counter()
+    start_activities = set()
+    for variant, count in variants.items():
+        if variant:
+            start_activities.add(variant[0])
+        for i in range(1, len(variant)):
+            prefix = ",".join(variant[0:i])
+            prefixes.setdefault(prefix, set()).add(variant[i])
+            prefix_count[prefix] += count
+    prefixes_keys = list(prefixes.keys())
+    fake_log = precision_utils.form_fake_log(prefixes_keys)
+
+    if number_of_workers > 1 and len(fake_log) > 1:
+        chunk_size = ceil(len(fake_log) / (number_of_workers * CHUNKS_PER_WORKER))
+        chunks = [fake_log[start:start + chunk_size] for start in range(0, len(fake_log), chunk_size)]
+        align_stop_marking = []
+        with ProcessPoolExecutor(max_workers=number_of_workers, initializer=_init_alignment_worker,
+                                 initargs=(net, initial_marking, final_marking)) as executor:
+            for chunk_stop_marking in executor.map(_align_prefixes_in_worker, chunks):
+                align_stop_marking.extend(chunk_stop_marking)
+    else:
+        align_stop_marking = align_etconformance.align_fake_log_stop_marking(
+            fake_log, net, initial_marking, final_marking, parameters={PrecisionParameters.SHOW_PROGRESS_BAR: False})
+    # the stop markings are expressed with place names, so they are mapped to the places of this net
+    all_markings = align_etconformance.transform_markings_from_sync_to_original_net(align_stop_marking, net)
+
+    sum_ee = 0
+    sum_at = 0
+    for prefix, markings in zip(prefixes_keys, all_markings):
+        if markings is not None:
+            activated_transitions_labels = set()
+            for marking in markings:
+                activated_transitions_labels = activated_transitions_labels.union(
+                    x.label for x in get_visible_transitions_eventually_enabled_by_marking(net, marking)
+                    if x.label is not None)
+            escaping_edges = activated_transitions_labels.difference(prefixes[prefix])
+            sum_at += len(activated_transitions_labels) * prefix_count[prefix]
+            sum_ee += len(escaping_edges) * prefix_count[prefix]
+
+    # the empty prefix is counted once per case
+    trans_en_ini_marking = set([x.label for x in get_visible_transitions_eventually_enabled_by_marking(net, initial_marking)])
+    sum_at += len(event_log) * len(trans_en_ini_marking)
+    sum_ee += len(event_log) * len(trans_en_ini_marking.difference(start_activities))
+
+    if sum_at > 0:
+        return 1 - float(sum_ee) / float(sum_at)
+    return 1.0
+
+
+_alignment_worker_state = {}
+
+
+def _init_alignment_worker(net, initial_marking, final_marking):
+    _alignment_worker_state["model"] = (net, initial_marking, final_marking)
+
+
+def _align_prefixes_in_worker(chunk):
+    net, initial_marking, final_marking = _alignment_worker_state["model"]
+    return align_etconformance.align_fake_log_stop_marking(chunk, net, initial_marking, final_marking, parameters={
+        PrecisionParameters.SHOW_PROGRESS_BAR: False})
@@ -6,18 +6,25 @@ from pathlib import Path
 from time import time
 
 from pm4py.objects.conversion.process_tree import converter as pt_converter
-from pm4py.objects.log.importer.xes import importer as xes_import_factory
 from pm4py.objects.process_tree.importer import importer as ptml_importer
 from pm4py.algo.discovery.inductive import algorithm as inductive_miner
 
 
 import test_epoch
 
+# The log registry and columnar log are shared with pm-label-splitting instead of keeping a copy of the modules
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'pm-label-splitting'))
+from utils.columnar_log import COLUMNAR_CACHE_SUFFIX
+from utils.log_registry import LogRegistry
+
 log_size_parameter = int(sys.argv[1])
 # number_of_cores = int(sys.argv[2])
 batch_size_parameter = int(sys.argv[2])  # max 610
 experiment_nr_parameter = int(sys.argv[3])  # max 610
 start_data_set_size_parameter = int(sys.argv[4])  # max 610
+# 1 loads the logs from a columnar cache next to the log files, which only keeps the activity, original label,
+# timestamp and case id, by default the logs are imported with all attributes
+use_columnar_cache_parameter = len(sys.argv) > 5 and bool(int(sys.argv[5]))
 
 
 # end_data_set_size_parameter = int(sys.argv[4])  # max 610
@@ -33,6 +40,8 @@ def main():
         log_folder_list = os.listdir(os.path.join(directory, folder_name, "logs"))
 
         for file_name in log_folder_list:
+            if file_name.endswith(COLUMNAR_CACHE_SUFFIX):
+                continue
             setting_id = '_'.join(file_name.split("_")[:2])
             if setting_id not in setting_ids:
                 setting_ids.append((setting_id, folder_name))
@@ -44,6 +53,8 @@ def main():
         log_folder_list = os.listdir(os.path.join(directory, folder_name, "logs"))
         model_folder_list = os.listdir(os.path.join(directory, folder_name, "models"))
         for log_file_name in log_folder_list:
+            if log_file_name.endswith(COLUMNAR_CACHE_SUFFIX):
+                continue
             setting = ('_'.join(log_file_name.split("_")[:2]), folder_name)
             data[setting]["setting"] = setting  # TODO change data dictionary to list
             if "LogR" in log_file_name:
@@ -173,14 +184,12 @@ def inside_function(paths):
     if "event_log_path" in paths.keys() and "original_log_path" in paths.keys():
         print('in if')
         # print("setting: ", setting)
-        event_log = xes_import_factory.apply(paths["event_log_path"], parameters={
-            xes_import_factory.Variants.ITERPARSE.value.Parameters.MAX_TRACES: log_size})
+        log_registry = LogRegistry(log_size, use_columnar_cache_parameter)
+        event_log = log_registry.get_log(paths["event_log_path"])
 
-        xixi_log = xes_import_factory.apply(paths["xixi_log_path"], parameters={
-            xes_import_factory.Variants.ITERPARSE.value.Parameters.MAX_TRACES: log_size}) if 'xixi_log_path' in paths.keys() and paths['xixi_log_path'] else None
+        xixi_log = log_registry.get_log(paths["xixi_log_path"]) if 'xixi_log_path' in paths.keys() and paths['xixi_log_path'] else None
         print(paths["original_log_path"])
-        original_event_log = xes_import_factory.apply(paths["original_log_path"], parameters={
-            xes_import_factory.Variants.ITERPARSE.value.Parameters.MAX_TRACES: log_size})
+        original_event_log = log_registry.get_log(paths["original_log_path"])
 
         if 'model_path' in paths.keys() and paths['model_path']:
             original_tree = ptml_importer.apply(paths["model_path"])
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules of labelrefinement are imported from its folder, as in test_main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
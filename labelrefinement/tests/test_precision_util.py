@@ -0,0 +1,50 @@
+import random
+
+import pytest
+from pm4py.algo.discovery.inductive import algorithm as inductive_miner
+from pm4py.evaluation.precision import evaluator as precision_evaluator
+from pm4py.objects.log.obj import Event, EventLog, Trace
+from pm4py.objects.petri_net.obj import Marking, PetriNet
+from pm4py.objects.petri_net.utils import petri_utils
+
+from precision_util import get_align_precision
+
+
+def get_log(seed, number_of_traces=40):
+    generator = random.Random(seed)
+    prototypes = [[generator.choice('ABCDX') for _ in range(generator.randint(1, 6))] for _ in range(6)]
+    log = EventLog()
+    for case_index in range(number_of_traces):
+        trace = Trace(attributes={'concept:name': str(case_index)})
+        for label in generator.choice(prototypes):
+            trace.append(Event({'concept:name': label}))
+        log.append(trace)
+    return log
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+@pytest.mark.parametrize('number_of_workers', [1, 2])
+def test_align_precision_equals_pm4py(seed, number_of_workers):
+    log = get_log(seed)
+    # A model of another log, so that some prefixes do not fit
+    for model_log in [log, get_log(seed + 10)]:
+        net, initial_marking, final_marking = inductive_miner.apply(model_log)
+
+        precision = get_align_precision(log, net, initial_marking, final_marking, number_of_workers=number_of_workers)
+
+        assert precision == precision_evaluator.apply(
+            log, net, initial_marking, final_marking, variant=precision_evaluator.Variants.ALIGN_ETCONFORMANCE)
+
+
+def test_align_precision_of_unsound_net():
+    net = PetriNet('unsound')
+    source, sink, leftover = PetriNet.Place('source'), PetriNet.Place('sink'), PetriNet.Place('leftover')
+    transition = PetriNet.Transition('A', 'A')
+    net.places.update([source, sink, leftover])
+    net.transitions.add(transition)
+    petri_utils.add_arc_from_to(source, transition, net)
+    petri_utils.add_arc_from_to(transition, sink, net)
+    petri_utils.add_arc_from_to(transition, leftover, net)
+
+    with pytest.raises(Exception):
+        get_align_precision(get_log(1), net, Marking({source: 1}), Marking({sink: 1}))
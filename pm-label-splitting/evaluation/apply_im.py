@@ -1,16 +1,22 @@
+import copy
 import os
 from typing import TextIO, Dict, List
 
+from igraph import Clustering
 from pm4py.algo.discovery.inductive import algorithm as inductive_miner
 from pm4py.objects.log.obj import EventLog
 
+from evaluation.model_cache import ModelCache, get_log_key
 from evaluation.performance_evaluator import PerformanceEvaluator
 from pipeline.pipeline_helpers import get_clustering_from_xixi_log, filter_duplicate_xor
 from pipeline.post_processor import PostProcessor
-from utils.file_writer_helper import write_exception, export_models_and_pngs
-from pm4py.objects.log.importer.xes import importer as xes_importer
+from utils.file_writer_helper import write_exception, export_models_and_pngs, read_exported_models, \
+    restore_exported_models
 
 from utils.input_data import InputData
+from utils.log_registry import get_log
+from utils.result_sink import ResultSink
+from utils.variant_index import VariantIndex, get_variant_index
 
 
 def apply_im_without_noise_and_export(input_name: str, suffix: str, split_log: EventLog, original_log: EventLog,
@@ -34,11 +40,26 @@ def apply_im_without_noise_and_export(input_name: str, suffix: str, split_log: E
 
 
 def apply_im_without_noise_and_evaluate(labels_to_original: Dict[str, str], split_log: EventLog, original_log: EventLog,
-                                        outfile: TextIO, short_labels_to_original_labels: Dict[str, str] = None):
+                                        outfile: TextIO, short_labels_to_original_labels: Dict[str, str] = None,
+                                        model_cache: ModelCache = None, variant_index: VariantIndex = None,
+                                        number_of_workers: int = 1):
     """
     Applies the Inductive Miner without noise threshold and evaluates the result.
+    With a model cache, a split log with the same variants as an earlier one is neither mined nor evaluated again.
+    The variant index of the original log, if given, is reused for the evaluation.
+    With number_of_workers > 1 the variants are replayed in a process pool.
     """
-    net, initial_marking, final_marking = inductive_miner.apply(split_log)
+    if model_cache is not None:
+        log_key = get_log_key(split_log)
+        evaluation_key = (log_key, tuple(sorted(set(labels_to_original.values()))),
+                          tuple(sorted((short_labels_to_original_labels or {}).items())))
+        evaluation = model_cache.get_evaluation(evaluation_key)
+        if evaluation is not None:
+            outfile.write('Model and performance of the split log loaded from cache\n')
+            return evaluation
+        net, initial_marking, final_marking = model_cache.get_petri_net(split_log, log_key)
+    else:
+        net, initial_marking, final_marking = inductive_miner.apply(split_log)
     post_processor = PostProcessor(labels_to_original, short_labels_to_original_labels)
     final_net = post_processor.post_process_petri_net(net)
 
@@ -47,12 +68,17 @@ def apply_im_without_noise_and_evaluate(labels_to_original: Dict[str, str], spli
                                                  final_marking,
                                                  original_log,
                                                  outfile,
-                                                 skip_fitness=True)
+                                                 skip_fitness=True,
+                                                 variant_index=variant_index,
+                                                 number_of_workers=number_of_workers)
     performance_evaluator.evaluate_performance()
 
     final_net = post_processor.rename_short_labels_to_original_labels(final_net)
-    return final_marking, initial_marking, final_net, performance_evaluator.precision, \
-           performance_evaluator.simplicity, performance_evaluator.generalization, performance_evaluator.fitness
+    evaluation = (final_marking, initial_marking, final_net, performance_evaluator.precision,
+                  performance_evaluator.simplicity, performance_evaluator.generalization, performance_evaluator.fitness)
+    if model_cache is not None:
+        model_cache.set_evaluation(evaluation_key, evaluation)
+    return evaluation
 
 
 def apply_im_with_noise_and_export(input_name: str, suffix: str, split_log: EventLog, original_log: EventLog,
@@ -63,6 +89,7 @@ def apply_im_with_noise_and_export(input_name: str, suffix: str, split_log: Even
     The mined models are evaluated and results and models exported.
     """
     f1_scores = []
+    variant_index = get_variant_index(original_log)
     for noise_threshold in [0, 0.1, 0.2, 0.3, 0.4]:
         outfile.write(f'\nnoise_threshold: {noise_threshold}\n')
 
@@ -80,7 +107,7 @@ def apply_im_with_noise_and_export(input_name: str, suffix: str, split_log: Even
         final_net = post_processor.post_process_petri_net(net)
 
         performance_evaluator = PerformanceEvaluator(final_net, initial_marking, final_marking, original_log,
-                                                     outfile)
+                                                     outfile, variant_index=variant_index)
 
         performance_evaluator.evaluate_performance()
 
@@ -99,42 +126,65 @@ def get_f1_score(precision: float, recall: float) -> float:
 
 
 def write_data_from_original_log_with_imprecise_labels(input_name: str, original_log: EventLog,
+                                                       result_sink: ResultSink,
                                                        use_noise: bool = True) -> List[float]:
-    print(f'./outputs/{input_name}.txt')
-    with open(f'./outputs/{input_name}.txt', 'a') as outfile:
-        outfile.write('\nOriginal Data Performance:\n')
-        f1_scores = apply_im_with_noise_and_export(input_name, 'original_log_imprecise_labels', original_log,
-                                                   original_log,
-                                                   outfile) if use_noise else []
-        apply_im_without_noise_and_export(input_name, 'original_log_imprecise_labels', original_log, original_log,
-                                          outfile)
+    """
+    Writes the performance of the original log to the text output of the result sink, in order with its other output
+    """
+    outfile = result_sink.outfile
+    outfile.write('\nOriginal Data Performance:\n')
+    f1_scores = apply_im_with_noise_and_export(input_name, 'original_log_imprecise_labels', original_log,
+                                               original_log,
+                                               outfile) if use_noise else []
+    apply_im_without_noise_and_export(input_name, 'original_log_imprecise_labels', original_log, original_log,
+                                      outfile)
     return f1_scores
 
 
 def get_xixi_metrics(labels_to_split, input_data: InputData):
-    with open(f'./outputs/{input_data.input_name}.txt', 'a') as outfile:
-        original_log = xes_importer.apply(input_data.log_path)
-        xixi_refined_log_path = input_data.log_path.replace('LogD', 'LogR', 1)
-        if not os.path.isfile(xixi_refined_log_path):
-            xixi_refined_log_path = xixi_refined_log_path.replace('LogR', 'LogR_IM', 1)
+    """
+    Evaluates the model of the log refined by Xixi's approach.
+    With the baseline cache of the input data, precision and clustering are loaded if the logs did not change since
+    the last run, and the exported model files are written again from the cache.
+    """
+    xixi_refined_log_path = input_data.log_path.replace('LogD', 'LogR', 1)
+    if not os.path.isfile(xixi_refined_log_path):
+        xixi_refined_log_path = xixi_refined_log_path.replace('LogR', 'LogR_IM', 1)
+    log_paths = [input_data.log_path, xixi_refined_log_path]
+    parameters = [input_data.input_name, labels_to_split, input_data.pipeline_variant]
+
+    outfile = input_data.result_sink.outfile
+    cached = input_data.baseline_cache.get('xixi', log_paths, parameters)
+    if cached is not None:
+        precision, membership, exported_models = cached
+        restore_exported_models(exported_models)
+        outfile.write('\n Xixi refined log results loaded from baseline cache:\n')
+        outfile.write('precision\n')
+        outfile.write(f'{precision}\n')
+        outfile.write('\n Xixi clustering:\n')
+        outfile.write(f'{str(Clustering(membership))}\n')
+        return precision, Clustering(membership)
 
-        log = xes_importer.apply(xixi_refined_log_path)
+    original_log = get_log(input_data.log_path, input_data.log_registry)
+    # The log of the registry is shared, so the duplicate XOR labels are merged in a copy
+    log = copy.deepcopy(get_log(xixi_refined_log_path, input_data.log_registry))
 
-        clustering = get_clustering_from_xixi_log(log, labels_to_split, outfile, input_data)
-        clustering = filter_duplicate_xor(log, labels_to_split, clustering)
+    clustering = get_clustering_from_xixi_log(log, labels_to_split, outfile, input_data)
+    clustering = filter_duplicate_xor(log, labels_to_split, clustering)
 
-        labels_to_original = {}
+    labels_to_original = {}
 
-        for label in labels_to_split:
-            labels_to_original[label] = label
+    for label in labels_to_split:
+        labels_to_original[label] = label
 
-        outfile.write('\n Xixi refined log results:\n')
-        precision, final_net, initial_marking, final_marking = apply_im_without_noise_and_export(input_data.input_name, 'xixi',
-                                                                                                 log, original_log,
-                                                                                                 outfile,
-                                                                                                 labels_to_original=labels_to_original)
+    outfile.write('\n Xixi refined log results:\n')
+    precision, final_net, initial_marking, final_marking = apply_im_without_noise_and_export(input_data.input_name, 'xixi',
+                                                                                             log, original_log,
+                                                                                             outfile,
+                                                                                             labels_to_original=labels_to_original)
 
-        outfile.write('\n Xixi clustering:\n')
-        outfile.write(f'{str(clustering)}\n')
+    outfile.write('\n Xixi clustering:\n')
+    outfile.write(f'{str(clustering)}\n')
+    input_data.baseline_cache.set('xixi', log_paths, parameters, (precision, clustering.membership,
+                                                                   read_exported_models('xixi')))
     return precision, clustering
-
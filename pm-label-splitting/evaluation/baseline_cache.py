@@ -0,0 +1,62 @@
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+from typing import Iterable, Optional
+
+import pm4py
+
+DEFAULT_BASELINE_CACHE_FOLDER = './outputs/baseline_cache'
+# Part of every key, increment it when the computation or the format of a cached result changes
+BASELINE_CACHE_VERSION = 2
+
+
+class BaselineCache:
+    """
+    Persistent cache of the baseline results of an input, i.e., golden standard model, Xixi metrics, model of the log
+    with precise labels and performance of the unrefined log. These do not depend on the parameters of the pipeline,
+    so reruns and resumed sweeps load them instead of mining and evaluating the models again.
+    Entries are keyed by the path, modification time and size of every log file they were computed from, a changed
+    log invalidates them, and by BASELINE_CACHE_VERSION and the pm4py version, so results of older code are not
+    served. Each entry is a pickle file, written atomically, so parallel workers can share the folder.
+    Without a cache folder, the default, nothing is cached.
+    """
+
+    def __init__(self, cache_folder: Optional[str] = None):
+        self.cache_folder = cache_folder
+
+    def get(self, name: str, log_paths: Iterable[str], parameters=None):
+        """
+        :return: Cached result, None if there is no result for the current state of the log files
+        """
+        entry_path = self._get_entry_path(name, log_paths, parameters)
+        if entry_path is None or not os.path.isfile(entry_path):
+            return None
+        try:
+            with open(entry_path, 'rb') as entry_file:
+                return pickle.load(entry_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, name: str, log_paths: Iterable[str], parameters, result) -> None:
+        entry_path = self._get_entry_path(name, log_paths, parameters)
+        if entry_path is None:
+            return
+        Path(self.cache_folder).mkdir(parents=True, exist_ok=True)
+        temporary_path = f'{entry_path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'wb') as entry_file:
+            pickle.dump(result, entry_file)
+        os.replace(temporary_path, entry_path)
+
+    def _get_entry_path(self, name: str, log_paths: Iterable[str], parameters):
+        if self.cache_folder is None:
+            return None
+        log_signatures = []
+        for log_path in log_paths:
+            if not os.path.isfile(log_path):
+                return None
+            stat = os.stat(log_path)
+            log_signatures.append([os.path.abspath(log_path), stat.st_mtime_ns, stat.st_size])
+        key = json.dumps([BASELINE_CACHE_VERSION, pm4py.__version__, name, log_signatures, parameters], default=str)
+        return os.path.join(self.cache_folder, f'{name}_{hashlib.sha256(key.encode()).hexdigest()}.pkl')
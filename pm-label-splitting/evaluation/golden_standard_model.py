@@ -1,11 +1,14 @@
+import json
 import re
+from typing import TextIO
 
 from pm4py.algo.discovery.inductive import algorithm as inductive_miner
 from pm4py.algo.filtering.log.attributes import attributes_filter
-from pm4py.objects.log.importer.xes import importer as xes_importer
 
+from evaluation.baseline_cache import BaselineCache
 from evaluation.performance_evaluator import PerformanceEvaluator
-from utils.file_writer_helper import export_models_and_pngs
+from utils.file_writer_helper import export_models_and_pngs, read_exported_models, restore_exported_models
+from utils.log_registry import LogRegistry, get_log
 from pipeline.pipeline_variant import remove_pipeline_variant_from_string
 
 
@@ -14,44 +17,66 @@ class GoldenStandardModel:
     Representation of the golden standard, i.e., the event log with precise labels, before label modification
     """
 
-    def __init__(self, input_name: str, original_input_name: str, path: str, labels_to_split):
+    def __init__(self, input_name: str, original_input_name: str, path: str, labels_to_split,
+                 baseline_cache: BaselineCache = None, log_registry: LogRegistry = None):
         self._input_name = input_name
         self._path = path
         self._labels_to_split = labels_to_split
         self._input_identifier = original_input_name if original_input_name != '' \
             else get_input_identifier_from_variant_input_name(self._input_name)
-        self._imprecise_log = xes_importer.apply(self._path)
+        self._baseline_cache = baseline_cache
+        self._log_registry = log_registry
+        self._imprecise_log = None
         self.net = None
         self.im = None
         self.fm = None
 
-    def evaluate_golden_standard_model(self):
+    def evaluate_golden_standard_model(self, outfile: TextIO):
         """
-        Gets the path to the precise event log, generates the golden standard model and evaluates it
+        Gets the path to the precise event log, generates the golden standard model and evaluates it.
+        With a baseline cache, the model and precision are loaded if the logs did not change since the last run, and
+        the exported model files are written again from the cache.
 
         :return: Precision of the golden standard model
         """
-        with open(f'./outputs/{self._input_name}.txt', 'a') as outfile:
-            outfile.write('\n Performance of golden standard model:\n')
-            log = get_log_from_input_identifier(self._input_identifier, path=self._path)
-
-            imprecise_labels = attributes_filter.get_attribute_values(self._imprecise_log, 'concept:name')
-
-            net, initial_marking, final_marking = inductive_miner.apply(log)
-
-            rename_transitions_to_original_label(imprecise_labels, net, self._labels_to_split)
-
-            self.net = net
-            self.im = initial_marking
-            self.fm = final_marking
-            performance_evaluator = PerformanceEvaluator(net, initial_marking, final_marking, self._imprecise_log,
-                                                         outfile, skip_fitness=True)
-            performance_evaluator.evaluate_performance()
-
-            original_tree = inductive_miner.apply_tree(log)
-            export_models_and_pngs(final_marking, initial_marking, net, original_tree, self._input_name,
-                                   'no_noise_golden')
-
+        log_paths = [self._path, get_precise_log_path(self._input_identifier, self._path)]
+        parameters = [self._input_name, self._labels_to_split]
+        outfile.write('\n Performance of golden standard model:\n')
+        if self._baseline_cache is not None:
+            cached = self._baseline_cache.get('golden_standard', log_paths, parameters)
+            if cached is not None:
+                self.net, self.im, self.fm, precision, exported_models = cached
+                restore_exported_models(exported_models)
+                outfile.write('Loaded from baseline cache\n')
+                outfile.write('precision\n')
+                outfile.write(f'{json.dumps(precision)}\n')
+                return precision
+
+        self._imprecise_log = get_log(self._path, self._log_registry)
+        log = get_log_from_input_identifier(self._input_identifier, path=self._path,
+                                            log_registry=self._log_registry)
+
+        imprecise_labels = attributes_filter.get_attribute_values(self._imprecise_log, 'concept:name')
+
+        net, initial_marking, final_marking = inductive_miner.apply(log)
+
+        rename_transitions_to_original_label(imprecise_labels, net, self._labels_to_split)
+
+        self.net = net
+        self.im = initial_marking
+        self.fm = final_marking
+        performance_evaluator = PerformanceEvaluator(net, initial_marking, final_marking, self._imprecise_log,
+                                                     outfile, skip_fitness=True)
+        performance_evaluator.evaluate_performance()
+
+        original_tree = inductive_miner.apply_tree(log)
+        export_models_and_pngs(final_marking, initial_marking, net, original_tree, self._input_name,
+                               'no_noise_golden')
+
+        if self._baseline_cache is not None:
+            self._baseline_cache.set('golden_standard', log_paths, parameters,
+                                     (self.net, self.im, self.fm, performance_evaluator.precision,
+                                      read_exported_models('no_noise_golden')))
         return performance_evaluator.precision
 
 
@@ -70,8 +95,11 @@ def get_input_identifier_from_variant_input_name(input_name: str):
     return original_input_name
 
 
-def get_log_from_input_identifier(input_identifier, path):
+def get_precise_log_path(input_identifier, path):
     pattern = input_identifier + r'.*'
-    log_path = re.sub(pattern, f'{input_identifier}_Log.xes.gz', path)
-    log = xes_importer.apply(log_path)
+    return re.sub(pattern, f'{input_identifier}_Log.xes.gz', path)
+
+
+def get_log_from_input_identifier(input_identifier, path, log_registry: LogRegistry = None):
+    log = get_log(get_precise_log_path(input_identifier, path), log_registry)
     return log
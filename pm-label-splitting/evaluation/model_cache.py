@@ -0,0 +1,77 @@
+import copy
+import hashlib
+import json
+from multiprocessing.managers import SyncManager
+from typing import Dict, Tuple
+
+from pm4py.algo.discovery.inductive import algorithm as inductive_miner
+from pm4py.objects.log.obj import EventLog
+
+from utils.variant_index import get_variant_index
+
+
+class ModelCache:
+    """
+    Content-addressed cache of the models mined from the split logs of one pipeline run and of their evaluation.
+    Logs are identified by the hash of their variant multiset, so different parameters producing the same split log
+    are mined and evaluated only once.
+    The cached Petri nets are copied on every lookup, as the post-processing renames the transitions in place.
+    The entries are kept in plain dicts, or in dicts of a multiprocessing manager to share them between processes.
+    """
+
+    def __init__(self, petri_nets: Dict[str, Tuple] = None, process_trees: Dict[str, object] = None,
+                 evaluations: Dict[Tuple, Tuple] = None):
+        self._petri_nets = {} if petri_nets is None else petri_nets
+        self._process_trees = {} if process_trees is None else process_trees
+        self._evaluations = {} if evaluations is None else evaluations
+
+    def share(self, manager: SyncManager) -> 'ModelCache':
+        """
+        :return: Cache with the entries of this cache, stored by the manager and shared by all processes it is
+            passed to
+        """
+        return ModelCache(manager.dict(self._petri_nets), manager.dict(self._process_trees),
+                          manager.dict(self._evaluations))
+
+    def update(self, model_cache: 'ModelCache') -> None:
+        """
+        Adds the entries of another cache, e.g., of a shared cache before its manager is shut down
+        """
+        self._petri_nets.update(model_cache._petri_nets.items())
+        self._process_trees.update(model_cache._process_trees.items())
+        self._evaluations.update(model_cache._evaluations.items())
+
+    def get_petri_net(self, log: EventLog, log_key: str = None):
+        """
+        :return: Net, initial marking and final marking mined with the Inductive Miner without noise threshold
+        """
+        if log_key is None:
+            log_key = get_log_key(log)
+        if log_key not in self._petri_nets:
+            self._petri_nets[log_key] = inductive_miner.apply(log)
+        return copy.deepcopy(self._petri_nets[log_key])
+
+    def get_process_tree(self, log: EventLog, log_key: str = None):
+        if log_key is None:
+            log_key = get_log_key(log)
+        if log_key not in self._process_trees:
+            self._process_trees[log_key] = inductive_miner.apply_tree(log)
+        return self._process_trees[log_key]
+
+    def get_evaluation(self, evaluation_key: Tuple):
+        """
+        :return: Cached final marking, initial marking, final net and metrics, None if the model was not evaluated yet
+        """
+        return self._evaluations.get(evaluation_key)
+
+    def set_evaluation(self, evaluation_key: Tuple, evaluation: Tuple) -> None:
+        self._evaluations[evaluation_key] = evaluation
+
+
+def get_log_key(log: EventLog, activity_key: str = 'concept:name') -> str:
+    """
+    :return: Hash of the variants of the log and their counts, independent of the order of the traces
+    """
+    variant_index = get_variant_index(log, activity_key)
+    variants = sorted(zip(variant_index.variants, variant_index.variant_counts.tolist()))
+    return hashlib.sha256(json.dumps(variants).encode()).hexdigest()
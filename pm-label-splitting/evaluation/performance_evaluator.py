@@ -2,20 +2,26 @@ import json
 import string
 from typing import TextIO
 
-from pm4py.algo.evaluation.generalization import evaluator as generalization_evaluator
-from pm4py.algo.evaluation.precision import evaluator as precision_evaluator
-from pm4py.algo.evaluation.replay_fitness import evaluator as replay_fitness_evaluator
 from pm4py.algo.evaluation.simplicity import evaluator as simplicity_evaluator
 
+from evaluation import variant_conformance
+from utils.variant_index import VariantIndex, get_variant_index
+
 
 class PerformanceEvaluator:
     """
     Input: Event Log
     Output: Performance results
     Check quality of a given model, regarding precision, fitness, generalization, simplicity
+    The log is replayed once per variant and fitness and generalization are derived from that replay. Precision is
+    not: ETConformance needs the enabled transitions after every prefix, replayed with other parameters (stop at the
+    first unfit event, no walk to the final marking), so it runs a second replay of the distinct prefixes of the
+    variants. An evaluation therefore needs two replays, not one, and simplicity only needs the net.
+    With number_of_workers > 1 the replays are split across a process pool.
     """
 
-    def __init__(self, net, im, fm, log, outfile: TextIO, skip_fitness=False):
+    def __init__(self, net, im, fm, log, outfile: TextIO, skip_fitness=False, variant_index: VariantIndex = None,
+                 number_of_workers: int = 1):
         self.net = net
         self.im = im
         self.fm = fm
@@ -26,6 +32,10 @@ class PerformanceEvaluator:
         self.generalization = 0
         self.simplicity = 0
         self.skip_fitness = skip_fitness
+        self.variant_index = variant_index
+        self.number_of_workers = number_of_workers
+        self._replayed_variants = None
+
     def _write(self, log_entry: string) -> None:
         self.outfile.write(f'{log_entry}\n')
 
@@ -35,9 +45,21 @@ class PerformanceEvaluator:
         self.get_simplicity()
         self.get_generalization()
 
+    def _get_variant_index(self) -> VariantIndex:
+        if self.variant_index is None:
+            self.variant_index = get_variant_index(self.log)
+        return self.variant_index
+
+    def _get_replayed_variants(self):
+        if self._replayed_variants is None:
+            self._replayed_variants = variant_conformance.replay_variants(self._get_variant_index(),
+                                                                          self.net, self.im, self.fm,
+                                                                          self.number_of_workers)
+        return self._replayed_variants
+
     def get_fitness(self):
-        token_fitness = replay_fitness_evaluator.apply(self.log, self.net, self.im, self.fm,
-                                                       variant=replay_fitness_evaluator.Variants.TOKEN_BASED)
+        token_fitness = variant_conformance.get_token_fitness(self._get_variant_index(),
+                                                              self._get_replayed_variants())
         self._write('token_fitness')
         self._write(json.dumps(token_fitness))
         self.fitness = token_fitness['average_trace_fitness']
@@ -45,15 +67,19 @@ class PerformanceEvaluator:
         return self.fitness
 
     def get_precision(self) -> float:
-        precision = precision_evaluator.apply(self.log, self.net, self.im, self.fm,
-                                              variant=precision_evaluator.Variants.ETCONFORMANCE_TOKEN)
+        """
+        ETConformance precision with its own replay of the prefixes of the variants, not the shared variant replay
+        """
+        precision = variant_conformance.get_etc_precision(self._get_variant_index(), self.net, self.im, self.fm,
+                                                          self.number_of_workers)
         self.precision = precision
         self._write('precision')
         self._write(json.dumps(precision))
         return precision
 
     def get_generalization(self) -> float:
-        generalization = generalization_evaluator.apply(self.log, self.net, self.im, self.fm)
+        generalization = variant_conformance.get_generalization(self._get_variant_index(),
+                                                                self._get_replayed_variants(), self.net)
         self._write('generalization')
         self._write(json.dumps(generalization))
         self.generalization = generalization
@@ -0,0 +1,187 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil, sqrt
+from typing import Dict, List
+
+from pm4py.algo.conformance.tokenreplay import algorithm as token_replay
+from pm4py.algo.conformance.tokenreplay.variants import token_replay as token_replay_variant
+from pm4py.algo.evaluation.precision import utils as precision_utils
+from pm4py.objects.log.obj import EventLog
+from pm4py.objects.petri_net.obj import Marking
+from pm4py.objects.petri_net.utils.align_utils import get_visible_transitions_eventually_enabled_by_marking
+
+from utils.variant_index import VariantIndex
+
+REPLAY_PARAMETERS = {
+    token_replay_variant.Parameters.CONSIDER_REMAINING_IN_FITNESS: True,
+    token_replay_variant.Parameters.SHOW_PROGRESS_BAR: False}
+PREFIX_REPLAY_PARAMETERS = {
+    token_replay_variant.Parameters.CONSIDER_REMAINING_IN_FITNESS: False,
+    token_replay_variant.Parameters.TRY_TO_REACH_FINAL_MARKING_THROUGH_HIDDEN: False,
+    token_replay_variant.Parameters.STOP_IMMEDIATELY_UNFIT: True,
+    token_replay_variant.Parameters.WALK_THROUGH_HIDDEN_TRANS: True,
+    token_replay_variant.Parameters.SHOW_PROGRESS_BAR: False}
+# Number of chunks of traces per worker, more chunks balance the different replay costs of the traces
+CHUNKS_PER_WORKER = 4
+_TRANSITION_FIELDS = ['activated_transitions', 'enabled_transitions_in_marking', 'transitions_with_problems']
+
+
+def get_variant_log(variant_index: VariantIndex) -> EventLog:
+    """
+    :return: Log with the representative trace of every variant, in the order of the variants
+    """
+    return EventLog([trace for trace, _ in variant_index.get_representative_traces()])
+
+
+def replay_variants(variant_index: VariantIndex, net, im, fm, number_of_workers: int = 1) -> List[dict]:
+    """
+    Token-based replay of every variant once, with the parameters of pm4py's token-based fitness and generalization.
+
+    :return: Replay result per variant, in the order of the variants
+    """
+    return replay_log(get_variant_log(variant_index), net, im, fm, REPLAY_PARAMETERS, number_of_workers)
+
+
+def replay_log(log: EventLog, net, im, fm, parameters: dict, number_of_workers: int = 1) -> List[dict]:
+    """
+    Token-based replay of the traces of the log.
+    With number_of_workers > 1 the traces are split into chunks that are replayed in a process pool. The net and
+    markings are passed once to every worker. Transitions and places are sent back as indices and mapped to the
+    objects of this net, as the objects unpickled by the workers are copies.
+
+    :return: Replay result per trace, in the order of the log
+    """
+    if number_of_workers <= 1 or len(log) < 2:
+        return token_replay.apply(log, net, im, fm, parameters=parameters)
+
+    transitions = list(net.transitions)
+    places = list(net.places)
+    chunk_size = ceil(len(log) / (number_of_workers * CHUNKS_PER_WORKER))
+    chunks = [EventLog(log[start:start + chunk_size]) for start in range(0, len(log), chunk_size)]
+    replayed_traces = []
+    with ProcessPoolExecutor(max_workers=number_of_workers,
+                             initializer=_init_replay_worker,
+                             initargs=(net, im, fm, transitions, places, parameters)) as executor:
+        for replayed_chunk in executor.map(_replay_chunk_in_worker, chunks):
+            for replayed in replayed_chunk:
+                for key in _TRANSITION_FIELDS:
+                    replayed[key] = [transitions[transition] for transition in replayed[key]]
+                replayed['reached_marking'] = Marking({places[place]: count
+                                                       for place, count in replayed['reached_marking'].items()})
+                replayed_traces.append(replayed)
+    return replayed_traces
+
+
+_replay_worker_state = {}
+
+
+def _init_replay_worker(net, im, fm, transitions: list, places: list, parameters: dict) -> None:
+    _replay_worker_state['model'] = (net, im, fm)
+    _replay_worker_state['transition_indices'] = {id(transition): i for i, transition in enumerate(transitions)}
+    _replay_worker_state['place_indices'] = {id(place): i for i, place in enumerate(places)}
+    _replay_worker_state['parameters'] = parameters
+
+
+def _replay_chunk_in_worker(chunk: EventLog) -> List[dict]:
+    net, im, fm = _replay_worker_state['model']
+    transition_indices = _replay_worker_state['transition_indices']
+    place_indices = _replay_worker_state['place_indices']
+    replayed_chunk = token_replay.apply(chunk, net, im, fm, parameters=_replay_worker_state['parameters'])
+    for replayed in replayed_chunk:
+        for key in _TRANSITION_FIELDS:
+            replayed[key] = [transition_indices[id(transition)] for transition in replayed[key]]
+        replayed['reached_marking'] = {place_indices[id(place)]: count
+                                       for place, count in replayed['reached_marking'].items()}
+    return replayed_chunk
+
+
+def get_token_fitness(variant_index: VariantIndex, replayed_variants: List[dict]) -> Dict[str, float]:
+    """
+    Token-based fitness as pm4py's TOKEN_BASED replay fitness, from the replay of the variants.
+    The token counts are weighted by the number of cases of the variant. The trace fitness values are summed in
+    case order, so the average trace fitness is the same float as for the replay of the full log.
+    """
+    counts = variant_index.variant_counts.tolist()
+    no_traces = sum(counts)
+    fit_traces = sum(count for replayed, count in zip(replayed_variants, counts) if replayed['trace_is_fit'])
+    variant_fitness = [replayed['trace_fitness'] for replayed in replayed_variants]
+    sum_of_fitness = sum([variant_fitness[variant] for variant in variant_index.case_variants.tolist()])
+    total_m, total_c, total_r, total_p = (
+        sum(replayed[key] * count for replayed, count in zip(replayed_variants, counts))
+        for key in ['missing_tokens', 'consumed_tokens', 'remaining_tokens', 'produced_tokens'])
+
+    perc_fit_traces = 0.0
+    average_fitness = 0.0
+    log_fitness = 0
+    if no_traces > 0 and total_c > 0 and total_p > 0:
+        perc_fit_traces = float(100.0 * fit_traces) / float(no_traces)
+        average_fitness = float(sum_of_fitness) / float(no_traces)
+        log_fitness = 0.5 * (1 - total_m / total_c) + 0.5 * (1 - total_r / total_p)
+    return {'perc_fit_traces': perc_fit_traces, 'average_trace_fitness': average_fitness, 'log_fitness': log_fitness,
+            'percentage_of_fitting_traces': perc_fit_traces}
+
+
+def get_generalization(variant_index: VariantIndex, replayed_variants: List[dict], net) -> float:
+    """
+    Token-based generalization as pm4py's generalization evaluator, from the replay of the variants.
+    The occurrences of the activated transitions are weighted by the number of cases of the variant.
+    """
+    transition_occurrences = Counter()
+    for replayed, count in zip(replayed_variants, variant_index.variant_counts.tolist()):
+        for transition in replayed['activated_transitions']:
+            transition_occurrences[transition] += count
+
+    inverse_square_occurrences = 0.0
+    for transition in transition_occurrences:
+        inverse_square_occurrences = inverse_square_occurrences + 1.0 / sqrt(transition_occurrences[transition])
+    for transition in net.transitions:
+        if transition not in transition_occurrences:
+            inverse_square_occurrences = inverse_square_occurrences + 1
+    if len(net.transitions) > 0:
+        return 1.0 - inverse_square_occurrences / float(len(net.transitions))
+    return 1.0
+
+
+def get_etc_precision(variant_index: VariantIndex, net, im, fm, number_of_workers: int = 1) -> float:
+    """
+    ETConformance precision with token-based replay, as pm4py's ETCONFORMANCE_TOKEN variant.
+    The prefixes are collected from the variants and weighted by the number of cases of the variant,
+    instead of building the prefixes of every case.
+    As pm4py's ETCONFORMANCE_TOKEN, which the evaluation used before, the net is not checked for easy soundness:
+    token-based replay does not need a reachable final marking, and it is the variant pm4py's precision evaluator
+    itself falls back to for nets that are not easy sound. Only the alignment-based variant requires easy soundness.
+    """
+    prefixes = {}
+    prefix_count = Counter()
+    start_activities = set()
+    for trace, count in variant_index.get_representative_traces():
+        activities = [event['concept:name'] for event in trace]
+        if activities:
+            start_activities.add(activities[0])
+        for i in range(1, len(activities)):
+            prefix = ','.join(activities[0:i])
+            prefixes.setdefault(prefix, set()).add(activities[i])
+            prefix_count[prefix] += count
+
+    prefixes_keys = list(prefixes.keys())
+    aligned_traces = replay_log(precision_utils.form_fake_log(prefixes_keys), net, im, fm, PREFIX_REPLAY_PARAMETERS,
+                                number_of_workers)
+
+    # The empty prefix is counted once per case
+    number_of_cases = int(variant_index.variant_counts.sum())
+    transitions_enabled_initially = set(
+        transition.label for transition in get_visible_transitions_eventually_enabled_by_marking(net, im))
+    sum_at = number_of_cases * len(transitions_enabled_initially)
+    sum_ee = number_of_cases * len(transitions_enabled_initially.difference(start_activities))
+
+    for prefix, aligned_trace in zip(prefixes_keys, aligned_traces):
+        if aligned_trace['trace_is_fit']:
+            activated_transitions_labels = set(transition.label for transition in
+                                               aligned_trace['enabled_transitions_in_marking']
+                                               if transition.label is not None)
+            sum_at += len(activated_transitions_labels) * prefix_count[prefix]
+            sum_ee += len(activated_transitions_labels.difference(prefixes[prefix])) * prefix_count[prefix]
+
+    if sum_at > 0:
+        return 1 - float(sum_ee) / float(sum_at)
+    return 1.0
@@ -0,0 +1,441 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from label_splitter.distance_metrics import Distance
+from label_splitter.event_store import EventStore
+
+# Memory used for the distance matrices, including those kept for other labels, and the temporary arrays of one block
+# of pairs, in bytes
+DEFAULT_MEMORY_BUDGET = 2 ** 30
+# Upper estimate of the temporary memory per event pair while building edges, including the Python float of the
+# weight handed to igraph
+_EDGE_BYTES_PER_PAIR = 128
+
+
+class MemoryBudgetExceededError(MemoryError):
+    """
+    Raised before the distance matrices of a label are allocated if they do not fit into the memory budget
+    """
+
+
+@dataclass
+class EncodedContexts:
+    """
+    Context windows of a list of context signatures, encoded as padded integer arrays.
+    Row i of codes holds the symbol ids of the window of signature i, only the first lengths[i] entries are valid.
+    """
+    codes: np.ndarray
+    lengths: np.ndarray
+    number_of_symbols: int
+    # Multiplicity indicators and sizes of all windows per maximum multiplicity, built on first use
+    multiplicity_indicators: Dict[int, Tuple[np.ndarray, np.ndarray]] = field(default_factory=dict)
+
+    def get_multiplicity_indicators(self, max_multiplicity: int) -> Tuple[np.ndarray, np.ndarray]:
+        if max_multiplicity not in self.multiplicity_indicators:
+            self.multiplicity_indicators[max_multiplicity] = _get_multiplicity_indicators(self, slice(None),
+                                                                                          max_multiplicity)
+        return self.multiplicity_indicators[max_multiplicity]
+
+
+@dataclass
+class ContextDistances:
+    """
+    Normalized distances (1 - distance / window_size) between the unique context signatures of the events of one label.
+    Can be reused for every threshold of the same label and distance parameters, or, if pairs were pruned for a
+    threshold, for every larger threshold. Pruned pairs are stored as -inf, so a smaller threshold needs a new
+    calculation of all pairs. The thresholds of a grid cell are run in ascending order, so the distances of a cell
+    are calculated once, for its smallest threshold.
+    """
+    event_signatures: np.ndarray
+    normalized_distances: np.ndarray
+    # Smallest threshold the distances are exact for, None if no pair was pruned
+    threshold: float = None
+
+
+class BatchedDistanceCalculator:
+    """
+    Calculates the (contextual) distances between all pairs of events of one label.
+    Equivalent to DistanceCalculator, but the distances are computed for blocks of event pairs with NumPy
+    instead of one Python call per pair.
+    """
+
+    def __init__(self, window_size: int = 3, use_combined_context=False, distance_variant=Distance.EDIT_DISTANCE,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET):
+        self.window_size = window_size
+        self.use_combined_context = use_combined_context
+        self.distance_variant = distance_variant
+        self.memory_budget = memory_budget
+
+    def get_context_signatures(self, event_store: EventStore, event_indices: np.ndarray,
+                               ignored_activities: np.ndarray = None) -> Tuple[np.ndarray, List[EncodedContexts]]:
+        """
+        Groups the events by their context signature, i.e., the prefix and suffix window used for the distance
+
+        :param ignored_activities: activities left out of the prefixes and suffixes, e.g., concurrent labels
+        :return: Signature id per event and the encoded contexts of the unique signatures,
+            i.e., [prefix, suffix] or [combined context]
+        """
+        prefixes, suffixes = event_store.get_context_windows(event_indices, self.window_size, ignored_activities)
+        signatures, event_signatures = np.unique(np.concatenate((prefixes, suffixes), axis=1), axis=0,
+                                                 return_inverse=True)
+        prefixes = signatures[:, :self.window_size]
+        suffixes = signatures[:, self.window_size:]
+        number_of_symbols = len(event_store.labels)
+
+        if self.use_combined_context:
+            return event_signatures.reshape(-1), [_get_combined_context(prefixes, suffixes, number_of_symbols)]
+        return event_signatures.reshape(-1), [_get_context(prefixes, number_of_symbols),
+                                              _get_context(suffixes, number_of_symbols)]
+
+    def get_distances(self, contexts: List[EncodedContexts], rows: slice, columns: slice,
+                      candidates: np.ndarray = None) -> np.ndarray:
+        """
+        Get the distances between the signatures in rows and the signatures in columns
+
+        :param candidates: boolean matrix of the pairs to score, all other pairs get an infinite distance
+        :return: Matrix of shape (len(rows), len(columns)) with the same values as DistanceCalculator
+        """
+        if not self.uses_edit_distance():
+            distances = self._combine_parts([self._get_part_distances(context, rows, columns) for context in contexts])
+            if candidates is not None:
+                distances[~candidates] = np.inf
+            return distances
+        return self._get_candidate_edit_distances(contexts, rows, columns, candidates)
+
+    def _get_candidate_edit_distances(self, contexts: List[EncodedContexts], rows: slice, columns: slice,
+                                      candidates: np.ndarray = None) -> np.ndarray:
+        row_indices = np.arange(len(contexts[0].lengths))[rows]
+        column_indices = np.arange(len(contexts[0].lengths))[columns]
+        if candidates is None:
+            candidates = np.ones((len(row_indices), len(column_indices)), dtype=bool)
+        distances = np.full(candidates.shape, np.inf)
+        row_index, column_index = np.nonzero(candidates)
+        distances[row_index, column_index] = self._combine_parts(
+            [_get_edit_distances(context, row_indices[row_index], column_indices[column_index])
+             for context in contexts])
+        return distances
+
+    def uses_edit_distance(self) -> bool:
+        return self.distance_variant is not Distance.SET_DISTANCE and \
+            self.distance_variant is not Distance.MULTISET_DISTANCE
+
+    def get_edit_distance_lower_bounds(self, contexts: List[EncodedContexts], rows: slice,
+                                       columns: slice) -> np.ndarray:
+        """
+        Get lower bounds of the edit distances, cheap to compute for whole blocks of signatures.
+        The multiset distance, i.e., the difference of the label histograms, is a lower bound of the edit distance
+        and at least the length difference.
+        """
+        return self._combine_parts([_get_multiset_distances(context, rows, columns,
+                                                            max_multiplicity=context.codes.shape[1])
+                                    for context in contexts])
+
+    def _combine_parts(self, part_distances: List[np.ndarray]) -> np.ndarray:
+        if self.use_combined_context:
+            return part_distances[0]
+        return part_distances[0] * 0.5 + part_distances[1] * 0.5
+
+    def _get_part_distances(self, context: EncodedContexts, rows: slice, columns: slice) -> np.ndarray:
+        if self.distance_variant is Distance.SET_DISTANCE:
+            return _get_multiset_distances(context, rows, columns, max_multiplicity=1)
+        return _get_multiset_distances(context, rows, columns, max_multiplicity=context.codes.shape[1])
+
+    def get_signature_distances(self, event_store: EventStore, event_indices: np.ndarray,
+                                ignored_activities: np.ndarray = None, threshold: float = None,
+                                reserved_bytes: int = 0) -> ContextDistances:
+        """
+        Calculates the normalized distances between the unique context signatures only.
+        Events with the same signature have the same distance to every other event.
+
+        :param threshold: if set, pairs whose lower bound already rules out a normalized edit distance of at least
+            the threshold are not scored exactly and get a normalized distance of -inf.
+            Set and multiset distances are as cheap as their bounds, so they are never pruned.
+        :param reserved_bytes: memory of the distance matrices kept for other labels, taken from the budget
+        :return: Signature id per event and the normalized distance matrix between the signatures
+        :raises MemoryBudgetExceededError: if the distance matrix and one row of pairs do not fit into the budget
+        """
+        event_signatures, contexts = self.get_context_signatures(event_store, event_indices, ignored_activities)
+        number_of_signatures = len(contexts[0].lengths)
+        if not self.uses_edit_distance():
+            threshold = None
+
+        # Per pair: two int16 dynamic programming tables with one row per window position and the float results
+        bytes_per_pair = 4 * (max(context.codes.shape[1] for context in contexts) + 1) + 64
+        block_size = self.get_block_size(number_of_signatures, bytes_per_pair,
+                                         self.get_fixed_bytes(contexts) + reserved_bytes, raise_if_exceeded=True)
+        normalized_distances = np.empty((number_of_signatures, number_of_signatures))
+
+        for start in range(0, number_of_signatures, block_size):
+            end = min(start + block_size, number_of_signatures)
+            rows, columns = slice(start, end), slice(0, number_of_signatures)
+            candidates = None
+            if threshold is not None:
+                lower_bounds = self.get_edit_distance_lower_bounds(contexts, rows, columns)
+                candidates = 1 - lower_bounds / self.window_size >= threshold
+            distances = self.get_distances(contexts, rows, columns, candidates)
+            normalized_distances[start:end] = 1 - distances / self.window_size
+        return ContextDistances(event_signatures, normalized_distances, threshold)
+
+    def get_layer_signature_distances(self, event_store: EventStore, event_indices: np.ndarray,
+                                      distance_variants: List[Distance], ignored_activities: np.ndarray = None,
+                                      threshold: float = None, reserved_bytes: int = 0) -> List[ContextDistances]:
+        """
+        Calculates the normalized distances between the unique context signatures for several distances at once,
+        e.g., for the layers of a multiplex graph. The signatures are grouped once and every block of signature pairs
+        is scored for all distances in the same pass. The multiset distances of a block are also the lower bounds of
+        its edit distances, so they are computed only once.
+
+        :param threshold: as for get_signature_distances, only applied to the edit distance
+        :param reserved_bytes: as for get_signature_distances
+        :return: Distances of the signatures per distance variant, in the order of distance_variants
+        :raises MemoryBudgetExceededError: if the distance matrices and one row of pairs do not fit into the budget
+        """
+        event_signatures, contexts = self.get_context_signatures(event_store, event_indices, ignored_activities)
+        number_of_signatures = len(contexts[0].lengths)
+        # Set and multiset distances are never pruned, as in get_signature_distances
+        layer_thresholds = [None if distance_variant in (Distance.SET_DISTANCE, Distance.MULTISET_DISTANCE)
+                            else threshold for distance_variant in distance_variants]
+
+        bytes_per_pair = 4 * (max(context.codes.shape[1] for context in contexts) + 1) + 64 * len(distance_variants)
+        block_size = self.get_block_size(number_of_signatures, bytes_per_pair,
+                                         self.get_fixed_bytes(contexts, len(distance_variants)) + reserved_bytes,
+                                         raise_if_exceeded=True)
+        layer_distances = [np.empty((number_of_signatures, number_of_signatures)) for _ in distance_variants]
+
+        for start in range(0, number_of_signatures, block_size):
+            end = min(start + block_size, number_of_signatures)
+            rows, columns = slice(start, end), slice(0, number_of_signatures)
+            multiset_distances = self.get_edit_distance_lower_bounds(contexts, rows, columns)
+            for normalized_distances, distance_variant, layer_threshold in zip(layer_distances, distance_variants,
+                                                                               layer_thresholds):
+                if distance_variant is Distance.SET_DISTANCE:
+                    distances = self._combine_parts([_get_multiset_distances(context, rows, columns, max_multiplicity=1)
+                                                     for context in contexts])
+                elif distance_variant is Distance.MULTISET_DISTANCE:
+                    distances = multiset_distances
+                else:
+                    candidates = None
+                    if layer_threshold is not None:
+                        candidates = 1 - multiset_distances / self.window_size >= layer_threshold
+                    distances = self._get_candidate_edit_distances(contexts, rows, columns, candidates)
+                normalized_distances[start:end] = 1 - distances / self.window_size
+        return [ContextDistances(event_signatures, normalized_distances, layer_threshold)
+                for normalized_distances, layer_threshold in zip(layer_distances, layer_thresholds)]
+
+    def get_fixed_bytes(self, contexts: List[EncodedContexts], number_of_matrices: int = 1) -> int:
+        """
+        Upper estimate of the memory held for the whole calculation, independent of the block size: the dense
+        normalized distance matrices between all signatures and the multiplicity indicators of all signatures,
+        used as columns of every block.
+        """
+        number_of_signatures = len(contexts[0].lengths)
+        # Per context: symbol counts and float32 indicators for the multiplicities of the set and multiset distance
+        indicator_bytes = sum(number_of_signatures * max(context.number_of_symbols, 1) * (context.codes.shape[1] + 2)
+                              * 4 for context in contexts)
+        return number_of_matrices * number_of_signatures * number_of_signatures * 8 + indicator_bytes
+
+    def get_block_size(self, number_of_columns: int, bytes_per_pair: int, fixed_bytes: int = 0,
+                       raise_if_exceeded: bool = False) -> int:
+        """
+        :param fixed_bytes: memory held for the whole calculation, taken from the budget before the blocks
+        :param raise_if_exceeded: raise a MemoryBudgetExceededError if not even one row fits into the budget,
+            instead of using blocks of one row
+        :return: Number of rows of a block of pairs with number_of_columns columns that fits into the memory budget,
+            at least one row
+        """
+        available_bytes = self.memory_budget - fixed_bytes
+        row_bytes = max(1, number_of_columns * bytes_per_pair)
+        if raise_if_exceeded and available_bytes < row_bytes:
+            raise MemoryBudgetExceededError(
+                f'{fixed_bytes} bytes for the distance matrices and {row_bytes} bytes for one row of pairs exceed the '
+                f'memory budget of {self.memory_budget} bytes, increase the memory budget (edge_memory_budget of '
+                f'the input data) or reduce the window size')
+        return max(1, available_bytes // row_bytes)
+
+    def get_edges(self, context_distances: ContextDistances, threshold: float,
+                  include_threshold: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calculates all pairs of events whose normalized distance is at least (or above) the threshold
+
+        :return: Edge array of shape (m, 2) in the order of itertools.combinations and the normalized distances
+        """
+        edge_blocks = []
+        distance_blocks = []
+        for edges, normalized_distances in self.iterate_edges(context_distances, threshold, include_threshold):
+            edge_blocks.append(edges)
+            distance_blocks.append(normalized_distances)
+
+        if not edge_blocks:
+            return np.empty((0, 2), dtype=np.int64), np.empty(0)
+        return np.concatenate(edge_blocks), np.concatenate(distance_blocks)
+
+    def iterate_edges(self, context_distances: ContextDistances, threshold: float,
+                      include_threshold: bool = True) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Streams the edges in blocks of source events, as many as the memory budget allows for the pairs of one block.
+        Only pairs of signatures passing the threshold are expanded to event pairs, so the work is proportional to
+        the number of edges, not to all pairs.
+
+        :return: Iterator over the edge arrays of shape (m, 2) and their normalized distances,
+            in the order of itertools.combinations
+        """
+        if context_distances.threshold is not None and threshold < context_distances.threshold:
+            raise ValueError(f'Distances were pruned for threshold {context_distances.threshold}, '
+                             f'they cannot be used for threshold {threshold}')
+        event_signatures = context_distances.event_signatures
+        all_normalized_distances = context_distances.normalized_distances
+        number_of_events = len(event_signatures)
+
+        # Events of signature s are signature_events[signature_starts[s]:signature_starts[s + 1]], in ascending order
+        signature_events = np.argsort(event_signatures, kind='stable')
+        signature_starts = np.searchsorted(event_signatures[signature_events],
+                                           np.arange(len(all_normalized_distances) + 1))
+        signature_counts = np.diff(signature_starts)
+
+        block_size = self.get_block_size(number_of_events, _EDGE_BYTES_PER_PAIR)
+
+        for start in range(0, number_of_events, block_size):
+            end = min(start + block_size, number_of_events)
+            block_signatures = event_signatures[start:end]
+            unique_block_signatures = np.unique(block_signatures)
+            if include_threshold:
+                passing = all_normalized_distances[unique_block_signatures] >= threshold
+            else:
+                passing = all_normalized_distances[unique_block_signatures] > threshold
+
+            # Dense blocks are cheaper to filter as a whole than to expand pair by pair
+            number_of_candidates = (passing @ signature_counts)[np.searchsorted(unique_block_signatures,
+                                                                                block_signatures)].sum()
+            if number_of_candidates * 4 > (end - start) * (number_of_events - start):
+                rows, columns = _get_dense_block_edges(event_signatures, all_normalized_distances, start, end,
+                                                       threshold, include_threshold)
+            else:
+                rows, columns = _get_sparse_block_edges(event_signatures, signature_events, signature_starts,
+                                                        unique_block_signatures, passing, start, end)
+            yield (np.column_stack((rows, columns)).astype(np.int64),
+                   all_normalized_distances[event_signatures[rows], event_signatures[columns]])
+
+
+def _get_dense_block_edges(event_signatures: np.ndarray, all_normalized_distances: np.ndarray, start: int, end: int,
+                           threshold: float, include_threshold: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Filters the distances of the source events start:end to all following events at once
+    """
+    normalized_distances = all_normalized_distances[np.ix_(event_signatures[start:end], event_signatures[start:])]
+    if include_threshold:
+        row_index, column_index = np.nonzero(normalized_distances >= threshold)
+    else:
+        row_index, column_index = np.nonzero(normalized_distances > threshold)
+    upper_triangle = column_index > row_index
+    return row_index[upper_triangle] + start, column_index[upper_triangle] + start
+
+
+def _get_sparse_block_edges(event_signatures: np.ndarray, signature_events: np.ndarray, signature_starts: np.ndarray,
+                            unique_block_signatures: np.ndarray, passing: np.ndarray, start: int,
+                            end: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Expands the passing signature pairs of the source events start:end to event pairs (i, j) with i < j
+    """
+    block_signatures = event_signatures[start:end]
+    row_blocks = []
+    column_blocks = []
+    for signature, signature_passing in zip(unique_block_signatures, passing):
+        rows = start + np.nonzero(block_signatures == signature)[0]
+        columns = _get_signature_events(signature_events, signature_starts, np.nonzero(signature_passing)[0])
+        columns = columns[columns > rows[0]]
+
+        row_index, column_index = np.nonzero(columns[None, :] > rows[:, None])
+        row_blocks.append(rows[row_index])
+        column_blocks.append(columns[column_index])
+
+    rows = np.concatenate(row_blocks)
+    columns = np.concatenate(column_blocks)
+    order = np.argsort(rows * len(event_signatures) + columns)
+    return rows[order], columns[order]
+
+
+def _get_signature_events(signature_events: np.ndarray, signature_starts: np.ndarray,
+                          signatures: np.ndarray) -> np.ndarray:
+    """
+    :return: Events of all given signatures, without a Python loop over the signatures
+    """
+    starts = signature_starts[signatures]
+    lengths = signature_starts[signatures + 1] - starts
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.sort(signature_events[np.repeat(starts, lengths) + offsets])
+
+
+def _get_context(windows: np.ndarray, number_of_symbols: int) -> EncodedContexts:
+    return EncodedContexts(windows, (windows >= 0).sum(axis=1).astype(np.int32), number_of_symbols)
+
+
+def _get_combined_context(prefixes: np.ndarray, suffixes: np.ndarray, number_of_symbols: int) -> EncodedContexts:
+    """
+    Concatenates the prefix and suffix windows, the suffix starts directly after the last symbol of the prefix
+    """
+    prefix_lengths = (prefixes >= 0).sum(axis=1)
+    codes = np.concatenate((prefixes, np.full_like(suffixes, -1)), axis=1)
+    rows, columns = np.nonzero(suffixes >= 0)
+    codes[rows, prefix_lengths[rows] + columns] = suffixes[rows, columns]
+    return _get_context(codes, number_of_symbols)
+
+
+def _get_edit_distances(context: EncodedContexts, rows: np.ndarray, columns: np.ndarray) -> np.ndarray:
+    """
+    Levenshtein distance between the pairs of windows (rows[k], columns[k]),
+    one dynamic programming row at a time for all pairs
+    """
+    codes_a, lengths_a = context.codes[rows], context.lengths[rows]
+    codes_b, lengths_b = context.codes[columns], context.lengths[columns]
+    max_length_b = codes_b.shape[1]
+
+    # previous[j] holds the distance between the first i symbols of a and the first j symbols of b
+    previous = np.broadcast_to(np.arange(max_length_b + 1, dtype=np.int16)[:, None],
+                               (max_length_b + 1, len(rows))).copy()
+    result = _take_at_length(previous, lengths_b)
+
+    for i in range(1, codes_a.shape[1] + 1):
+        current = np.empty_like(previous)
+        current[0] = i
+        symbols_a = codes_a[:, i - 1]
+        for j in range(1, max_length_b + 1):
+            substitution_cost = (symbols_a != codes_b[:, j - 1]).astype(np.int16)
+            np.minimum(np.minimum(previous[j], current[j - 1]) + 1, previous[j - 1] + substitution_cost,
+                       out=current[j])
+        finished_pairs = lengths_a == i
+        result[finished_pairs] = _take_at_length(current, lengths_b)[finished_pairs]
+        previous = current
+
+    return result
+
+
+def _take_at_length(table: np.ndarray, lengths_b: np.ndarray) -> np.ndarray:
+    return np.take_along_axis(table, lengths_b[None, :].astype(np.int64), axis=0)[0]
+
+
+def _get_multiset_distances(context: EncodedContexts, rows: slice, columns: slice,
+                            max_multiplicity: int) -> np.ndarray:
+    """
+    Set and multiset distance between all pairs of windows.
+    The distance is the size of the longer window minus the size of the (multi-)set intersection. The intersection is
+    a matrix product of indicator vectors with one entry per symbol and multiplicity (count of the symbol >= m).
+    The indicators of all windows are built once per context and sliced for the rows and columns of every block.
+    """
+    indicators, sizes = context.get_multiplicity_indicators(max_multiplicity)
+    intersection = (indicators[rows] @ indicators[columns].T).astype(np.int32)
+    return np.maximum(sizes[rows][:, None], sizes[columns][None, :]) - intersection
+
+
+def _get_multiplicity_indicators(context: EncodedContexts, rows: slice, max_multiplicity: int):
+    codes = context.codes[rows]
+    number_of_symbols = max(context.number_of_symbols, 1)
+    counts = np.zeros((codes.shape[0], number_of_symbols), dtype=np.int32)
+    valid = codes >= 0
+    np.add.at(counts, (np.nonzero(valid)[0], codes[valid]), 1)
+
+    multiplicities = np.arange(1, max_multiplicity + 1)
+    indicators = (counts[:, :, None] >= multiplicities[None, None, :]).reshape(codes.shape[0], -1)
+    sizes = np.minimum(counts, max_multiplicity).sum(axis=1)
+    return indicators.astype(np.float32), sizes
@@ -1,73 +1,56 @@
 import igraph
-from pm4py.algo.filtering.log.variants import variants_filter
+
+from label_splitter.event_store import EventStore, get_event_store_from_event_log
+from utils.variant_index import VariantIndex
 
 
 class EventGraphsVariantBased:
     """
-    Event graph where each node represents one event of a variant
+    Event graph where each node represents one event of a variant.
+    The events are the events of the sample case of each variant in the event store.
+    Also holds the distances between the events, calculated by the label splitters, per label and distance parameters,
+    and the last membership found per label and parameters, to warm-start the community detection of the next threshold.
+    The distances are only shared by the thresholds of one cell of the parameter space and released once the cell is
+    done, so at most one distance matrix per label is kept.
     """
-    def __init__(self, event_graphs, short_label_to_original_label, label_and_id_to_event, variants_to_count):
+    def __init__(self, event_graphs, short_label_to_original_label, label_and_id_to_event, event_store: EventStore):
         self.event_graphs = event_graphs
         self.short_label_to_original_label = short_label_to_original_label
         self.label_and_id_to_event = label_and_id_to_event
-        self.variants_to_count = variants_to_count
+        self.event_store = event_store
+        self.context_distances = {}
+        self.warm_start_memberships = {}
+
+    def clear_context_distances(self) -> None:
+        self.context_distances.clear()
 
 
-def get_event_graphs_from_event_log(log, labels_to_split):
+def get_event_graphs_from_event_log(log, labels_to_split, event_store: EventStore = None,
+                                    variant_index: VariantIndex = None):
     """
     Extracts the event graphs for the labels to split from the event log
 
+    :param variant_index: variant index of the log the event store is built from, if no event store is given
+
     :return: Generated event graph with variant compression, i.e., nodes per variant instead of per event
     """
     print('Variants based approach')
-    variants = variants_filter.get_variants(log)
-    event_graphs = {}
-    short_label_to_original_label = {}
-    label_and_id_to_event = {}
-    variants_to_count = {}
-    variant_to_sample_case = {}
-
-    for case in log:
-        variant = ''
-        for e in case:
-            variant = f"{variant},{e['concept:name']}"
-        if variant not in variant_to_sample_case:
-            variant_to_sample_case[variant[1:]] = case
-        for e in case:
-            e['variant_raw'] = variant.replace(',', '')
+    if event_store is None:
+        event_store = get_event_store_from_event_log(log, variant_index=variant_index)
 
-    for variant in variants:
-        prefix = ''
-        processed_events = []
-        occurrence_counters = {}
-        for event in variant_to_sample_case[str(variant)]:
-            label = event['concept:name']
-            if 'original_label' in event.keys():
-                short_label_to_original_label[label] = event['original_label']
+    sample_events = event_store.get_sample_events()
+    sample_activities = event_store.activities[sample_events]
 
-            if label not in list(event_graphs.keys()) and label in labels_to_split:
-                event_graphs[label] = igraph.Graph()
-                label_and_id_to_event[label] = []
-
-            for preceding_event in processed_events:
-                preceding_event['suffix'] = preceding_event['suffix'] + label
-
-            if label not in occurrence_counters:
-                occurrence_counters[label] = 0
-            else:
-                occurrence_counters[label] += 1
-
-            event['prefix'] = prefix
-            event['suffix'] = ''
-            event['label'] = label
-            event['variant'] = label + '_' + event['variant_raw'] + f'_{occurrence_counters[label]}'
-            variants_to_count[event['variant']] = len(variants[variant])
-            processed_events.append(event)
-            prefix = prefix + label
-        for event in processed_events:
-            label = event['concept:name']
-            if label in labels_to_split:
-                label_and_id_to_event[label].append(event)
-                event_graphs[label].add_vertices(1)
-
-    return EventGraphsVariantBased(event_graphs, short_label_to_original_label, label_and_id_to_event, variants_to_count)
\ No newline at end of file
+    activities_to_split = {event_store.label_to_activity[label]: label for label in labels_to_split
+                           if label in event_store.label_to_activity}
+    event_graphs = {}
+    label_and_id_to_event = {}
+    # Labels are added in the order of their first occurrence
+    for activity in dict.fromkeys(sample_activities.tolist()):
+        if activity in activities_to_split:
+            label = activities_to_split[activity]
+            label_and_id_to_event[label] = sample_events[sample_activities == activity]
+            event_graphs[label] = igraph.Graph(len(label_and_id_to_event[label]))
+
+    return EventGraphsVariantBased(event_graphs, event_store.short_label_to_original_label, label_and_id_to_event,
+                                   event_store)
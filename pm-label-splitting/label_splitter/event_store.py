@@ -0,0 +1,136 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from utils.variant_index import VariantIndex, get_variant_index
+
+
+class EventStore:
+    """
+    Columnar representation of the labels of an event log.
+    The activities of all cases are stored in one integer array, case i covers the events
+    case_offsets[i]:case_offsets[i + 1]. Events are referenced by their index in this array.
+    """
+
+    def __init__(self, activities: np.ndarray, case_offsets: np.ndarray, case_variants: np.ndarray,
+                 variant_counts: np.ndarray, variant_sample_cases: np.ndarray, labels: List[str],
+                 short_label_to_original_label: Dict[str, str]):
+        self.activities = activities
+        self.case_offsets = case_offsets
+        self.case_variants = case_variants
+        self.variant_counts = variant_counts
+        self.variant_sample_cases = variant_sample_cases
+        self.labels = labels
+        self.label_to_activity = {label: activity for activity, label in enumerate(labels)}
+        self.short_label_to_original_label = short_label_to_original_label
+
+    def __len__(self) -> int:
+        return len(self.activities)
+
+    @property
+    def number_of_cases(self) -> int:
+        return len(self.case_offsets) - 1
+
+    @property
+    def number_of_variants(self) -> int:
+        return len(self.variant_counts)
+
+    def get_case_events(self, case_index: int) -> range:
+        return range(self.case_offsets[case_index], self.case_offsets[case_index + 1])
+
+    def get_sample_events(self) -> np.ndarray:
+        """
+        :return: Events of the sample case of every variant, in the order of the variants
+        """
+        return np.concatenate([np.arange(self.case_offsets[case_index], self.case_offsets[case_index + 1])
+                               for case_index in self.variant_sample_cases] + [np.empty(0, dtype=np.int64)])
+
+    def get_cases(self, event_indices: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.case_offsets, event_indices, side='right') - 1
+
+    def get_positions(self, event_indices: np.ndarray) -> np.ndarray:
+        return event_indices - self.case_offsets[self.get_cases(event_indices)]
+
+    def get_context_windows(self, event_indices: np.ndarray, window_size: int,
+                            ignored_activities: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Extracts the context windows used by the distance calculation in one pass over the events:
+        the last window_size activities of the prefix and the first min(window_size, len(suffix)) - 1 activities
+        of the suffix, as in DistanceCalculator. Only the windows are materialized, never the full prefix or suffix.
+
+        :param ignored_activities: activities left out of the prefixes and suffixes, e.g., concurrent labels
+        :return: Prefix and suffix windows as arrays of shape (len(event_indices), window_size), padded with -1
+        """
+        event_indices = np.asarray(event_indices, dtype=np.int64)
+        if ignored_activities is not None and len(ignored_activities) > 0:
+            context_events = np.nonzero(~np.isin(self.activities, ignored_activities))[0]
+        else:
+            context_events = np.arange(len(self.activities))
+
+        cases = self.get_cases(event_indices)
+        # Context events are sorted, so the context of an event is a contiguous range of context_events
+        case_start = np.searchsorted(context_events, self.case_offsets[cases])
+        case_end = np.searchsorted(context_events, self.case_offsets[cases + 1])
+        prefix_end = np.searchsorted(context_events, event_indices)
+        suffix_start = np.searchsorted(context_events, event_indices, side='right')
+
+        prefix_lengths = np.minimum(window_size, prefix_end - case_start)
+        suffix_lengths = np.maximum(np.minimum(window_size, case_end - suffix_start) - 1, 0)
+
+        return (self._get_windows(context_events, prefix_end - prefix_lengths, prefix_lengths, window_size),
+                self._get_windows(context_events, suffix_start, suffix_lengths, window_size))
+
+    def _get_windows(self, context_events: np.ndarray, starts: np.ndarray, lengths: np.ndarray,
+                     window_size: int) -> np.ndarray:
+        offsets = np.arange(window_size)
+        valid = offsets[None, :] < lengths[:, None]
+        if len(context_events) == 0:
+            return np.full(valid.shape, -1, dtype=np.int32)
+        window_events = context_events[np.where(valid, starts[:, None] + offsets[None, :], 0)]
+        return np.where(valid, self.activities[window_events], -1).astype(np.int32)
+
+    def get_event_counts(self, event_indices: np.ndarray) -> np.ndarray:
+        """
+        :return: Number of cases of the variant of each event
+        """
+        return self.variant_counts[self.case_variants[self.get_cases(event_indices)]]
+
+    def get_activity_ids(self, labels) -> np.ndarray:
+        return np.array([self.label_to_activity[label] for label in labels if label in self.label_to_activity],
+                        dtype=self.activities.dtype)
+
+
+def get_event_store_from_event_log(log, activity_key: str = 'concept:name',
+                                   variant_index: VariantIndex = None) -> EventStore:
+    """
+    Extracts the labels of the event log into an event store.
+    The variants are the variants of the variant index, numbered in the order of their first occurrence in the log.
+
+    :param variant_index: variant index of the log, e.g., the one also used for the evaluation, built if not given
+    """
+    if variant_index is None:
+        variant_index = get_variant_index(log, activity_key)
+    labels = []
+    label_to_activity = {}
+    short_label_to_original_label = {}
+    activities = []
+    case_offsets = [0]
+
+    for trace in log:
+        for event in trace:
+            label = event[activity_key]
+            if label not in label_to_activity:
+                label_to_activity[label] = len(labels)
+                labels.append(label)
+            if 'original_label' in event.keys():
+                short_label_to_original_label[label] = event['original_label']
+            activities.append(label_to_activity[label])
+        case_offsets.append(len(activities))
+
+    return EventStore(np.array(activities, dtype=np.int32),
+                      np.array(case_offsets, dtype=np.int64),
+                      variant_index.case_variants,
+                      variant_index.variant_counts,
+                      variant_index.representative_cases,
+                      labels,
+                      short_label_to_original_label)
@@ -1,12 +1,17 @@
 import json
 import string
-from itertools import combinations
 from typing import TextIO
 
 import igraph
+import numpy as np
 
 from pipeline.clustering_method import ClusteringMethod
-from label_splitter.distance_metrics import Distance, DistanceCalculator
+from label_splitter.batched_distance import BatchedDistanceCalculator, DEFAULT_MEMORY_BUDGET
+from label_splitter.distance_metrics import Distance
+from label_splitter.event_store import get_event_store_from_event_log
+from utils.relabeled_log import RelabeledLog
+from utils.result_sink import OutputLevel
+from utils.variant_index import VariantIndex
 import leidenalg as la
 
 
@@ -24,7 +29,10 @@ class LabelSplitter:
                  distance_variant = Distance.EDIT_DISTANCE,
                  clustering_variant = ClusteringMethod.COMMUNITY_DETECTION,
                  concurrent_labels=None,
-                 use_combined_context=False):
+                 use_combined_context=False,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 output_level: OutputLevel = OutputLevel.VERBOSE,
+                 variant_index: VariantIndex = None):
         if concurrent_labels is None:
             concurrent_labels = []
         self.concurrent_labels = concurrent_labels
@@ -34,110 +42,100 @@ class LabelSplitter:
         self.prefix_weight = prefix_weight
         self._split_labels_to_original_labels = {}
         self.outfile = outfile
+        self.output_level = output_level
         self.label_and_id_to_event = {}
-        self.variants_to_count = {}
+        self.event_store = None
+        self.variant_index = variant_index
         self.distance_variant = distance_variant
-        self.distance_calculator = DistanceCalculator(window_size, use_combined_context)
+        self.batched_distance_calculator = BatchedDistanceCalculator(window_size, use_combined_context,
+                                                                     distance_variant, memory_budget)
         self.clustering_variant = clustering_variant
         self.short_label_to_original_label = {}
         self.found_clustering = None
+        self.found_memberships = {}
+        self._split_label_to_events = {}
 
-        if distance_variant is Distance.EDIT_DISTANCE:
-            self.get_distance = self.distance_calculator.get_edit_distance
-        elif distance_variant is Distance.SET_DISTANCE:
-            self.get_distance = self.distance_calculator.get_set_distance
-        elif distance_variant is Distance.MULTISET_DISTANCE:
-            self.get_distance = self.distance_calculator.get_multiset_distance
-        else:
+        if not isinstance(distance_variant, Distance):
             print('Warning: Distance metric not found, fallback to default distance')
-            self.get_distance = self.distance_calculator.get_edit_distance
 
-    def _write(self, log_entry: string) -> None:
-        self.outfile.write(f'{log_entry}\n')
+    def _write(self, log_entry: string, level: OutputLevel = OutputLevel.DEFAULT) -> None:
+        if level <= self.output_level:
+            self.outfile.write(f'{log_entry}\n')
 
     def get_split_labels_to_original_labels(self):
         self._write('Map:')
         self._write(json.dumps(self._split_labels_to_original_labels))
         return self._split_labels_to_original_labels
 
-    def split_labels(self, log):
+    def split_labels(self, log) -> RelabeledLog:
+        """
+        Splits the labels of the log, without modifying its labels
+
+        :return: Log with the split labels, as label overrides of the input log
+        """
         print('Starting label splitting')
-        event_graphs = self.get_event_graphs_from_event_log(log)
+        self.find_communities(log)
+        return self.get_relabeled_log(log)
 
+    def find_communities(self, log) -> None:
+        """
+        Clusters the events of each label to split, without relabeling the log yet
+        """
+        event_graphs = self.get_event_graphs_from_event_log(log)
         self.calculate_edges(event_graphs)
-        self.get_communities_louvain(event_graphs=event_graphs, log=log)
-
-        return log
+        self.get_communities_louvain(event_graphs=event_graphs)
 
     def get_event_graphs_from_event_log(self, log):
         print('Event based approach')
+        self.event_store = get_event_store_from_event_log(log, variant_index=self.variant_index)
+        self.short_label_to_original_label = self.event_store.short_label_to_original_label
+        activities = self.event_store.activities
+
         event_graphs = {}
-        for case_id, trace in enumerate(log):
-            prefix = ''
-            processed_events = []
-            for position, event in enumerate(trace):
-                label = event['concept:name']
-                if 'original_label' in event.keys():
-                    self.short_label_to_original_label[label] = event['original_label']
-
-                event['case_id'] = case_id
-                event['position'] = position
-                if label not in list(event_graphs.keys()) and label in self.labels_to_split:
-                    event_graphs[label] = igraph.Graph()
-                    self.label_and_id_to_event[label] = []
-
-                for preceding_event in processed_events:
-                    if label in self.concurrent_labels:
-                        break
-                    preceding_event['suffix'] = preceding_event['suffix'] + label
-
-                event['prefix'] = prefix
-                event['suffix'] = ''
-                event['label'] = label
-                processed_events.append(event)
-                if label not in self.concurrent_labels:
-                    prefix = prefix + label
-
-            for event in processed_events:
-                label = event['concept:name']
-                if label in self.labels_to_split:
-                    self.label_and_id_to_event[label].append(event)
-                    event_graphs[label].add_vertices(1)
+        # Labels are added in the order of their first occurrence
+        for activity in dict.fromkeys(activities.tolist()):
+            label = self.event_store.labels[activity]
+            if label in self.labels_to_split:
+                self.label_and_id_to_event[label] = np.nonzero(activities == activity)[0]
+                event_graphs[label] = igraph.Graph(len(self.label_and_id_to_event[label]))
         print('Finished calculating event_graphs')
         return event_graphs
 
     def calculate_edges(self, event_graphs) -> None:
+        concurrent_activities = self.event_store.get_activity_ids(self.concurrent_labels)
         for (label, graph) in event_graphs.items():
             print(f'Calculating edges for {label}')
-            edges = []
-            weights = []
-
-            for (vertex_a, vertex_b) in combinations(range(len(graph.vs)), 2):
-                edit_distance = self.get_distance(self.label_and_id_to_event[label][vertex_a],
-                                                  self.label_and_id_to_event[label][vertex_b])
-                weight = (1 - edit_distance / self.window_size)
-                if weight > self.threshold:
-                    edges.append((vertex_a, vertex_b))
-                    weights.append(weight)
-            graph.add_edges(edges)
-            graph.es['weight'] = weights
+            context_distances = self.batched_distance_calculator.get_signature_distances(
+                self.event_store, self.label_and_id_to_event[label], concurrent_activities, self.threshold)
+            graph.es['weight'] = []
+            # The edges are added block by block, so only one block is held outside of the graph at a time
+            for edges, weights in self.batched_distance_calculator.iterate_edges(context_distances, self.threshold,
+                                                                                 include_threshold=False):
+                graph.add_edges(edges, attributes={'weight': weights.tolist()})
         print('Finished calculating edges')
 
-    def get_communities_louvain(self, event_graphs, log) -> None:
+    def get_communities_louvain(self, event_graphs) -> None:
         print('Starting community detection')
         for (label, graph) in event_graphs.items():
             print(f'Getting communities for {label}')
             partition = la.find_partition(graph, la.ModularityVertexPartition, weights=graph.es['weight'], seed=396482)
             print(partition)
             self.found_clustering = partition
-            self._write('Found communities: \n')
-            self._write(str(partition))
+            self.found_memberships[label] = partition.membership
+            self._write('Found communities: \n', OutputLevel.VERBOSE)
+            self._write(str(partition), OutputLevel.VERBOSE)
 
             for count, cluster in enumerate(partition):
                 self._split_labels_to_original_labels[f'{label}_{count}'] = label
-                for vertex in cluster:
-                    event = self.label_and_id_to_event[label][vertex]
-                    log[event['case_id']][event['position']]['concept:name'] = f'{label}_{count}'
+                self._split_label_to_events[f'{label}_{count}'] = self.label_and_id_to_event[label][cluster]
         self._write('\nReassigned labels')
-        print('Finished setting labels')
         print('Finished community detection')
+
+    def get_relabeled_log(self, log) -> RelabeledLog:
+        relabeled_log = RelabeledLog(log)
+        for split_label, event_indices in self._split_label_to_events.items():
+            for case_index, position in zip(self.event_store.get_cases(event_indices).tolist(),
+                                            self.event_store.get_positions(event_indices).tolist()):
+                relabeled_log.set_label(case_index, position, split_label)
+        print('Finished setting labels')
+        return relabeled_log
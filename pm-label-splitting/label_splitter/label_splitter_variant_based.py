@@ -1,16 +1,24 @@
-import copy
 import json
 import operator as op
 import string
+from concurrent.futures import ProcessPoolExecutor
 from functools import reduce
-from itertools import combinations
-from typing import TextIO, List
+from typing import Dict, TextIO, List, Tuple
 
 import leidenalg as la
+import numpy as np
+from igraph import Clustering
 
-from label_splitter.distance_metrics import Distance, DistanceCalculator
+from label_splitter.batched_distance import BatchedDistanceCalculator, ContextDistances, DEFAULT_MEMORY_BUDGET
+from label_splitter.distance_metrics import Distance
 from label_splitter.event_graphs_variant_based import EventGraphsVariantBased
 from pipeline.clustering_method import ClusteringMethod
+from utils.relabeled_log import RelabeledLog
+from utils.result_sink import OutputLevel
+
+# Resolution of the CPM objective of the node size mode, i.e., the minimum density of the edge weights within a
+# community, relative to the product of the node sizes
+DEFAULT_CPM_RESOLUTION = 0.5
 
 
 class LabelSplitter:
@@ -30,7 +38,13 @@ class LabelSplitter:
                  use_frequency: bool = False,
                  concurrent_labels: List[str] = None,
                  use_combined_context: bool = False,
-                 event_graphs_variant_based: EventGraphsVariantBased = None
+                 event_graphs_variant_based: EventGraphsVariantBased = None,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 output_level: OutputLevel = OutputLevel.VERBOSE,
+                 warm_start: bool = False,
+                 use_node_sizes: bool = False,
+                 resolution: float = DEFAULT_CPM_RESOLUTION,
+                 number_of_workers: int = 1
                  ):
         if concurrent_labels is None:
             concurrent_labels = []
@@ -41,118 +55,299 @@ class LabelSplitter:
         self.prefix_weight = prefix_weight
         self._split_labels_to_original_labels = {}
         self.outfile = outfile
+        self.output_level = output_level
         self.label_and_id_to_event = event_graphs_variant_based.label_and_id_to_event
-        self.variants_to_count = event_graphs_variant_based.variants_to_count
+        self.event_store = event_graphs_variant_based.event_store
         self.distance_variant = distance_variant
-        self.distance_calculator = DistanceCalculator(window_size, use_combined_context)
+        self.use_combined_context = use_combined_context
+        self.batched_distance_calculator = BatchedDistanceCalculator(window_size, use_combined_context,
+                                                                     distance_variant, memory_budget)
         self.clustering_variant = clustering_variant
-        self._variant_to_label = {}
+        self._variant_event_to_label = {}
         self.use_frequency = use_frequency
         self.short_label_to_original_label = event_graphs_variant_based.short_label_to_original_label
         self.found_clustering = None
+        self.found_memberships = {}
         self.event_graphs = event_graphs_variant_based.event_graphs
+        self.context_distances = event_graphs_variant_based.context_distances
+        # Starts the community detection from the membership of the previous threshold with the same parameters
+        self.warm_start = warm_start
+        self.warm_start_memberships = event_graphs_variant_based.warm_start_memberships
+        # With frequencies, each vertex carries the number of cases of its variant as node size for the CPM objective,
+        # instead of self-loops for the pairs of events within the vertex
+        self.use_node_sizes = use_node_sizes
+        self.resolution = resolution
+        # Number of processes used to find the communities of the labels to split
+        self.number_of_workers = number_of_workers
 
-        if distance_variant is Distance.EDIT_DISTANCE:
-            self.get_distance = self.distance_calculator.get_edit_distance
-        elif distance_variant is Distance.SET_DISTANCE:
-            self.get_distance = self.distance_calculator.get_set_distance
-        elif distance_variant is Distance.MULTISET_DISTANCE:
-            self.get_distance = self.distance_calculator.get_multiset_distance
-        else:
+        if not isinstance(distance_variant, Distance):
             print('Warning: Distance metric not found, fallback to default distance')
-            self.get_distance = self.distance_calculator.get_edit_distance
 
-    def _write(self, log_entry: string) -> None:
-        self.outfile.write(f'{log_entry}\n')
+    def _write(self, log_entry: string, level: OutputLevel = OutputLevel.DEFAULT) -> None:
+        if level <= self.output_level:
+            self.outfile.write(f'{log_entry}\n')
 
     def get_split_labels_to_original_labels(self):
         self._write('Map:')
         self._write(json.dumps(self._split_labels_to_original_labels))
         return self._split_labels_to_original_labels
 
-    def split_labels(self, log):
+    def split_labels(self, log) -> RelabeledLog:
+        """
+        Splits the labels of the log, without modifying it
+
+        :return: Log with the split labels, as label overrides of the input log
+        """
         print('Starting label splitting')
-        event_graphs = copy.deepcopy(self.event_graphs)
+        self.find_communities(log)
+        return self.get_relabeled_log(log)
 
+    def find_communities(self, log=None) -> None:
+        """
+        Clusters the events of each label to split, without relabeling the log yet.
+        The event graphs were already built from the log, so it is not used.
+        """
+        if self.number_of_workers > 1 and len(self.event_graphs) > 1:
+            self.find_communities_in_parallel()
+            return
+        event_graphs = {label: graph.copy() for (label, graph) in self.event_graphs.items()}
         self.calculate_edges(event_graphs)
         self.get_communities_leiden(event_graphs=event_graphs)
-        self.set_split_labels(log)
 
-        return log
+    def find_communities_in_parallel(self) -> None:
+        """
+        Clusters the events of the labels to split in a process pool, one task per label, as the event graphs of the
+        labels are independent. The memberships are assigned in the order of the labels, as in a serial run, and the
+        distances calculated by the workers are added to the shared distances.
+        """
+        print('Starting community detection for all labels in parallel')
+        labels = list(self.event_graphs.keys())
+        with ProcessPoolExecutor(max_workers=min(self.number_of_workers, len(labels)),
+                                 initializer=_init_label_worker,
+                                 initargs=(self,)) as executor:
+            label_results = list(executor.map(_find_label_communities_in_worker, labels))
+
+        for label, (membership, context_distances) in zip(labels, label_results):
+            self.context_distances[self.get_context_distances_key(label)] = context_distances
+            if self.warm_start:
+                self.warm_start_memberships[self.get_warm_start_key(label)] = membership
+            self.assign_split_labels(label, Clustering(membership))
+        self._write('\nReassigned labels')
+        print('Finished community detection')
 
     def calculate_edges(self, event_graphs) -> None:
         for (label, graph) in event_graphs.items():
             print(f'Calculating edges for {label}')
-            edges = [-1] * ncr(len(graph.vs), 2)
-            weights = [-1] * ncr(len(graph.vs), 2)
-
-            for index, (vertex_a, vertex_b) in enumerate(combinations(range(len(graph.vs)), 2)):
-                distance = self.get_distance(self.label_and_id_to_event[label][vertex_a],
-                                             self.label_and_id_to_event[label][vertex_b])
-
-                normalized_distance = (1 - distance / self.window_size)
-                if self.use_frequency:
-                    weight = normalized_distance * (
-                            self.variants_to_count[self.label_and_id_to_event[label][vertex_a]['variant']] *
-                            self.variants_to_count[self.label_and_id_to_event[label][vertex_b]['variant']])
-                else:
-                    weight = normalized_distance
-                if normalized_distance >= self.threshold:
-                    edges[index] = (vertex_a, vertex_b)
-                    weights[index] = weight
-            edges = [e for e in edges if e != -1]
-            weights = [w for w in weights if w != -1]
+            self.add_edges(label, graph, self.threshold)
+        print('Finished calculating edges')
+
+    def add_edges(self, label, graph, threshold: float, with_similarities: bool = False) -> None:
+        """
+        Adds the edges between the events of the label with a similarity of at least the threshold to the graph.
 
+        :param with_similarities: also store the normalized similarity of each edge as edge attribute 'similarity',
+            self-loops have similarity 1
+        """
+        counts = self.event_store.get_event_counts(self.label_and_id_to_event[label])
+        graph.es['weight'] = []
+        if with_similarities:
+            graph.es['similarity'] = []
+
+        # The edges are added block by block, so only one block is held outside of the graph at a time
+        for edges, normalized_distances in self.batched_distance_calculator.iterate_edges(
+                self.get_context_distances(label, threshold), threshold):
             if self.use_frequency:
-                self_edges = [-1] * len(graph.vs)
-                self_weights = [-1] * len(graph.vs)
-
-                for index, vertex_a in enumerate(range(len(graph.vs))):
-                    count = self.variants_to_count[self.label_and_id_to_event[label][vertex_a]['variant']]
-                    if count > 1:
-                        weight = ncr(count, 2) * 2
-                        self_edges[index] = (vertex_a, vertex_a)
-                        self_weights[index] = weight
-                self_edges = [e for e in self_edges if e != -1]
-                self_weights = [w for w in self_weights if w != -1]
-                edges += self_edges
-                weights += self_weights
-
-            graph.add_edges(edges)
-            graph.es['weight'] = weights
-        print('Finished calculating edges')
+                weights = normalized_distances * (counts[edges[:, 0]] * counts[edges[:, 1]])
+            else:
+                weights = normalized_distances
+            attributes = {'weight': weights.tolist()}
+            if with_similarities:
+                attributes['similarity'] = normalized_distances.tolist()
+            graph.add_edges(edges, attributes=attributes)
+
+        if self.use_frequency and not self.use_node_sizes:
+            self_edge_vertices = np.nonzero(counts > 1)[0]
+            self_weights = counts[self_edge_vertices] * (counts[self_edge_vertices] - 1)
+            attributes = {'weight': self_weights.astype(float).tolist()}
+            if with_similarities:
+                attributes['similarity'] = [1.0] * len(self_edge_vertices)
+            graph.add_edges(np.column_stack((self_edge_vertices, self_edge_vertices)), attributes=attributes)
+
+    def get_context_distances(self, label, threshold: float = None) -> ContextDistances:
+        """
+        Get the distances between the events of the label, computed once per label and distance parameters and
+        shared by all label splitters using the same event graphs, i.e., by all thresholds of a cell of the parameter
+        space, until the cell releases them.
+        Pairs are pruned for the threshold of the first splitter, so the distances are only recomputed if a later
+        splitter uses a smaller threshold.
+        The distances kept for the other labels count against the memory budget of the calculation.
+        """
+        if threshold is None:
+            threshold = self.threshold
+        key = self.get_context_distances_key(label)
+        cached_distances = self.context_distances.get(key)
+        if cached_distances is None or (cached_distances.threshold is not None and
+                                        threshold < cached_distances.threshold):
+            # The outdated distances of the label are released before the new ones are allocated
+            self.context_distances.pop(key, None)
+            reserved_bytes = sum(context_distances.normalized_distances.nbytes
+                                 for context_distances in self.context_distances.values())
+            self.context_distances[key] = self.batched_distance_calculator.get_signature_distances(
+                self.event_store, self.label_and_id_to_event[label], threshold=threshold,
+                reserved_bytes=reserved_bytes)
+        return self.context_distances[key]
+
+    def get_context_distances_key(self, label):
+        return label, self.window_size, self.distance_variant, self.use_combined_context
 
     def get_communities_leiden(self, event_graphs) -> None:
         print('Starting community detection')
         for (label, graph) in event_graphs.items():
             print(f'Getting communities for {label}')
-            partition = la.find_partition(graph, la.ModularityVertexPartition, weights=graph.es['weight'], seed=396482)
-            self.found_clustering = partition
-            self._write('Found communities: \n')
-            self._write(str(partition))
-
-            for count, cluster in enumerate(partition):
-                self._split_labels_to_original_labels[f'{label}_{count}'] = label
-                for vertex in cluster:
-                    self.label_and_id_to_event[label][vertex]['label'] = f'{label}_{count}'
-                    self._variant_to_label[self.label_and_id_to_event[label][vertex]['variant']] = f'{label}_{count}'
+            initial_membership = self.get_initial_membership(label)
+            partition = self.find_partition(label, graph, initial_membership)
+            if self.warm_start:
+                self.warm_start_memberships[self.get_warm_start_key(label)] = partition.membership
+            self.assign_split_labels(label, partition)
 
         self._write('\nReassigned labels')
         print('Finished community detection')
 
-    def set_split_labels(self, log):
-        for trace in log:
-            occurrence_counters = {}
-            for event in trace:
-                label = event['concept:name']
-                if label not in occurrence_counters:
-                    occurrence_counters[label] = 0
-                else:
-                    occurrence_counters[label] += 1
-                event['variant'] = label + '_' + event['variant_raw'] + f'_{occurrence_counters[label]}'
-                if event['variant'] in self._variant_to_label:
-                    event['concept:name'] = self._variant_to_label[event['variant']]
+    def find_partition(self, label, graph,
+                       initial_membership: List[int] = None) -> la.VertexPartition.MutableVertexPartition:
+        """
+        Optimises the modularity of the event graph, or in node size mode the CPM objective with the frequencies of
+        the vertices as node sizes and the resolution of the splitter.
+        These are different objectives, so the partitions of the two modes can differ: CPM compares the edge weights
+        within a community with the resolution instead of with the weights expected from the vertex degrees, and the
+        number of communities depends on the resolution. Modularity cannot take node sizes, as it depends on the
+        self-loops through the vertex degrees. For CPM the pairs of events within a vertex would only add a constant,
+        so the self-loops are left out.
+        """
+        if self.use_frequency and self.use_node_sizes:
+            return la.find_partition(graph, la.CPMVertexPartition, initial_membership=initial_membership,
+                                     weights=graph.es['weight'], node_sizes=self.get_node_sizes(label),
+                                     resolution_parameter=self.resolution, seed=396482)
+        return la.find_partition(graph, la.ModularityVertexPartition, initial_membership=initial_membership,
+                                 weights=graph.es['weight'], seed=396482)
+
+    def get_node_sizes(self, label) -> List[int]:
+        if not self.use_frequency:
+            return [1] * len(self.label_and_id_to_event[label])
+        return self.event_store.get_event_counts(self.label_and_id_to_event[label]).tolist()
+
+    def set_memberships(self, memberships: Dict[str, List[int]]) -> None:
+        """
+        Uses memberships found before, e.g., by get_threshold_path, instead of finding the communities
+        """
+        for label, membership in memberships.items():
+            self.assign_split_labels(label, Clustering(membership))
+        self._write('\nReassigned labels')
+
+    def assign_split_labels(self, label, clustering: Clustering) -> None:
+        """
+        Assigns one split label per cluster to the events of the label
+        """
+        self.found_clustering = clustering
+        self.found_memberships[label] = clustering.membership
+        self._write('Found communities: \n', OutputLevel.VERBOSE)
+        self._write(str(clustering), OutputLevel.VERBOSE)
+
+        for count, cluster in enumerate(clustering):
+            self._split_labels_to_original_labels[f'{label}_{count}'] = label
+            for vertex in cluster:
+                self._variant_event_to_label[self.label_and_id_to_event[label][vertex]] = f'{label}_{count}'
+
+    def get_threshold_path(self, thresholds: List[float]) -> List[Dict[str, List[int]]]:
+        """
+        Finds the communities of every label to split for several thresholds in one call.
+        This is a linear sweep over the thresholds, not a bisection: the event graph of a label is built once, for
+        the smallest threshold, and for each larger threshold the edges below it are removed from the same graph and
+        the communities are found again. Only a threshold that removes no edges reuses the membership of the previous
+        one, as its graph is the same. With warm start, the community detection of a threshold starts from the
+        membership of the previous one.
+
+        :return: Membership per label, for each threshold in the given order, an empty list for no thresholds
+        """
+        if not thresholds:
+            return []
+        ascending_thresholds = sorted(set(thresholds))
+        memberships = {threshold: {} for threshold in ascending_thresholds}
+        for label, event_graph in self.event_graphs.items():
+            print(f'Getting communities for {label} on threshold path')
+            graph = event_graph.copy()
+            self.add_edges(label, graph, ascending_thresholds[0], with_similarities=True)
+            membership = None
+            for threshold in ascending_thresholds:
+                removed_edges = graph.es.select(similarity_lt=threshold)
+                if membership is None or len(removed_edges) > 0:
+                    graph.delete_edges(removed_edges)
+                    membership = self.find_partition(label, graph, membership if self.warm_start else None).membership
+                memberships[threshold][label] = membership
+        return [memberships[threshold] for threshold in thresholds]
+
+    def get_warm_start_key(self, label):
+        return label, self.window_size, self.distance_variant, self.use_combined_context, self.use_frequency
+
+    def get_initial_membership(self, label):
+        """
+        With warm start, the membership found for the previous threshold with the same parameters.
+        The thresholds of a cell are run in ascending order, so the graph only lost edges since then and the optimiser
+        starts close to the new partition instead of from singletons.
+
+        :return: Initial membership for the community detection, None to start from singletons
+        """
+        if not self.warm_start:
+            return None
+        return self.warm_start_memberships.get(self.get_warm_start_key(label))
+
+    def get_relabeled_log(self, log) -> RelabeledLog:
+        """
+        Applies the split labels of the events of each variant to all cases of the variant
+
+        :param log: the log the event store was built from
+        """
+        variant_events = np.fromiter(self._variant_event_to_label.keys(), dtype=np.int64,
+                                     count=len(self._variant_event_to_label))
+        variants = self.event_store.case_variants[self.event_store.get_cases(variant_events)]
+        positions = self.event_store.get_positions(variant_events)
+
+        variant_to_split_labels = {}
+        for variant, position, split_label in zip(variants.tolist(), positions.tolist(),
+                                                  self._variant_event_to_label.values()):
+            variant_to_split_labels.setdefault(variant, []).append((position, split_label))
+
+        relabeled_log = RelabeledLog(log)
+        for case_index, variant in enumerate(self.event_store.case_variants.tolist()):
+            for position, split_label in variant_to_split_labels.get(variant, []):
+                relabeled_log.set_label(case_index, position, split_label)
         print('Finished setting labels')
+        return relabeled_log
+
+    def __getstate__(self):
+        # Workers do not write to the output, and only need the distances for the parameters of this splitter
+        state = self.__dict__.copy()
+        state['outfile'] = None
+        state['context_distances'] = {key: context_distances
+                                      for key, context_distances in self.context_distances.items()
+                                      if key == self.get_context_distances_key(key[0])}
+        return state
+
+
+_label_worker_state = {}
+
+
+def _init_label_worker(label_splitter: LabelSplitter) -> None:
+    _label_worker_state['label_splitter'] = label_splitter
+
+
+def _find_label_communities_in_worker(label) -> Tuple[List[int], ContextDistances]:
+    label_splitter = _label_worker_state['label_splitter']
+    print(f'Getting communities for {label}')
+    graph = label_splitter.event_graphs[label].copy()
+    label_splitter.add_edges(label, graph, label_splitter.threshold)
+    partition = label_splitter.find_partition(label, graph, label_splitter.get_initial_membership(label))
+    return partition.membership, label_splitter.get_context_distances(label)
 
 
 def ncr(n, r):
@@ -1,15 +1,21 @@
 import json
 import string
-from itertools import combinations
-from typing import TextIO
+from typing import List, TextIO
 
-import igraph
 import leidenalg as la
-from pm4py.algo.filtering.log.variants import variants_filter
+import numpy as np
 
 from pipeline.clustering_method import ClusteringMethod
-from label_splitter.distance_metrics import Distance, DistanceCalculator
+from label_splitter.batched_distance import BatchedDistanceCalculator, DEFAULT_MEMORY_BUDGET
+from label_splitter.distance_metrics import Distance
+from label_splitter.event_graphs_variant_based import get_event_graphs_from_event_log
 from label_splitter.label_splitter_variant_based import ncr
+from utils.relabeled_log import RelabeledLog
+from utils.result_sink import OutputLevel
+from utils.variant_index import VariantIndex
+
+# Distance of each layer of the multiplex graph
+LAYER_DISTANCES = (Distance.EDIT_DISTANCE, Distance.SET_DISTANCE, Distance.MULTISET_DISTANCE)
 
 
 class LabelSplitter:
@@ -28,143 +34,110 @@ class LabelSplitter:
                  distance_variant=Distance.EDIT_DISTANCE,
                  clustering_variant=ClusteringMethod.COMMUNITY_DETECTION,
                  use_frequency=False,
-                 use_combined_context=False):
+                 use_combined_context=False,
+                 output_level: OutputLevel = OutputLevel.VERBOSE,
+                 layer_weights: List[float] = None,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 variant_index: VariantIndex = None):
         self.labels_to_split = labels_to_split
         self.window_size = window_size
         self.threshold = threshold
         self.prefix_weight = prefix_weight
         self._split_labels_to_original_labels = {}
         self.outfile = outfile
+        self.output_level = output_level
         self.label_and_id_to_event = {}
-        self.variants_to_count = {}
+        self.event_store = None
+        self.variant_index = variant_index
         self.distance_variant = distance_variant
-        self.distance_calculator = DistanceCalculator(window_size, use_combined_context)
+        # The distances of all layers are calculated in one pass, see calculate_layers
+        self.batched_distance_calculator = BatchedDistanceCalculator(window_size, use_combined_context,
+                                                                     memory_budget=memory_budget)
+        # Weight of each layer in the quality of the multiplex partition, in the order of LAYER_DISTANCES
+        self.layer_weights = [1] * len(LAYER_DISTANCES) if layer_weights is None else list(layer_weights)
         self.clustering_variant = clustering_variant
-        self._variant_to_label = {}
+        self._variant_event_to_label = {}
         self.use_frequency = use_frequency
         self.short_label_to_original_label = {}
         self.found_clustering = None
+        self.found_memberships = {}
 
-        if distance_variant is Distance.EDIT_DISTANCE:
-            self.get_distance = self.distance_calculator.get_edit_distance
-        elif distance_variant is Distance.SET_DISTANCE:
-            self.get_distance = self.distance_calculator.get_set_distance
-        elif distance_variant is Distance.MULTISET_DISTANCE:
-            self.get_distance = self.distance_calculator.get_multiset_distance
-        else:
+        if not isinstance(distance_variant, Distance):
             print('Warning: Distance metric not found, fallback to default distance')
-            self.get_distance = self.distance_calculator.get_edit_distance
 
-    def _write(self, log_entry: string) -> None:
-        self.outfile.write(f'{log_entry}\n')
+    def _write(self, log_entry: string, level: OutputLevel = OutputLevel.DEFAULT) -> None:
+        if level <= self.output_level:
+            self.outfile.write(f'{log_entry}\n')
 
     def get_split_labels_to_original_labels(self):
         self._write('Map:')
         self._write(json.dumps(self._split_labels_to_original_labels))
         return self._split_labels_to_original_labels
 
-    def split_labels(self, log):
+    def split_labels(self, log) -> RelabeledLog:
+        """
+        Splits the labels of the log, without modifying its labels
+
+        :return: Log with the split labels, as label overrides of the input log
+        """
         print('Starting label splitting')
-        layers = []
-        event_graphs = self.get_event_graphs_from_event_log(log)
-        layers.append(event_graphs)
-        for i in range(2):
-            layers.append(event_graphs.copy())
+        self.find_communities(log)
+        return self.get_relabeled_log(log)
 
-        for index, layer in enumerate(layers):
-            self.calculate_edges(layer, index)
+    def find_communities(self, log) -> None:
+        """
+        Clusters the events of each label to split, without relabeling the log yet
+        """
+        event_graphs = self.get_event_graphs_from_event_log(log)
+        layers = self.calculate_layers(event_graphs)
         self.get_communities_leiden_multiplex(layers=layers)
-        self.set_split_labels(log)
-
-        return log
 
     def get_event_graphs_from_event_log(self, log):
-        print('Variants based approach')
-        variants = variants_filter.get_variants(log)
-        event_graphs = {}
-
-        for variant in variants:
-            filtered_log = variants_filter.apply(log, [variant])
-
-            prefix = ''
-            processed_events = []
-            occurrence_counters = {}
-            for event in filtered_log[0]:
-                label = event['concept:name']
-                if 'original_label' in event.keys():
-                    self.short_label_to_original_label[label] = event['original_label']
-
-                if label not in list(event_graphs.keys()) and label in self.labels_to_split:
-                    event_graphs[label] = igraph.Graph()
-                    self.label_and_id_to_event[label] = []
-
-                for preceding_event in processed_events:
-                    preceding_event['suffix'] = preceding_event['suffix'] + label
-
-                if label not in occurrence_counters:
-                    occurrence_counters[label] = 0
-                else:
-                    occurrence_counters[label] += 1
-
-                event['prefix'] = prefix
-                event['suffix'] = ''
-                event['label'] = label
-                event['variant'] = label + '_' + str(variant).replace(',', '') + f'_{occurrence_counters[label]}'
-                self.variants_to_count[event['variant']] = len(variants[variant])
-                processed_events.append(event)
-                prefix = prefix + label
-            for event in processed_events:
-                label = event['concept:name']
-                if label in self.labels_to_split:
-                    self.label_and_id_to_event[label].append(event)
-                    event_graphs[label].add_vertices(1)
-
-        return event_graphs
-
-    def get_distance_by_index(self, index: int, event_a, event_b):
-        if index == 0:
-            return self.distance_calculator.get_edit_distance(event_a, event_b)
-        elif index == 1:
-            return self.distance_calculator.get_set_distance(event_a, event_b)
-        elif index == 2:
-            return self.distance_calculator.get_multiset_distance(event_a, event_b)
-        else:
-            print('########### Warning: Distance metric not found, fallback to default distance ###########')
-            return self.distance_calculator.get_edit_distance(event_a, event_b)
-
-    def calculate_edges(self, event_graphs, index) -> None:
+        event_graphs_variant_based = get_event_graphs_from_event_log(log, self.labels_to_split,
+                                                                     variant_index=self.variant_index)
+        self.event_store = event_graphs_variant_based.event_store
+        self.label_and_id_to_event = event_graphs_variant_based.label_and_id_to_event
+        self.short_label_to_original_label = event_graphs_variant_based.short_label_to_original_label
+        return event_graphs_variant_based.event_graphs
+
+    def calculate_layers(self, event_graphs) -> List[dict]:
+        """
+        Builds one graph per layer and label, with the vertices of the event graph of the label and the edges of the
+        distance of the layer. The distances of all layers are calculated in one pass over the signature pairs.
+
+        :return: Event graphs per label for each layer, in the order of LAYER_DISTANCES
+        """
+        layers = [{} for _ in LAYER_DISTANCES]
         for (label, graph) in event_graphs.items():
             print(f'Calculating edges for {label}')
-            edges = []
-            weights = []
-
-            for (vertex_a, vertex_b) in combinations(range(len(graph.vs)), 2):
-                edit_distance = self.get_distance_by_index(index, self.label_and_id_to_event[label][vertex_a],
-                                                           self.label_and_id_to_event[label][vertex_b])
-
-                normalized_distance = (1 - edit_distance / self.window_size)
-                if self.use_frequency:
-                    weight = normalized_distance * (
-                            self.variants_to_count[self.label_and_id_to_event[label][vertex_a]['variant']] *
-                            self.variants_to_count[self.label_and_id_to_event[label][vertex_b]['variant']])
-                else:
-                    weight = normalized_distance
-                if normalized_distance > self.threshold:
-                    edges.append((vertex_a, vertex_b))
-                    weights.append(weight)
-            if self.use_frequency:
-                for vertex_a in range(len(graph.vs)):
-                    count = self.variants_to_count[self.label_and_id_to_event[label][vertex_a]['variant']]
-                    if count > 1:
-                        ########################################################################
-                        # TODO: Check if times 2 or not!!!!!!!
-                        ########################################################################
-                        weight = ncr(count, 2) * 2
-                        edges.append((vertex_a, vertex_a))
-                        weights.append(weight)
-            graph.add_edges(edges)
-            graph.es['weight'] = weights
+            layer_distances = self.batched_distance_calculator.get_layer_signature_distances(
+                self.event_store, self.label_and_id_to_event[label], list(LAYER_DISTANCES), threshold=self.threshold)
+            for layer, context_distances in zip(layers, layer_distances):
+                # Every layer needs its own graph, the edges of the layers differ
+                layer[label] = graph.copy()
+                self.add_edges(label, layer[label], context_distances)
         print('Finished calculating edges')
+        return layers
+
+    def add_edges(self, label, graph, context_distances) -> None:
+        edges, normalized_distances = self.batched_distance_calculator.get_edges(context_distances, self.threshold,
+                                                                                 include_threshold=False)
+        if self.use_frequency:
+            counts = self.event_store.get_event_counts(self.label_and_id_to_event[label])
+            weights = normalized_distances * (counts[edges[:, 0]] * counts[edges[:, 1]])
+
+            self_edge_vertices = np.nonzero(counts > 1)[0]
+            ########################################################################
+            # TODO: Check if times 2 or not!!!!!!!
+            ########################################################################
+            self_weights = np.array([ncr(int(count), 2) * 2 for count in counts[self_edge_vertices]],
+                                    dtype=np.int64)
+            edges = np.concatenate((edges, np.column_stack((self_edge_vertices, self_edge_vertices))))
+            weights = np.concatenate((weights, self_weights))
+        else:
+            weights = normalized_distances
+        graph.add_edges(edges)
+        graph.es['weight'] = weights.tolist()
 
     def get_communities_leiden(self, event_graphs) -> None:
         print('Starting community detection')
@@ -173,25 +146,26 @@ class LabelSplitter:
             partition = la.find_partition(graph, la.ModularityVertexPartition, weights=graph.es['weight'], seed=396482)
             print(partition)
             self.found_clustering = partition
-            self._write('Found communities: \n')
-            self._write(str(partition))
+            self._write('Found communities: \n', OutputLevel.VERBOSE)
+            self._write(str(partition), OutputLevel.VERBOSE)
 
             for count, cluster in enumerate(partition):
                 self._split_labels_to_original_labels[f'{label}_{count}'] = label
                 for vertex in cluster:
-                    self.label_and_id_to_event[label][vertex]['label'] = f'{label}_{count}'
-                    self._variant_to_label[self.label_and_id_to_event[label][vertex]['variant']] = f'{label}_{count}'
+                    self._variant_event_to_label[self.label_and_id_to_event[label][vertex]] = f'{label}_{count}'
 
         self._write('\nReassigned labels')
         print('Finished community detection')
 
     def get_communities_leiden_multiplex(self, layers) -> None:
         print('Starting community detection')
-        for (label, graph) in layers[0].items():
+        for label in layers[0]:
             print(f'Getting communities for {label}')
-            graphs = [graph, layers[1][label], layers[2][label]]
+            graphs = [layer[label] for layer in layers]
+            # Each layer uses the weights of its own edges
             membership, improvement = la.find_partition_multiplex(graphs, la.ModularityVertexPartition,
-                                                                  weights=graph.es['weight'], seed=396482)
+                                                                  layer_weights=self.layer_weights,
+                                                                  weights='weight', seed=396482)
             print('membership')
             print(membership)
             print('improvement')
@@ -206,12 +180,13 @@ class LabelSplitter:
 
             print('partition')
             print(partition)
+            self.found_memberships[label] = membership
 
-            self._write('Found multiplex partition: \n')
-            self._write(str(partition))
+            self._write('Found multiplex partition: \n', OutputLevel.VERBOSE)
+            self._write(str(partition), OutputLevel.VERBOSE)
 
-            self._write('Found multiplex memberships: \n')
-            self._write(str(membership))
+            self._write('Found multiplex memberships: \n', OutputLevel.VERBOSE)
+            self._write(str(membership), OutputLevel.VERBOSE)
 
             self._write('Improvement made through multiplex optimizer:')
             self._write(str(improvement))
@@ -219,25 +194,28 @@ class LabelSplitter:
             for count, cluster in enumerate(partition):
                 self._split_labels_to_original_labels[f'{label}_{count}'] = label
                 for vertex in cluster:
-                    self.label_and_id_to_event[label][vertex]['label'] = f'{label}_{count}'
-                    self._variant_to_label[self.label_and_id_to_event[label][vertex]['variant']] = f'{label}_{count}'
+                    self._variant_event_to_label[self.label_and_id_to_event[label][vertex]] = f'{label}_{count}'
 
         self._write('\nReassigned labels')
         print('Finished community detection')
 
-    def set_split_labels(self, log):
-        variants = variants_filter.get_variants(log)
-        for variant in variants:
-            filtered_log = variants_filter.apply(log, [variant])
-            for trace in filtered_log:
-                occurrence_counters = {}
-                for event in trace:
-                    label = event['concept:name']
-                    if label not in occurrence_counters:
-                        occurrence_counters[label] = 0
-                    else:
-                        occurrence_counters[label] += 1
-                    event['variant'] = label + '_' + str(variant).replace(',', '') + f'_{occurrence_counters[label]}'
-                    if event['variant'] in self._variant_to_label:
-                        event['concept:name'] = self._variant_to_label[event['variant']]
+    def get_relabeled_log(self, log) -> RelabeledLog:
+        """
+        Applies the split labels of the events of each variant to all cases of the variant
+        """
+        variant_events = np.fromiter(self._variant_event_to_label.keys(), dtype=np.int64,
+                                     count=len(self._variant_event_to_label))
+        variants = self.event_store.case_variants[self.event_store.get_cases(variant_events)]
+        positions = self.event_store.get_positions(variant_events)
+
+        variant_to_split_labels = {}
+        for variant, position, split_label in zip(variants.tolist(), positions.tolist(),
+                                                  self._variant_event_to_label.values()):
+            variant_to_split_labels.setdefault(variant, []).append((position, split_label))
+
+        relabeled_log = RelabeledLog(log)
+        for case_index, variant in enumerate(self.event_store.case_variants.tolist()):
+            for position, split_label in variant_to_split_labels.get(variant, []):
+                relabeled_log.set_label(case_index, position, split_label)
         print('Finished setting labels')
+        return relabeled_log
@@ -1,15 +1,17 @@
-import re
+from typing import TextIO
 
 from igraph import *
-from pm4py.algo.filtering.log.variants import variants_filter
-from pm4py.objects.log.importer.xes import importer as xes_importer
 
 from evaluation.apply_im import apply_im_with_noise_and_export, \
     apply_im_without_noise_and_export, get_xixi_metrics
-from evaluation.golden_standard_model import GoldenStandardModel
+from evaluation.baseline_cache import BaselineCache
+from evaluation.golden_standard_model import GoldenStandardModel, get_precise_log_path, \
+    get_input_identifier_from_variant_input_name
+from utils.file_writer_helper import read_exported_models, restore_exported_models
 from utils.input_data import InputData
+from utils.log_registry import LogRegistry, get_log
 from pipeline.pipeline_helpers import get_imprecise_labels, get_community_similarity
-from pipeline.pipeline_variant import remove_pipeline_variant_from_string, PipelineVariant
+from pipeline.pipeline_variant import PipelineVariant
 
 
 class InputPreprocessor:
@@ -17,61 +19,60 @@ class InputPreprocessor:
         self.input_data: InputData = input_data
 
     def preprocess_input(self) -> None:
-        with open(f'./outputs/{self.input_data.input_name}.txt', 'a') as outfile:
-            original_log = self.input_data.original_log
-
-            xixi_precision = 0
-            xixi_ari = 0
-            ground_truth_precision = 0
-            labels_to_split = self.input_data.labels_to_split
-            ground_truth_model = None
-            xixi_clustering = None
-            original_labels = None
-            ground_truth_clustering = None
-
-            if not self.input_data.labels_to_split:
-                labels_to_split = get_imprecise_labels(original_log)
-                ground_truth_model = GoldenStandardModel(self.input_data.input_name, '', self.input_data.log_path,
-                                                         labels_to_split)
-                ground_truth_precision = ground_truth_model.evaluate_golden_standard_model()
-
-                xixi_precision, xixi_clustering = get_xixi_metrics(labels_to_split, self.input_data)
-
-                export_model_from_original_log_with_precise_labels(self.input_data.input_name, self.input_data.log_path,
-                                                                   self.input_data.use_noise)
-
-                original_labels = self.get_original_labels(labels_to_split)
-                outfile.write('\n Original Labels:\n')
-                outfile.write(f'{str(original_labels)}\n')
-
-                ground_truth_clustering = self.get_ground_truth_clustering(original_labels, labels_to_split)
-                outfile.write('\n Ground truth clustering clustering:\n')
-                outfile.write(f'{str(ground_truth_clustering)}\n')
-
-                xixi_ari = get_community_similarity(ground_truth_clustering, xixi_clustering)
-                outfile.write('\n Xixi Adjusted Rand Index:\n')
-                outfile.write(f'{xixi_ari}\n')
-
-
-            self.input_data.original_labels = original_labels
-            self.input_data.xixi_precision = xixi_precision
-            self.input_data.ground_truth_precision = ground_truth_precision
-            self.input_data.ground_truth_model = ground_truth_model
-            self.input_data.labels_to_split = labels_to_split
-            self.input_data.original_labels = original_labels
-            self.input_data.ground_truth_clustering = ground_truth_clustering
-            self.input_data.xixi_clustering = xixi_clustering
-            self.input_data.xixi_ari = xixi_ari
+        outfile = self.input_data.result_sink.outfile
+        original_log = self.input_data.original_log
+
+        xixi_precision = 0
+        xixi_ari = 0
+        ground_truth_precision = 0
+        labels_to_split = self.input_data.labels_to_split
+        ground_truth_model = None
+        xixi_clustering = None
+        original_labels = None
+        ground_truth_clustering = None
+
+        if not self.input_data.labels_to_split:
+            labels_to_split = get_imprecise_labels(original_log)
+            ground_truth_model = GoldenStandardModel(self.input_data.input_name, '', self.input_data.log_path,
+                                                     labels_to_split, self.input_data.baseline_cache,
+                                                     self.input_data.log_registry)
+            ground_truth_precision = ground_truth_model.evaluate_golden_standard_model(outfile)
+
+            xixi_precision, xixi_clustering = get_xixi_metrics(labels_to_split, self.input_data)
+
+            export_model_from_original_log_with_precise_labels(self.input_data.input_name, self.input_data.log_path,
+                                                               outfile, self.input_data.use_noise,
+                                                               self.input_data.baseline_cache,
+                                                               self.input_data.log_registry)
+
+            original_labels = self.get_original_labels(labels_to_split)
+            outfile.write('\n Original Labels:\n')
+            outfile.write(f'{str(original_labels)}\n')
+
+            ground_truth_clustering = self.get_ground_truth_clustering(original_labels, labels_to_split)
+            outfile.write('\n Ground truth clustering clustering:\n')
+            outfile.write(f'{str(ground_truth_clustering)}\n')
+
+            xixi_ari = get_community_similarity(ground_truth_clustering, xixi_clustering)
+            outfile.write('\n Xixi Adjusted Rand Index:\n')
+            outfile.write(f'{xixi_ari}\n')
+
+
+        self.input_data.original_labels = original_labels
+        self.input_data.xixi_precision = xixi_precision
+        self.input_data.ground_truth_precision = ground_truth_precision
+        self.input_data.ground_truth_model = ground_truth_model
+        self.input_data.labels_to_split = labels_to_split
+        self.input_data.original_labels = original_labels
+        self.input_data.ground_truth_clustering = ground_truth_clustering
+        self.input_data.xixi_clustering = xixi_clustering
+        self.input_data.xixi_ari = xixi_ari
 
     def get_original_labels(self, labels_to_split):
         original_labels = set()
-        log = self.input_data.original_log
-
-        variants = variants_filter.get_variants(log)
 
-        for variant in variants:
-            filtered_log = variants_filter.apply(log, [variant])
-            for event in filtered_log[0]:
+        for trace, _ in self.input_data.variant_index.get_representative_traces():
+            for event in trace:
                 if event['concept:name'] in labels_to_split:
                     original_labels.add(event['OrgLabel'])
         return list(original_labels)
@@ -79,12 +80,10 @@ class InputPreprocessor:
     def get_ground_truth_clustering(self, original_labels, labels_to_split):
         log = self.input_data.original_log
         ground_truth_clustering = []
-        variants = variants_filter.get_variants(log)
 
         if self.input_data.pipeline_variant != PipelineVariant.EVENTS:
-            for variant in variants:
-                filtered_log = variants_filter.apply(log, [variant])
-                for event in filtered_log[0]:
+            for trace, _ in self.input_data.variant_index.get_representative_traces():
+                for event in trace:
                     if event['concept:name'] in labels_to_split:
                         ground_truth_clustering.append(original_labels.index(event['OrgLabel']))
         else:
@@ -107,17 +106,30 @@ class InputPreprocessor:
         return False
 
 
-def export_model_from_original_log_with_precise_labels(input_name, path, use_noise=True):
-    with open(f'./outputs/{input_name}.txt', 'a') as outfile:
-        outfile.write('\n Data from log without imprecise labels\n')
-        original_input_name = remove_pipeline_variant_from_string(input_name)
-        original_input_name = re.sub(r'.*/', '', original_input_name)
-
-        pattern = original_input_name + r'.*'
-        log_path = re.sub(pattern, f'{original_input_name}_Log.xes.gz', path)
-        original_log = xes_importer.apply(log_path)
-        if use_noise:
-            apply_im_with_noise_and_export(input_name, 'original_log_precise_labels', original_log, original_log,
-                                           outfile, labels_to_original={})
-        apply_im_without_noise_and_export(input_name, 'original_log_precise_labels', original_log, original_log,
-                                          outfile, labels_to_original={})
+def export_model_from_original_log_with_precise_labels(input_name, path, outfile: TextIO, use_noise=True,
+                                                       baseline_cache: BaselineCache = None,
+                                                       log_registry: LogRegistry = None):
+    """
+    Mines, evaluates and exports the models of the log with precise labels.
+    With a baseline cache this is skipped if the models were exported from the same log in an earlier run, the
+    exported model files are written again from the cache instead.
+    """
+    log_path = get_precise_log_path(get_input_identifier_from_variant_input_name(input_name), path)
+    parameters = [input_name, use_noise]
+    outfile.write('\n Data from log without imprecise labels\n')
+    exported_models = baseline_cache.get('precise_labels_model', [log_path], parameters) \
+        if baseline_cache is not None else None
+    if exported_models is not None:
+        restore_exported_models(exported_models)
+        outfile.write('Models exported in an earlier run, restored from baseline cache\n')
+        return
+
+    original_log = get_log(log_path, log_registry)
+    if use_noise:
+        apply_im_with_noise_and_export(input_name, 'original_log_precise_labels', original_log, original_log,
+                                       outfile, labels_to_original={})
+    apply_im_without_noise_and_export(input_name, 'original_log_precise_labels', original_log, original_log,
+                                      outfile, labels_to_original={})
+    if baseline_cache is not None:
+        baseline_cache.set('precise_labels_model', [log_path], parameters,
+                           read_exported_models('original_log_precise_labels'))
@@ -1,23 +1,28 @@
+import hashlib
+import json
 import os
 import re
+from typing import Dict, List
 
 from igraph import Clustering, compare_communities
 from pm4py.algo.discovery.inductive import algorithm as inductive_miner
-from pm4py.algo.filtering.log.variants import variants_filter
+from pm4py.objects.log.obj import Event
 
+from evaluation.model_cache import ModelCache
+from utils.columnar_log import COLUMNAR_CACHE_SUFFIX
 from utils.input_data import InputData
+from utils.relabeled_log import RelabeledLog
+from utils.variant_index import get_variant_index
 from pipeline.pipeline_variant import PipelineVariant
 
 
 def get_clustering_from_xixi_log(log, labels_to_split, outfile, input_data: InputData):
-    variants = variants_filter.get_variants(log)
     clustering = []
     split_labels = []
 
     if input_data.pipeline_variant != PipelineVariant.EVENTS:
-        for variant in variants:
-            filtered_log = variants_filter.apply(log, [variant])
-            for event in filtered_log[0]:
+        for trace, _ in get_variant_index(log).get_representative_traces():
+            for event in trace:
                 label = event['concept:name']
                 if label[0] in labels_to_split:
                     if label not in split_labels:
@@ -37,11 +42,24 @@ def get_clustering_from_xixi_log(log, labels_to_split, outfile, input_data: Inpu
     return Clustering(clustering)
 
 
+def get_partition_key(memberships: Dict[str, List[int]]) -> str:
+    """
+    Hash of the clusterings of all split labels. The clusters are renumbered by their first occurrence,
+    so equal partitions get the same key, independent of the numbering of the clusters by the clustering method.
+    """
+    canonical_memberships = []
+    for label, membership in memberships.items():
+        cluster_ids = {}
+        canonical_memberships.append([label, [cluster_ids.setdefault(cluster, len(cluster_ids))
+                                              for cluster in membership]])
+    return hashlib.sha256(json.dumps(canonical_memberships).encode()).hexdigest()
+
+
 def get_tuples_for_folder(folder_path, prefix):
     log_list = []
     identifier_pattern = f'^(\w+_\d+)'
     for f in os.listdir(folder_path):
-        if 'LogD' in f:
+        if 'LogD' in f and not f.endswith(COLUMNAR_CACHE_SUFFIX):
             log_list.append((f'{prefix}/{re.match(identifier_pattern, f).group(1)}', f'{folder_path}{f}'))
     return log_list
 
@@ -51,44 +69,46 @@ def get_community_similarity(comm1: Clustering, comm2: Clustering, method='adjus
 
 
 def get_concurrent_labels(input_data: InputData, threshold: float = 0.85):
-    with open(f'./outputs/{input_data.input_name}.txt', 'a') as outfile:
-        variants = variants_filter.get_variants(input_data.original_log)
-        predecessor_count = {}
-        successor_count = {}
-        concurrent_labels = []
-
-        for variant in variants:
-            filtered_log = variants_filter.apply(input_data.original_log, [variant])
-            last_label = ''
-            for event in filtered_log[0]:
-                label = event['concept:name']
-                if not label in predecessor_count:
-                    predecessor_count[label] = 0
-                    successor_count[label] = 0
-
-                if last_label:
-                    if label in input_data.labels_to_split:
-                        predecessor_count[last_label] += len(variants[variant])
-                    if last_label in input_data.labels_to_split:
-                        successor_count[label] += len(variants[variant])
-                last_label = label
-
-        labels = set(successor_count.keys()) | set(predecessor_count.keys())
-
-        for label in labels:
-            total_count = predecessor_count[label] + successor_count[label]
-            if total_count == 0:
-                continue
-            directly_follows_ratio = abs((predecessor_count[label] - successor_count[label]) / total_count)
-            if directly_follows_ratio < threshold and label not in input_data.labels_to_split:
-                concurrent_labels.append(label)
-        outfile.write('\n Concurrent labels:\n')
-        outfile.write(f'{str(concurrent_labels)}\n')
+    outfile = input_data.result_sink.outfile
+    predecessor_count = {}
+    successor_count = {}
+    concurrent_labels = []
+
+    for trace, count in input_data.variant_index.get_representative_traces():
+        last_label = ''
+        for event in trace:
+            label = event['concept:name']
+            if not label in predecessor_count:
+                predecessor_count[label] = 0
+                successor_count[label] = 0
+
+            if last_label:
+                if label in input_data.labels_to_split:
+                    predecessor_count[last_label] += count
+                if last_label in input_data.labels_to_split:
+                    successor_count[label] += count
+            last_label = label
+
+    labels = set(successor_count.keys()) | set(predecessor_count.keys())
+
+    for label in labels:
+        total_count = predecessor_count[label] + successor_count[label]
+        if total_count == 0:
+            continue
+        directly_follows_ratio = abs((predecessor_count[label] - successor_count[label]) / total_count)
+        if directly_follows_ratio < threshold and label not in input_data.labels_to_split:
+            concurrent_labels.append(label)
+    outfile.write('\n Concurrent labels:\n')
+    outfile.write(f'{str(concurrent_labels)}\n')
     return concurrent_labels
 
 
-def filter_duplicate_xor(event_log, labels_to_split, clustering: Clustering):
-    net, initial_marking, final_marking = inductive_miner.apply(event_log)
+def filter_duplicate_xor(event_log, labels_to_split, clustering: Clustering, model_cache: ModelCache = None,
+                         relabeled_log: RelabeledLog = None):
+    if model_cache is not None:
+        net, initial_marking, final_marking = model_cache.get_petri_net(event_log)
+    else:
+        net, initial_marking, final_marking = inductive_miner.apply(event_log)
 
     seen_transitions = []
     updated_label_mapping = {}
@@ -123,10 +143,17 @@ def filter_duplicate_xor(event_log, labels_to_split, clustering: Clustering):
 
     if must_update_log:
         for trace in event_log:
-            for event in trace:
+            for position, event in enumerate(trace):
                 label = event['concept:name']
                 if label[0] in labels_to_split:
+                    # Replaced by a copy, the events of a relabeled log can be shared with the original log
+                    event = Event(event)
                     event['concept:name'] = updated_label_mapping[next(re.finditer(r'\d+$', label)).group(0)]
+                    trace[position] = event
+        if relabeled_log is not None:
+            # Keeps the overrides of the relabeled log in line with the merged labels of the event log
+            relabeled_log.rename_labels({label: updated_label_mapping[next(re.finditer(r'\d+$', label)).group(0)]
+                                         for label in relabeled_log.labels if label[0] in labels_to_split})
         new_clustering = []
         for i in range(len(clustering.membership)):
             m = clustering.membership[i]
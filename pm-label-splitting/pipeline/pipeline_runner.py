@@ -1,61 +1,106 @@
 import copy
-import csv
 import time
-from typing import List, Tuple
-
-from pm4py.algo.discovery.inductive import algorithm as inductive_miner
-from pm4py.objects.log.exporter.xes import exporter as xes_exporter
-from pm4py.objects.log.importer.xes import importer as xes_importer
-from pm4py.objects.log.obj import EventLog
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+from typing import Dict, List, Tuple, Iterator
 
 import pipeline.clustering_method
 from evaluation.apply_im import apply_im_without_noise_and_evaluate
+from evaluation.baseline_cache import BaselineCache
 from pipeline import clustering_method
 from pipeline.input_preprocessor import InputPreprocessor
 from label_splitter.distance_metrics import Distance
 from label_splitter.event_graphs_variant_based import get_event_graphs_from_event_log, EventGraphsVariantBased
 from label_splitter.label_splitter_event_based import LabelSplitter as LabelSplitterEventBased
-from label_splitter.label_splitter_variant_based import LabelSplitter as LabelSplitterVariantBased
+from label_splitter.label_splitter_variant_based import DEFAULT_CPM_RESOLUTION, \
+    LabelSplitter as LabelSplitterVariantBased
 from label_splitter.label_splitter_variant_multiplex import LabelSplitter as LabelSplitterVariantMultiplex
-from pipeline.pipeline_helpers import get_tuples_for_folder, get_community_similarity, filter_duplicate_xor
+from pipeline.pipeline_helpers import get_tuples_for_folder, get_community_similarity, filter_duplicate_xor, \
+    get_partition_key
 from pipeline.pipeline_variant import PipelineVariant
 from utils.file_writer_helper import get_config_string, write_summary_file, \
     write_summary_file_with_parameters, run_start_string, setup_result_folder, export_models_and_pngs
 from utils.input_data import InputData
+from utils.log_registry import LogRegistry
+from utils.relabeled_log_exporter import SplitLogExport, export_relabeled_log, export_label_mapping
+from utils.result_sink import OutputLevel, ResultSink, RESULT_COLUMNS
+from utils.variant_index import get_variant_index
+
+WINDOW_SIZES = [1, 3, 5]
+DISTANCES = [Distance.EDIT_DISTANCE, Distance.SET_DISTANCE, Distance.MULTISET_DISTANCE]
+THRESHOLDS = [0, 0.25, 0.5, 0.75, 1]
 
 
-def run_pipeline_for_artificial_event_logs(input_paths: List[Tuple[str, str]]) -> None:
+def run_pipeline_for_artificial_event_logs(input_paths: List[Tuple[str, str]], number_of_workers: int = 1,
+                                           conformance_workers: int = 1) -> None:
     """
     Runs pipeline for set of artificial data
     :param input_paths: list of tuples of path and input prefix
+    :param number_of_workers: number of processes used to run the parameter space of each log
+    :param conformance_workers: number of processes used to replay the variants when evaluating a model
     """
     for path, prefix in input_paths:
         input_list = get_tuples_for_folder(path, prefix)[::-1]
         apply_pipeline_to_folder(input_list, prefix, PipelineVariant.VARIANTS, labels_to_split=[], use_noise=False,
-                                 use_frequency=True)
+                                 use_frequency=True, number_of_workers=number_of_workers,
+                                 conformance_workers=conformance_workers)
 
 
-def run_pipeline_for_real_log(input_name: str, log_path: str, folder_name: str) -> None:
+def run_pipeline_for_real_log(input_name: str, log_path: str, folder_name: str, number_of_workers: int = 1,
+                              conformance_workers: int = 1, labels_to_split: List[str] = None,
+                              label_workers: int = 1) -> None:
     """
     Runs the pipeline for a real log / individual log
 
     :param input_name: name to identify the log with
     :param log_path: path to the input event log
     :param folder_name: folder to associate with the log for the outputs
+    :param number_of_workers: number of processes used to run the parameter space
+    :param conformance_workers: number of processes used to replay the variants when evaluating a model
+    :param labels_to_split: labels split together in one run, ['9'] by default
+    :param label_workers: number of processes used to find the communities of the labels to split
     """
+    if labels_to_split is None:
+        labels_to_split = ['9']
     apply_pipeline_to_folder([(input_name, log_path)], folder_name,
                              PipelineVariant.VARIANTS,
-                             labels_to_split=['9'],
+                             labels_to_split=labels_to_split,
                              use_frequency=True,
-                             use_noise=False)
+                             use_noise=False,
+                             number_of_workers=number_of_workers,
+                             conformance_workers=conformance_workers,
+                             label_workers=label_workers)
 
 
 def apply_pipeline_to_folder(input_list: List[Tuple[str, str]], folder_name: str, pipeline_variant: PipelineVariant,
                              labels_to_split: List[str] = None, use_frequency: bool = True,
-                             use_noise: bool = True) -> None:
+                             use_noise: bool = True, number_of_workers: int = 1,
+                             conformance_workers: int = 1,
+                             split_log_export: SplitLogExport = SplitLogExport.ALL,
+                             output_level: OutputLevel = OutputLevel.VERBOSE,
+                             warm_start_leiden: bool = False,
+                             use_threshold_path: bool = False,
+                             use_node_sizes: bool = False,
+                             label_workers: int = 1,
+                             baseline_cache_folder: str = None,
+                             use_columnar_cache: bool = False,
+                             cpm_resolution: float = DEFAULT_CPM_RESOLUTION) -> None:
     """
     Apply the whole pipeline to a folder of artificial event log.
     Sets up the output folder, input data for each log and applies the algorithm on the defined parameter space.
+
+    :param split_log_export: which split logs are exported, every split log, the best one, label mappings or none
+    :param output_level: level of detail of the text output, OutputLevel.DEFAULT skips the found partitions
+    :param warm_start_leiden: start the community detection of each threshold from the partition of the previous one
+    :param use_threshold_path: find the partitions of all thresholds of a cell on one event graph per label
+    :param use_node_sizes: use the variant frequencies as node sizes of a CPM objective instead of self-loops, this
+        replaces the modularity by CPM, so the partitions can differ
+    :param label_workers: number of processes used to find the communities of the labels to split
+    :param baseline_cache_folder: folder in which the baseline results are kept across runs, e.g.,
+        DEFAULT_BASELINE_CACHE_FOLDER, without a folder the baseline is computed in every run
+    :param use_columnar_cache: import the logs from a columnar cache next to the log files, which only keeps the
+        activity, original label, timestamp and case id
+    :param cpm_resolution: resolution of the CPM objective with node sizes
     """
     if labels_to_split is None:
         labels_to_split = []
@@ -65,17 +110,25 @@ def apply_pipeline_to_folder(input_list: List[Tuple[str, str]], folder_name: str
     print("Starting pipeline")
     for (name, path) in input_list:
         input_data, input_preprocessor = set_up_input_data(folder_name, labels_to_split, name, path, pipeline_variant,
-                                                           use_frequency, use_noise)
+                                                           use_frequency, use_noise, number_of_workers,
+                                                           conformance_workers, split_log_export, output_level,
+                                                           warm_start_leiden, use_threshold_path, use_node_sizes,
+                                                           label_workers, baseline_cache_folder,
+                                                           use_columnar_cache, cpm_resolution)
 
         if input_preprocessor.has_duplicate_xor():
             print('############## Skipped ######################')
             print('Duplicate XOR found, skipping model')
+            input_data.result_sink.close()
             with open(f'./outputs/best_results/{input_data.summary_file_name}', 'a') as outfile:
                 outfile.write(
                     f'´\n----------------Skipped Model {input_data.input_name} because of duplicate label ------------------------\n')
             continue
 
-        best_score, best_precision, best_configs = run_pipeline_on_parameter_space(input_data)
+        try:
+            best_score, best_precision, best_configs = run_pipeline_on_parameter_space(input_data)
+        finally:
+            input_data.result_sink.close()
         try:
             write_summary_file_with_parameters(best_configs, best_score, best_precision, name,
                                                input_data.summary_file_name)
@@ -91,7 +144,14 @@ def apply_pipeline_to_folder(input_list: List[Tuple[str, str]], folder_name: str
 
 
 def set_up_input_data(folder_name: str, labels_to_split: List[str], name: str, path: str,
-                      pipeline_variant: PipelineVariant, use_frequency: bool, use_noise: bool) -> Tuple[
+                      pipeline_variant: PipelineVariant, use_frequency: bool, use_noise: bool,
+                      number_of_workers: int = 1, conformance_workers: int = 1,
+                      split_log_export: SplitLogExport = SplitLogExport.ALL,
+                      output_level: OutputLevel = OutputLevel.VERBOSE,
+                      warm_start_leiden: bool = False, use_threshold_path: bool = False,
+                      use_node_sizes: bool = False, label_workers: int = 1,
+                      baseline_cache_folder: str = None, use_columnar_cache: bool = False,
+                      cpm_resolution: float = DEFAULT_CPM_RESOLUTION) -> Tuple[
     InputData, InputPreprocessor]:
     """
     Generates the input data used throughout the pipeline for one event log.
@@ -106,14 +166,29 @@ def set_up_input_data(folder_name: str, labels_to_split: List[str], name: str, p
                            use_frequency=use_frequency,
                            use_noise=use_noise,
                            max_number_of_traces=5000000,
-                           folder_name=folder_name)
-    input_data.original_log = xes_importer.apply(input_data.log_path, parameters={
-        xes_importer.Variants.ITERPARSE.value.Parameters.MAX_TRACES: input_data.max_number_of_traces})
+                           folder_name=folder_name,
+                           number_of_workers=number_of_workers,
+                           conformance_workers=conformance_workers,
+                           split_log_export=split_log_export,
+                           output_level=output_level,
+                           warm_start_leiden=warm_start_leiden,
+                           use_threshold_path=use_threshold_path,
+                           use_node_sizes=use_node_sizes,
+                           cpm_resolution=cpm_resolution,
+                           label_workers=label_workers,
+                           baseline_cache=BaselineCache(baseline_cache_folder))
+    input_data.log_registry = LogRegistry(input_data.max_number_of_traces, use_columnar_cache)
+    input_data.original_log = input_data.log_registry.get_log(input_data.log_path)
+    input_data.variant_index = get_variant_index(input_data.original_log)
     input_data.input_name = f'{input_data.original_input_name}_{input_data.pipeline_variant}' if use_frequency else f'{input_data.original_input_name}_{input_data.pipeline_variant}'
     input_data.use_combined_context = False
     input_data.concurrent_labels = []
     summary_file_name = f'{folder_name}_{pipeline_variant}.txt' if use_frequency else f'{folder_name}_{pipeline_variant}.txt'
     input_data.summary_file_name = summary_file_name
+    input_data.result_sink = ResultSink(f'./outputs/{input_data.input_name}.txt',
+                                        get_results_csv_path(input_data),
+                                        get_results_jsonl_path(input_data),
+                                        output_level)
 
     input_preprocessor = InputPreprocessor(input_data)
     input_preprocessor.preprocess_input()
@@ -124,139 +199,320 @@ def set_up_input_data(folder_name: str, labels_to_split: List[str], name: str, p
 def run_pipeline_on_parameter_space(input_data: InputData):
     """
     Runs the pipeline for one input data object on the whole parameter space.
+    With input_data.number_of_workers > 1 the (window_size, distance) cells are run in a process pool.
 
     :return: Best results found and the configs used for the result
     """
-    with open(f'./outputs/{input_data.input_name}.txt', 'a') as outfile:
-        print(f'Starting pipeline for {input_data.input_name}')
-        outfile.write(run_start_string())
+    print(f'Starting pipeline for {input_data.input_name}')
+    input_data.result_sink.write(run_start_string())
 
     best_precision = 0
     best_score = 0
     best_configs = []
     input_data.use_frequency = True
 
-    event_graphs_variant_based = get_event_graphs_from_event_log(input_data.original_log, input_data.labels_to_split)
-
-    for label in input_data.labels_to_split:
-        for window_size in [1, 3, 5]:
-            for distance in [Distance.EDIT_DISTANCE,
-                             Distance.SET_DISTANCE,
-                             Distance.MULTISET_DISTANCE]:
-                for threshold in [0, 0.25, 0.5, 0.75, 1]:
-                    try:
-                        log = copy.deepcopy(input_data.original_log)
-
-                        found_score, precision, f1_scores_refined = apply_pipeline_to_log(input_data, log, distance,
-                                                                                          window_size, threshold,
-                                                                                          best_score,
-                                                                                          event_graphs_variant_based)
-
-                        config_string = get_config_string(clustering_method.ClusteringMethod.COMMUNITY_DETECTION,
-                                                          distance,
-                                                          input_data.labels_to_split, input_data.max_number_of_traces,
-                                                          input_data.log_path, threshold, window_size,
-                                                          use_frequency=input_data.use_frequency)
-                        if found_score > best_score:
-                            best_configs = [config_string]
-                            best_score = found_score
-                            best_precision = precision
-                        elif round(found_score, 2) == round(best_score, 2):
-                            best_configs.append(config_string)
-                    except Exception as e:
-                        print('----------------Exception occurred while running pipeline ------------------------')
-                        print(repr(e))
-
-                        with open(f'./outputs/{input_data.input_name}.txt', 'a') as outfile:
-                            outfile.write(f'´\n----------------Exception occurred------------------------\n')
-                            outfile.write(f'{window_size}\n')
-                            outfile.write(f'{threshold}\n')
-                            outfile.write(f'{distance}\n')
-                            outfile.write(f'{input_data.use_combined_context}\n')
-                        continue
-
-    with open(f'./outputs/{input_data.input_name}.txt', 'a') as outfile:
-        outfile.write('Best precision found:\n')
-        outfile.write(str(best_precision))
+    # The variant index of the evaluation is also used for the event graphs, so both share the same variants
+    event_graphs_variant_based = get_event_graphs_from_event_log(input_data.original_log, input_data.labels_to_split,
+                                                                 variant_index=input_data.variant_index)
+
+    # Every cell splits all labels to split at once
+    grid = [(window_size, distance)
+            for window_size in WINDOW_SIZES
+            for distance in DISTANCES] if input_data.labels_to_split else []
+
+    if grid:
+        # Evaluated once before the grid, so the workers of the parallel grid get the results with the input data
+        try:
+            calculate_unrefined_log_precision(input_data, event_graphs_variant_based)
+        except Exception as e:
+            print('----------------Exception occurred while evaluating the unrefined log ------------------------')
+            print(repr(e))
+            input_data.result_sink.write(f'´\n----------------Exception occurred------------------------\n')
+            input_data.result_sink.write(f'{repr(e)}\n')
+
+    if input_data.number_of_workers > 1:
+        cell_results = run_grid_cells_in_parallel(input_data, event_graphs_variant_based, grid)
+    else:
+        cell_results = run_grid_cells(input_data, event_graphs_variant_based, grid)
+
+    for (window_size, distance), threshold_results in zip(grid, cell_results):
+        for threshold, found_score, precision in threshold_results:
+            config_string = get_config_string(clustering_method.ClusteringMethod.COMMUNITY_DETECTION,
+                                              distance,
+                                              input_data.labels_to_split, input_data.max_number_of_traces,
+                                              input_data.log_path, threshold, window_size,
+                                              use_frequency=input_data.use_frequency)
+            if found_score > best_score:
+                best_configs = [config_string]
+                best_score = found_score
+                best_precision = precision
+            elif round(found_score, 2) == round(best_score, 2):
+                best_configs.append(config_string)
+
+    input_data.result_sink.write('Best precision found:\n')
+    input_data.result_sink.write(str(best_precision))
     return best_score, best_precision, best_configs
 
 
+def run_grid_cells(input_data: InputData, event_graphs_variant_based: EventGraphsVariantBased,
+                   grid: List[Tuple[int, Distance]]) -> Iterator[List[Tuple[float, float, float]]]:
+    """
+    Runs the cells of the parameter grid one after another, writing directly to the result sink of the input
+    """
+    best_score = 0
+    for window_size, distance in grid:
+        threshold_results = run_grid_cell(input_data, event_graphs_variant_based, window_size, distance,
+                                          best_score, input_data.result_sink)
+        for _, found_score, _ in threshold_results:
+            best_score = max(best_score, found_score)
+        yield threshold_results
+
+
+def run_grid_cells_in_parallel(input_data: InputData, event_graphs_variant_based: EventGraphsVariantBased,
+                               grid: List[Tuple[int, Distance]]) -> Iterator[List[Tuple[float, float, float]]]:
+    """
+    Runs the cells of the parameter grid in a process pool.
+    The input data and event graphs are passed once to every worker, not with every task. The workers write into
+    in-memory result sinks, which are appended to the result sink of the input in the order of the grid.
+    Every cell starts from the results per partition known before the grid, so its output does not depend on the
+    scheduling. A partition found first by an earlier cell of the grid is marked as partition cache hit by the parent,
+    as in a serial run, but the worker of the later cell has still evaluated and exported it.
+    The model cache is stored by a manager and shared by all workers, so a split log evaluated by one worker is
+    reused by the others.
+    Each worker exports the models of the configurations better than the best it has seen, i.e., a superset of the
+    models exported by a serial run.
+    """
+    partition_cache_hit_index = RESULT_COLUMNS.index('Partition cache hit')
+    with Manager() as manager:
+        worker_input_data = copy.copy(input_data)
+        worker_input_data.model_cache = input_data.model_cache.share(manager)
+        try:
+            with ProcessPoolExecutor(max_workers=input_data.number_of_workers,
+                                     initializer=_init_grid_worker,
+                                     initargs=(worker_input_data, event_graphs_variant_based)) as executor:
+                for threshold_results, output, records, partition_keys, partition_results in \
+                        executor.map(_run_grid_cell_in_worker, grid):
+                    for record, partition_key in zip(records, partition_keys):
+                        if partition_key in input_data.partition_results:
+                            record[partition_cache_hit_index] = True
+                    for partition_key, results in partition_results.items():
+                        input_data.partition_results.setdefault(partition_key, results)
+                    input_data.result_sink.write_buffered(output, records)
+                    yield threshold_results
+        finally:
+            input_data.model_cache.update(worker_input_data.model_cache)
+
+
+_grid_worker_state = {}
+
+
+def _init_grid_worker(input_data: InputData, event_graphs_variant_based: EventGraphsVariantBased) -> None:
+    _grid_worker_state['input_data'] = input_data
+    _grid_worker_state['event_graphs_variant_based'] = event_graphs_variant_based
+    _grid_worker_state['partition_results'] = input_data.partition_results
+
+
+def _run_grid_cell_in_worker(cell: Tuple[int, Distance]) -> Tuple[List[Tuple[float, float, float]], str,
+                                                                  List[list], List[str],
+                                                                  Dict[str, Tuple[float, float, float, float, float]]]:
+    """
+    :return: Threshold results, buffered output and result records of the cell, the partition key of every record and
+    the results of the partitions evaluated by the cell
+    """
+    window_size, distance = cell
+    input_data = _grid_worker_state['input_data']
+    known_partition_results = _grid_worker_state['partition_results']
+    input_data.partition_results = dict(known_partition_results)
+    result_sink = ResultSink(output_level=input_data.output_level)
+    threshold_results = run_grid_cell(input_data, _grid_worker_state['event_graphs_variant_based'],
+                                      window_size, distance, 0, result_sink)
+    output, records = result_sink.get_buffered()
+    partition_results = {partition_key: results for partition_key, results in input_data.partition_results.items()
+                         if partition_key not in known_partition_results}
+    return threshold_results, output, records, result_sink.get_partition_keys(), partition_results
+
+
+def run_grid_cell(input_data: InputData, event_graphs_variant_based: EventGraphsVariantBased, window_size: int,
+                  distance: Distance, best_score: float,
+                  result_sink: ResultSink) -> List[Tuple[float, float, float]]:
+    """
+    Runs the pipeline for all thresholds of one (window_size, distance) cell of the parameter grid.
+    The distances between the events are only used by the thresholds of the cell, they are released afterwards.
+
+    :return: Threshold, ARI and precision of every threshold that ran without exception
+    """
+    try:
+        return run_grid_cell_thresholds(input_data, event_graphs_variant_based, window_size, distance, best_score,
+                                        result_sink)
+    finally:
+        event_graphs_variant_based.clear_context_distances()
+
+
+def run_grid_cell_thresholds(input_data: InputData, event_graphs_variant_based: EventGraphsVariantBased,
+                             window_size: int, distance: Distance, best_score: float,
+                             result_sink: ResultSink) -> List[Tuple[float, float, float]]:
+    threshold_memberships = {}
+    if input_data.use_threshold_path and input_data.pipeline_variant == PipelineVariant.VARIANTS:
+        path_splitter = get_label_splitter(distance, input_data, result_sink.outfile, min(THRESHOLDS), window_size,
+                                           event_graphs_variant_based, result_sink.output_level)
+        threshold_memberships = dict(zip(THRESHOLDS, path_splitter.get_threshold_path(THRESHOLDS)))
+
+    threshold_results = []
+    for threshold in THRESHOLDS:
+        try:
+            found_score, precision, f1_scores_refined = apply_pipeline_to_log(input_data, distance,
+                                                                              window_size, threshold,
+                                                                              best_score,
+                                                                              event_graphs_variant_based,
+                                                                              result_sink,
+                                                                              threshold_memberships.get(threshold))
+            threshold_results.append((threshold, found_score, precision))
+            best_score = max(best_score, found_score)
+        except Exception as e:
+            print('----------------Exception occurred while running pipeline ------------------------')
+            print(repr(e))
+
+            result_sink.write(f'´\n----------------Exception occurred------------------------\n')
+            result_sink.write(f'{window_size}\n')
+            result_sink.write(f'{threshold}\n')
+            result_sink.write(f'{distance}\n')
+            result_sink.write(f'{input_data.use_combined_context}\n')
+            continue
+    return threshold_results
+
+
 def apply_pipeline_to_log(input_data: InputData,
-                          log: EventLog,
                           distance_variant: Distance,
                           window_size: int,
                           threshold: float,
                           best_score: float,
-                          event_graphs_variant_based: EventGraphsVariantBased):
+                          event_graphs_variant_based: EventGraphsVariantBased,
+                          result_sink: ResultSink,
+                          memberships: Dict[str, List[int]] = None):
     """
-    Applies the algorithm with the specified to the input event log
+    Applies the algorithm with the specified to the input event log.
+    The original log is not modified, the split log is materialized from the label overrides of the label splitter.
+
+    :param memberships: communities per label found before, e.g., on the threshold path of the cell
 
     :return: ARI, precision and F1-scores of the model generated from the refined event log
     """
-    with open(f'./outputs/{input_data.input_name}.txt', 'a') as outfile:
-        outfile.write(get_config_string(clustering_method.ClusteringMethod.COMMUNITY_DETECTION, distance_variant,
-                                        input_data.labels_to_split, input_data.max_number_of_traces,
-                                        input_data.log_path, threshold, window_size, input_data.use_frequency))
-        start = time.time()
-        # Apply the label splitting algorithm
-        label_splitter = get_label_splitter(distance_variant, input_data, outfile,
-                                            threshold, window_size, event_graphs_variant_based)
-
-        split_log = label_splitter.split_labels(log)
-        split_log_clustering = filter_duplicate_xor(split_log, input_data.labels_to_split,
-                                                    label_splitter.found_clustering)
-        end = time.time()
-        runtime = end - start
+    outfile = result_sink.outfile
+    outfile.write(get_config_string(clustering_method.ClusteringMethod.COMMUNITY_DETECTION, distance_variant,
+                                    input_data.labels_to_split, input_data.max_number_of_traces,
+                                    input_data.log_path, threshold, window_size, input_data.use_frequency))
+    start = time.time()
+    # Apply the label splitting algorithm
+    label_splitter = get_label_splitter(distance_variant, input_data, outfile,
+                                        threshold, window_size, event_graphs_variant_based,
+                                        result_sink.output_level)
+    if memberships is None:
+        label_splitter.find_communities(input_data.original_log)
+    else:
+        label_splitter.set_memberships(memberships)
+
+    # The results only depend on the partition, so a partition found before is neither exported nor evaluated again
+    partition_key = get_partition_key(label_splitter.found_memberships)
+    if partition_key in input_data.partition_results:
+        ari_score, precision, simplicity, generalization, fitness = input_data.partition_results[partition_key]
+        runtime = time.time() - start
         outfile.write(f'\nRuntime: {runtime}\n')
-        outfile.write('\nPerformance split_log:\n')
-        outfile.write('\nIM without threshold:\n')
-        labels_to_original = label_splitter.get_split_labels_to_original_labels()
-
-        # Export the split log
-        xes_exporter.apply(split_log,
-                           f'./outputs/{input_data.input_name}_{threshold}_{window_size}_{distance_variant}.xes.gz')
-
-        calculate_unrefined_log_precision(input_data, label_splitter, labels_to_original, outfile)
-
-        # Generate a model from the split data and evaluate it.
-        final_marking, initial_marking, final_net, precision, simplicity, generalization, fitness = apply_im_without_noise_and_evaluate(
-            labels_to_original,
-            split_log,
-            input_data.original_log,
-            outfile,
-            label_splitter.short_label_to_original_label)
-
-        f1_scores_refined = []
-        if input_data.ground_truth_clustering:
-            ari_score = get_community_similarity(input_data.ground_truth_clustering, split_log_clustering)
-        else:
-            ari_score = precision
+        outfile.write('\nSame partition as an earlier configuration, reusing its results\n')
         outfile.write(f'\nAdjusted Rand Index:\n')
         outfile.write(f'{ari_score}\n\n')
-
-        write_results_to_csv(ari_score, distance_variant, fitness, generalization, input_data, label_splitter,
-                             precision, runtime, simplicity, threshold, window_size)
-
-        if ari_score > best_score:
-            # Export everything is new best model was found
-            print(f'\nHigher Adjusted Rand Index found: {ari_score}')
-            print(f'\nPrecision of found clustering: {precision}')
-            tree = inductive_miner.apply_tree(split_log)
-            export_models_and_pngs(final_marking, initial_marking, final_net, tree, input_data.input_name,
-                                   f'{input_data.input_name}_{threshold}_{distance_variant}_{window_size}_split_log')
-
-        return ari_score, precision, f1_scores_refined
-
-
-def calculate_unrefined_log_precision(input_data, label_splitter, labels_to_original, outfile):
+        write_results(ari_score, distance_variant, fitness, generalization, input_data, label_splitter,
+                      precision, runtime, simplicity, threshold, window_size, result_sink, partition_key,
+                      partition_cache_hit=True)
+        return ari_score, precision, []
+
+    relabeled_log = label_splitter.get_relabeled_log(input_data.original_log)
+    split_log = relabeled_log.to_event_log()
+    split_log_clustering = filter_duplicate_xor(split_log, input_data.labels_to_split,
+                                                label_splitter.found_clustering, input_data.model_cache,
+                                                relabeled_log)
+    end = time.time()
+    runtime = end - start
+    outfile.write(f'\nRuntime: {runtime}\n')
+    outfile.write('\nPerformance split_log:\n')
+    outfile.write('\nIM without threshold:\n')
+    labels_to_original = label_splitter.get_split_labels_to_original_labels()
+
+    # Export the split log
+    split_log_path = f'./outputs/{input_data.input_name}_{threshold}_{window_size}_{distance_variant}'
+    if input_data.split_log_export == SplitLogExport.ALL:
+        export_relabeled_log(relabeled_log, input_data.log_path, f'{split_log_path}.xes.gz',
+                             input_data.max_number_of_traces)
+    elif input_data.split_log_export == SplitLogExport.MAPPING:
+        export_label_mapping(relabeled_log, input_data.variant_index, f'{split_log_path}_labels.json.gz')
+
+    # Generate a model from the split data and evaluate it.
+    final_marking, initial_marking, final_net, precision, simplicity, generalization, fitness = apply_im_without_noise_and_evaluate(
+        labels_to_original,
+        split_log,
+        input_data.original_log,
+        outfile,
+        label_splitter.short_label_to_original_label,
+        input_data.model_cache,
+        input_data.variant_index,
+        input_data.conformance_workers)
+
+    f1_scores_refined = []
+    if input_data.ground_truth_clustering:
+        ari_score = get_community_similarity(input_data.ground_truth_clustering, split_log_clustering)
+    else:
+        ari_score = precision
+    outfile.write(f'\nAdjusted Rand Index:\n')
+    outfile.write(f'{ari_score}\n\n')
+
+    input_data.partition_results[partition_key] = (ari_score, precision, simplicity, generalization, fitness)
+    write_results(ari_score, distance_variant, fitness, generalization, input_data, label_splitter,
+                  precision, runtime, simplicity, threshold, window_size, result_sink, partition_key)
+
+    if ari_score > best_score:
+        # Export everything is new best model was found
+        print(f'\nHigher Adjusted Rand Index found: {ari_score}')
+        print(f'\nPrecision of found clustering: {precision}')
+        tree = input_data.model_cache.get_process_tree(split_log)
+        export_models_and_pngs(final_marking, initial_marking, final_net, tree, input_data.input_name,
+                               f'{input_data.input_name}_{threshold}_{distance_variant}_{window_size}_split_log')
+        if input_data.split_log_export == SplitLogExport.BEST:
+            export_relabeled_log(relabeled_log, input_data.log_path, f'{split_log_path}.xes.gz',
+                                 input_data.max_number_of_traces)
+
+    return ari_score, precision, f1_scores_refined
+
+
+def calculate_unrefined_log_precision(input_data: InputData,
+                                      event_graphs_variant_based: EventGraphsVariantBased) -> None:
+    """
+    Evaluates the model of the unrefined log once per input, before the cells of the parameter space are run.
+    The post-processing only depends on the labels to split found in the log, not on the found clustering.
+    The metrics are loaded from the baseline cache if the log did not change since the last run.
+    """
     if input_data.original_log_precision == 0:
         print('Starting to get original performance')
-        final_marking, initial_marking, final_net, original_precision, original_simplicity, original_generalization, original_fitness = apply_im_without_noise_and_evaluate(
-            labels_to_original,
-            input_data.original_log,
-            input_data.original_log,
-            outfile,
-            label_splitter.short_label_to_original_label)
+        outfile = input_data.result_sink.outfile
+        labels_to_original = {label: label for label in event_graphs_variant_based.event_graphs}
+        short_label_to_original_label = event_graphs_variant_based.short_label_to_original_label
+        parameters = [sorted(labels_to_original.items()),
+                      sorted(short_label_to_original_label.items()),
+                      input_data.max_number_of_traces]
+        cached = input_data.baseline_cache.get('unrefined_log', [input_data.log_path], parameters)
+        if cached is not None:
+            outfile.write('Performance of the unrefined log loaded from baseline cache\n')
+            original_precision, original_simplicity, original_generalization, original_fitness = cached
+        else:
+            final_marking, initial_marking, final_net, original_precision, original_simplicity, original_generalization, original_fitness = apply_im_without_noise_and_evaluate(
+                labels_to_original,
+                input_data.original_log,
+                input_data.original_log,
+                outfile,
+                short_label_to_original_label,
+                variant_index=input_data.variant_index,
+                number_of_workers=input_data.conformance_workers)
+            input_data.baseline_cache.set('unrefined_log', [input_data.log_path], parameters,
+                                          (original_precision, original_simplicity, original_generalization,
+                                           original_fitness))
         input_data.original_log_precision = original_precision
         input_data.original_log_simplicity = original_simplicity
         input_data.original_log_generalization = original_generalization
@@ -264,37 +520,45 @@ def calculate_unrefined_log_precision(input_data, label_splitter, labels_to_orig
         print('finished original log calculation')
 
 
-def write_results_to_csv(ari_score: float, distance_variant: Distance, fitness: float, generalization: float,
-                         input_data: InputData, label_splitter: LabelSplitterVariantBased, precision: float,
-                         runtime: float, simplicity: float, threshold: float, window_size: int) -> None:
-    with open(f'./results/{input_data.folder_name}_{input_data.pipeline_variant}_NEW.csv', 'a') as f:
-        writer = csv.writer(f)
-        if input_data.ground_truth_clustering:
-            row = [input_data.original_input_name, input_data.max_number_of_traces,
-                   ' '.join(input_data.labels_to_split),
-                   ', '.join(input_data.original_labels), input_data.original_log_precision,
-                   input_data.original_log_simplicity, input_data.original_log_generalization,
-                   input_data.original_log_fitness,
-                   len(input_data.xixi_clustering),
-                   input_data.xixi_precision, input_data.xixi_ari,
-                   input_data.use_combined_context, input_data.use_frequency, window_size, distance_variant, threshold,
-                   len(label_splitter.found_clustering), precision, ari_score, simplicity, generalization, fitness,
-                   runtime]
-        else:
-            row = [input_data.original_input_name, input_data.max_number_of_traces,
-                   ' '.join(input_data.labels_to_split),
-                   '[]', input_data.original_log_precision,
-                   input_data.original_log_simplicity, input_data.original_log_generalization,
-                   input_data.original_log_fitness,
-                   0, 0, 0,
-                   input_data.use_combined_context, input_data.use_frequency, window_size, distance_variant, threshold,
-                   len(label_splitter.found_clustering), precision, ari_score, simplicity, generalization,
-                   fitness, runtime]
-        writer.writerow(row)
+def get_results_csv_path(input_data: InputData) -> str:
+    return f'./results/{input_data.folder_name}_{input_data.pipeline_variant}_NEW.csv'
+
+
+def get_results_jsonl_path(input_data: InputData) -> str:
+    return f'./results/{input_data.folder_name}_{input_data.pipeline_variant}_NEW.jsonl'
+
+
+def write_results(ari_score: float, distance_variant: Distance, fitness: float, generalization: float,
+                  input_data: InputData, label_splitter: LabelSplitterVariantBased, precision: float,
+                  runtime: float, simplicity: float, threshold: float, window_size: int,
+                  result_sink: ResultSink, partition_key: str = None, partition_cache_hit: bool = False) -> None:
+    if input_data.ground_truth_clustering:
+        row = [input_data.original_input_name, input_data.max_number_of_traces,
+               ' '.join(input_data.labels_to_split),
+               ', '.join(input_data.original_labels), input_data.original_log_precision,
+               input_data.original_log_simplicity, input_data.original_log_generalization,
+               input_data.original_log_fitness,
+               len(input_data.xixi_clustering),
+               input_data.xixi_precision, input_data.xixi_ari,
+               input_data.use_combined_context, input_data.use_frequency, window_size, distance_variant, threshold,
+               len(label_splitter.found_clustering), precision, ari_score, simplicity, generalization, fitness,
+               runtime, partition_cache_hit]
+    else:
+        row = [input_data.original_input_name, input_data.max_number_of_traces,
+               ' '.join(input_data.labels_to_split),
+               '[]', input_data.original_log_precision,
+               input_data.original_log_simplicity, input_data.original_log_generalization,
+               input_data.original_log_fitness,
+               0, 0, 0,
+               input_data.use_combined_context, input_data.use_frequency, window_size, distance_variant, threshold,
+               len(label_splitter.found_clustering), precision, ari_score, simplicity, generalization,
+               fitness, runtime, partition_cache_hit]
+    result_sink.write_record(row, partition_key)
 
 
 def get_label_splitter(distance_variant: Distance, input_data: InputData, outfile, threshold, window_size,
-                       event_graphs_variant_based: EventGraphsVariantBased):
+                       event_graphs_variant_based: EventGraphsVariantBased,
+                       output_level: OutputLevel = OutputLevel.VERBOSE):
     if input_data.pipeline_variant == PipelineVariant.VARIANTS:
         label_splitter = LabelSplitterVariantBased(outfile,
                                                    input_data.labels_to_split,
@@ -305,7 +569,13 @@ def get_label_splitter(distance_variant: Distance, input_data: InputData, outfil
                                                    use_frequency=input_data.use_frequency,
                                                    concurrent_labels=input_data.concurrent_labels,
                                                    use_combined_context=input_data.use_combined_context,
-                                                   event_graphs_variant_based=event_graphs_variant_based)
+                                                   event_graphs_variant_based=event_graphs_variant_based,
+                                                   memory_budget=input_data.edge_memory_budget,
+                                                   output_level=output_level,
+                                                   warm_start=input_data.warm_start_leiden,
+                                                   use_node_sizes=input_data.use_node_sizes,
+                                                   resolution=input_data.cpm_resolution,
+                                                   number_of_workers=input_data.label_workers)
     elif input_data.pipeline_variant == PipelineVariant.VARIANTS_MULTIPLEX:
         label_splitter = LabelSplitterVariantMultiplex(outfile,
                                                        input_data.labels_to_split,
@@ -314,7 +584,10 @@ def get_label_splitter(distance_variant: Distance, input_data: InputData, outfil
                                                        distance_variant=distance_variant,
                                                        clustering_variant=clustering_method.ClusteringMethod.COMMUNITY_DETECTION,
                                                        use_frequency=input_data.use_frequency,
-                                                       use_combined_context=input_data.use_combined_context)
+                                                       use_combined_context=input_data.use_combined_context,
+                                                       memory_budget=input_data.edge_memory_budget,
+                                                       output_level=output_level,
+                                                       variant_index=input_data.variant_index)
     else:
         label_splitter = LabelSplitterEventBased(outfile,
                                                  input_data.labels_to_split,
@@ -322,5 +595,8 @@ def get_label_splitter(distance_variant: Distance, input_data: InputData, outfil
                                                  window_size=window_size,
                                                  distance_variant=distance_variant,
                                                  clustering_variant=clustering_method.ClusteringMethod.COMMUNITY_DETECTION,
-                                                 use_combined_context=input_data.use_combined_context)
+                                                 use_combined_context=input_data.use_combined_context,
+                                                 memory_budget=input_data.edge_memory_budget,
+                                                 output_level=output_level,
+                                                 variant_index=input_data.variant_index)
     return label_splitter
@@ -0,0 +1,36 @@
+import os
+import random
+import sys
+
+import pytest
+from pm4py.objects.log.obj import Event, EventLog, Trace
+
+# The modules of the project are imported relative to the project root, as in the pipeline
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def get_random_log(number_of_traces: int = 60, seed: int = 1, alphabet: str = 'ABCDEF', imprecise_label: str = 'X',
+                   max_length: int = 10) -> EventLog:
+    """
+    Log with single character labels, as the artificial logs of the experiments.
+    The events of the imprecise label have one of two original labels.
+    """
+    generator = random.Random(seed)
+    prototypes = [[generator.choice(alphabet + imprecise_label * 2) for _ in range(generator.randint(1, max_length))]
+                  for _ in range(12)]
+    log = EventLog()
+    for case_index in range(number_of_traces):
+        labels = list(generator.choice(prototypes))
+        if generator.random() < 0.3:
+            labels[generator.randrange(len(labels))] = generator.choice(alphabet + imprecise_label)
+        trace = Trace(attributes={'concept:name': str(case_index)})
+        for label in labels:
+            original_label = label if label != imprecise_label else generator.choice('YZ')
+            trace.append(Event({'concept:name': label, 'OrgLabel': original_label}))
+        log.append(trace)
+    return log
+
+
+@pytest.fixture
+def random_log() -> EventLog:
+    return get_random_log()
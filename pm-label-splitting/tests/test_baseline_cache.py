@@ -0,0 +1,79 @@
+import os
+
+from evaluation import baseline_cache as baseline_cache_module
+from evaluation.baseline_cache import BaselineCache
+from utils.file_writer_helper import read_exported_models, restore_exported_models
+
+
+def get_log_path(tmp_path, content=b'log'):
+    log_path = tmp_path / 'log.xes'
+    log_path.write_bytes(content)
+    return str(log_path)
+
+
+def test_cache_is_disabled_by_default(tmp_path):
+    baseline_cache = BaselineCache()
+    log_path = get_log_path(tmp_path)
+
+    baseline_cache.set('unrefined_log', [log_path], [1], 0.5)
+
+    assert baseline_cache.get('unrefined_log', [log_path], [1]) is None
+
+
+def test_cached_result(tmp_path):
+    baseline_cache = BaselineCache(str(tmp_path / 'cache'))
+    log_path = get_log_path(tmp_path)
+
+    baseline_cache.set('unrefined_log', [log_path], [1], 0.5)
+
+    assert baseline_cache.get('unrefined_log', [log_path], [1]) == 0.5
+    assert baseline_cache.get('unrefined_log', [log_path], [2]) is None
+    assert baseline_cache.get('xixi', [log_path], [1]) is None
+
+
+def test_changed_log_invalidates_the_result(tmp_path):
+    baseline_cache = BaselineCache(str(tmp_path / 'cache'))
+    log_path = get_log_path(tmp_path)
+    baseline_cache.set('unrefined_log', [log_path], [1], 0.5)
+
+    get_log_path(tmp_path, b'changed log')
+
+    assert baseline_cache.get('unrefined_log', [log_path], [1]) is None
+
+
+def test_touched_log_invalidates_the_result(tmp_path):
+    baseline_cache = BaselineCache(str(tmp_path / 'cache'))
+    log_path = get_log_path(tmp_path)
+    baseline_cache.set('unrefined_log', [log_path], [1], 0.5)
+
+    stat = os.stat(log_path)
+    os.utime(log_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+    assert baseline_cache.get('unrefined_log', [log_path], [1]) is None
+
+
+def test_new_cache_version_invalidates_the_result(tmp_path, monkeypatch):
+    baseline_cache = BaselineCache(str(tmp_path / 'cache'))
+    log_path = get_log_path(tmp_path)
+    baseline_cache.set('unrefined_log', [log_path], [1], 0.5)
+
+    monkeypatch.setattr(baseline_cache_module, 'BASELINE_CACHE_VERSION',
+                        baseline_cache_module.BASELINE_CACHE_VERSION + 1)
+
+    assert baseline_cache.get('unrefined_log', [log_path], [1]) is None
+
+
+def test_exported_models_are_restored(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('outputs')
+    for path in ['./outputs/xixi.pnml', './outputs/xixi_net.png']:
+        with open(path, 'wb') as exported_file:
+            exported_file.write(path.encode())
+    exported_models = read_exported_models('xixi')
+
+    monkeypatch.chdir(tmp_path / 'outputs')
+    restore_exported_models(exported_models)
+
+    assert sorted(os.listdir('outputs')) == ['xixi.pnml', 'xixi_net.png']
+    with open('outputs/xixi.pnml', 'rb') as exported_file:
+        assert exported_file.read() == b'./outputs/xixi.pnml'
@@ -0,0 +1,162 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from label_splitter.batched_distance import BatchedDistanceCalculator, MemoryBudgetExceededError
+from label_splitter.distance_metrics import Distance, DistanceCalculator
+from label_splitter.event_store import get_event_store_from_event_log
+
+LABEL = 'X'
+
+
+def get_events_with_context(log):
+    """
+    :return: Events of LABEL with their full prefix and suffix strings, as the original event graphs stored them
+    """
+    events = []
+    for trace in log:
+        labels = ''.join(event['concept:name'] for event in trace)
+        for position, label in enumerate(labels):
+            if label == LABEL:
+                events.append({'prefix': labels[:position], 'suffix': labels[position + 1:]})
+    return events
+
+
+def get_reference_distance(calculator: DistanceCalculator, distance_variant: Distance, event_a, event_b) -> float:
+    if distance_variant is Distance.SET_DISTANCE:
+        return calculator.get_set_distance(event_a, event_b)
+    if distance_variant is Distance.MULTISET_DISTANCE:
+        return calculator.get_multiset_distance(event_a, event_b)
+    return calculator.get_edit_distance(event_a, event_b)
+
+
+def get_event_distances(batched_calculator: BatchedDistanceCalculator, log, threshold=None) -> np.ndarray:
+    event_store = get_event_store_from_event_log(log)
+    events = np.nonzero(event_store.activities == event_store.label_to_activity[LABEL])[0]
+    context_distances = batched_calculator.get_signature_distances(event_store, events, threshold=threshold)
+    signatures = context_distances.event_signatures
+    return context_distances.normalized_distances[np.ix_(signatures, signatures)]
+
+
+@pytest.mark.parametrize('distance_variant', list(Distance))
+@pytest.mark.parametrize('use_combined_context', [False, True])
+@pytest.mark.parametrize('window_size', [1, 2, 3, 5])
+def test_distances_equal_distance_calculator(random_log, distance_variant, use_combined_context, window_size):
+    reference_calculator = DistanceCalculator(window_size, use_combined_context)
+    batched_calculator = BatchedDistanceCalculator(window_size, use_combined_context, distance_variant)
+    events = get_events_with_context(random_log)
+
+    distances = get_event_distances(batched_calculator, random_log)
+
+    for i, j in itertools.combinations(range(len(events)), 2):
+        expected = 1 - get_reference_distance(reference_calculator, distance_variant, events[i], events[j]) \
+                   / window_size
+        assert distances[i, j] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('use_combined_context', [False, True])
+def test_pruned_edit_distances_keep_the_pairs_above_the_threshold(random_log, use_combined_context):
+    threshold = 0.5
+    batched_calculator = BatchedDistanceCalculator(3, use_combined_context, Distance.EDIT_DISTANCE)
+
+    exact = get_event_distances(batched_calculator, random_log)
+    pruned = get_event_distances(batched_calculator, random_log, threshold=threshold)
+
+    passing = exact >= threshold
+    assert np.array_equal(pruned[passing], exact[passing])
+    assert (pruned[~passing] < threshold).all()
+
+
+@pytest.mark.parametrize('use_combined_context', [False, True])
+def test_edges_equal_all_pairs_above_the_threshold(random_log, use_combined_context):
+    threshold = 0.5
+    batched_calculator = BatchedDistanceCalculator(3, use_combined_context, Distance.EDIT_DISTANCE)
+    event_store = get_event_store_from_event_log(random_log)
+    events = np.nonzero(event_store.activities == event_store.label_to_activity[LABEL])[0]
+    distances = get_event_distances(batched_calculator, random_log)
+
+    context_distances = batched_calculator.get_signature_distances(event_store, events, threshold=threshold)
+    # Small blocks of edges
+    batched_calculator.memory_budget = 4096
+    edges, normalized_distances = batched_calculator.get_edges(context_distances, threshold)
+
+    expected_edges = [(i, j) for i, j in itertools.combinations(range(len(events)), 2) if distances[i, j] >= threshold]
+    assert [tuple(edge) for edge in edges.tolist()] == expected_edges
+    assert np.array_equal(normalized_distances, [distances[i, j] for i, j in expected_edges])
+
+
+def test_layer_distances_equal_single_distances(random_log):
+    threshold = 0.5
+    event_store = get_event_store_from_event_log(random_log)
+    events = np.nonzero(event_store.activities == event_store.label_to_activity[LABEL])[0]
+    batched_calculator = BatchedDistanceCalculator(3)
+
+    layer_distances = batched_calculator.get_layer_signature_distances(event_store, events, list(Distance),
+                                                                       threshold=threshold)
+
+    for distance_variant, context_distances in zip(Distance, layer_distances):
+        expected = BatchedDistanceCalculator(3, distance_variant=distance_variant).get_signature_distances(
+            event_store, events, threshold=threshold)
+        assert np.array_equal(context_distances.normalized_distances, expected.normalized_distances)
+        assert context_distances.threshold == expected.threshold
+
+
+def test_memory_budget_includes_the_distance_matrix(random_log):
+    event_store = get_event_store_from_event_log(random_log)
+    events = np.nonzero(event_store.activities == event_store.label_to_activity[LABEL])[0]
+    batched_calculator = BatchedDistanceCalculator(3)
+    _, contexts = batched_calculator.get_context_signatures(event_store, events)
+    number_of_signatures = len(contexts[0].lengths)
+    fixed_bytes = batched_calculator.get_fixed_bytes(contexts)
+
+    assert fixed_bytes >= number_of_signatures * number_of_signatures * 8
+    batched_calculator.memory_budget = fixed_bytes + 10 * number_of_signatures * 100
+    assert batched_calculator.get_block_size(number_of_signatures, 100, fixed_bytes) == 10
+
+
+def test_distances_with_a_budget_of_one_row(random_log):
+    event_store = get_event_store_from_event_log(random_log)
+    events = np.nonzero(event_store.activities == event_store.label_to_activity[LABEL])[0]
+    batched_calculator = BatchedDistanceCalculator(3)
+    _, contexts = batched_calculator.get_context_signatures(event_store, events)
+    number_of_signatures = len(contexts[0].lengths)
+    bytes_per_pair = 4 * (contexts[0].codes.shape[1] + 1) + 64
+    one_row_budget = batched_calculator.get_fixed_bytes(contexts) + number_of_signatures * bytes_per_pair
+
+    exact = get_event_distances(batched_calculator, random_log, threshold=0.5)
+    small_budget = get_event_distances(BatchedDistanceCalculator(3, memory_budget=one_row_budget), random_log,
+                                       threshold=0.5)
+
+    assert np.array_equal(exact, small_budget)
+
+
+def test_distances_with_a_budget_below_the_distance_matrix(random_log):
+    with pytest.raises(MemoryBudgetExceededError):
+        get_event_distances(BatchedDistanceCalculator(3, memory_budget=1), random_log, threshold=0.5)
+
+
+def test_reserved_bytes_count_against_the_budget(random_log):
+    event_store = get_event_store_from_event_log(random_log)
+    events = np.nonzero(event_store.activities == event_store.label_to_activity[LABEL])[0]
+    batched_calculator = BatchedDistanceCalculator(3)
+    context_distances = batched_calculator.get_signature_distances(event_store, events)
+    # Budget for the matrix of the label and one row of pairs, exceeded by the distances kept for another label
+    _, contexts = batched_calculator.get_context_signatures(event_store, events)
+    number_of_signatures = len(contexts[0].lengths)
+    batched_calculator.memory_budget = batched_calculator.get_fixed_bytes(contexts) + \
+        number_of_signatures * (4 * (contexts[0].codes.shape[1] + 1) + 64)
+
+    batched_calculator.get_signature_distances(event_store, events)
+    with pytest.raises(MemoryBudgetExceededError):
+        batched_calculator.get_signature_distances(event_store, events,
+                                                   reserved_bytes=context_distances.normalized_distances.nbytes)
+
+
+def test_layer_distances_with_a_budget_below_the_distance_matrices(random_log):
+    event_store = get_event_store_from_event_log(random_log)
+    events = np.nonzero(event_store.activities == event_store.label_to_activity[LABEL])[0]
+
+    with pytest.raises(MemoryBudgetExceededError):
+        BatchedDistanceCalculator(3, memory_budget=1).get_layer_signature_distances(event_store, events,
+                                                                                    list(Distance))
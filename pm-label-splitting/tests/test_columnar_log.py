@@ -0,0 +1,77 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pm4py.objects.log.exporter.xes import exporter as xes_exporter
+from pm4py.objects.log.importer.xes import importer as xes_importer
+
+from conftest import get_random_log
+from utils.columnar_log import COLUMNAR_CACHE_SUFFIX, EVENT_ATTRIBUTES, TIMESTAMP_KEY, load_columnar_log
+from utils.log_registry import LogRegistry
+
+
+def export_random_log(tmp_path, with_timezone: bool, file_name: str = 'log.xes.gz') -> str:
+    log = get_random_log(number_of_traces=30)
+    start = datetime(2021, 3, 1, 8, tzinfo=timezone(timedelta(hours=1)) if with_timezone else None)
+    for case_index, trace in enumerate(log):
+        for event_index, event in enumerate(trace):
+            # Some events without timestamp or original label
+            if (case_index + event_index) % 7 != 0:
+                event[TIMESTAMP_KEY] = start + timedelta(days=case_index, minutes=event_index)
+            if (case_index + event_index) % 5 == 0:
+                del event['OrgLabel']
+            event['lifecycle:transition'] = 'complete'
+    path = str(tmp_path / file_name)
+    xes_exporter.apply(log, path)
+    return path
+
+
+def to_utc(value):
+    if not isinstance(value, datetime):
+        return value
+    # Timestamps without timezone are UTC, older pm4py versions import them without timezone
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def assert_same_used_attributes(columnar_event_log, log):
+    assert len(columnar_event_log) == len(log)
+    for columnar_trace, trace in zip(columnar_event_log, log):
+        assert columnar_trace.attributes.get('concept:name') == trace.attributes.get('concept:name')
+        assert len(columnar_trace) == len(trace)
+        for columnar_event, event in zip(columnar_trace, trace):
+            for key in EVENT_ATTRIBUTES:
+                assert columnar_event.get(key) == event.get(key)
+            if TIMESTAMP_KEY in event:
+                assert columnar_event[TIMESTAMP_KEY].utcoffset() == timedelta(0)
+            assert to_utc(columnar_event.get(TIMESTAMP_KEY)) == to_utc(event.get(TIMESTAMP_KEY))
+
+
+@pytest.mark.parametrize('with_timezone', [False, True])
+def test_round_trip_equals_pm4py_import(tmp_path, with_timezone):
+    path = export_random_log(tmp_path, with_timezone)
+    log = xes_importer.apply(path)
+
+    assert_same_used_attributes(load_columnar_log(path).to_event_log(), log)
+    assert os.path.isfile(f'{path}{COLUMNAR_CACHE_SUFFIX}')
+    # Second load from the cache
+    assert_same_used_attributes(load_columnar_log(path).to_event_log(), log)
+    assert_same_used_attributes(load_columnar_log(path).to_event_log(7), log[:7])
+
+
+def test_changed_log_is_parsed_again(tmp_path):
+    path = export_random_log(tmp_path, False)
+    load_columnar_log(path)
+
+    os.replace(export_random_log(tmp_path, True, 'other.xes.gz'), path)
+
+    assert_same_used_attributes(load_columnar_log(path).to_event_log(), xes_importer.apply(path))
+
+
+def test_log_registry_keeps_all_attributes_by_default(tmp_path):
+    path = export_random_log(tmp_path, False)
+
+    log = LogRegistry().get_log(path)
+
+    assert log[0][0]['lifecycle:transition'] == 'complete'
+    assert not os.path.isfile(f'{path}{COLUMNAR_CACHE_SUFFIX}')
+    assert 'lifecycle:transition' not in LogRegistry(use_columnar_cache=True).get_log(path)[0][0]
@@ -0,0 +1,40 @@
+import numpy as np
+
+from label_splitter.event_graphs_variant_based import get_event_graphs_from_event_log
+from label_splitter.event_store import get_event_store_from_event_log
+from utils.variant_index import get_variant_index
+
+
+def test_event_store_uses_the_variants_of_the_variant_index(random_log):
+    variant_index = get_variant_index(random_log)
+
+    event_store = get_event_store_from_event_log(random_log, variant_index=variant_index)
+
+    assert event_store.case_variants is variant_index.case_variants
+    assert event_store.number_of_variants == len(variant_index)
+    for variant_id, variant in enumerate(variant_index.variants):
+        sample_case = event_store.variant_sample_cases[variant_id]
+        assert tuple(event_store.labels[activity]
+                     for activity in event_store.activities[event_store.get_case_events(sample_case)]) == variant
+        assert sample_case == np.nonzero(variant_index.case_variants == variant_id)[0][0]
+
+
+def test_event_store_without_variant_index_has_the_same_variants(random_log):
+    variant_index = get_variant_index(random_log)
+
+    shared = get_event_store_from_event_log(random_log, variant_index=variant_index)
+    own = get_event_store_from_event_log(random_log)
+
+    assert np.array_equal(own.case_variants, shared.case_variants)
+    assert np.array_equal(own.variant_counts, shared.variant_counts)
+    assert np.array_equal(own.variant_sample_cases, shared.variant_sample_cases)
+
+
+def test_event_graphs_have_one_vertex_per_event_of_a_variant(random_log):
+    variant_index = get_variant_index(random_log)
+
+    event_graphs = get_event_graphs_from_event_log(random_log, ['X'], variant_index=variant_index)
+
+    expected = sum(variant.count('X') for variant in variant_index.variants)
+    assert event_graphs.event_graphs['X'].vcount() == expected
+    assert event_graphs.event_store.case_variants is variant_index.case_variants
@@ -0,0 +1,144 @@
+import io
+import time
+
+import pytest
+from pm4py.objects.log.obj import Event, EventLog, Trace
+
+from label_splitter.distance_metrics import Distance
+from label_splitter.event_graphs_variant_based import get_event_graphs_from_event_log
+from label_splitter.label_splitter_variant_based import LabelSplitter
+from pipeline import pipeline_runner
+from utils.input_data import InputData
+from utils.result_sink import RESULT_COLUMNS, ResultSink
+
+
+def get_log(variants):
+    log = EventLog()
+    for labels, count in variants:
+        for _ in range(count):
+            trace = Trace(attributes={'concept:name': str(len(log))})
+            for label in labels:
+                trace.append(Event({'concept:name': label}))
+            log.append(trace)
+    return log
+
+
+def get_memberships(log, use_node_sizes, resolution=0.5, threshold=0.5):
+    event_graphs = get_event_graphs_from_event_log(log, ['X'])
+    label_splitter = LabelSplitter(io.StringIO(), ['X'], window_size=1, threshold=threshold,
+                                   distance_variant=Distance.SET_DISTANCE, use_frequency=True,
+                                   event_graphs_variant_based=event_graphs, use_node_sizes=use_node_sizes,
+                                   resolution=resolution)
+    label_splitter.find_communities()
+    return label_splitter.found_memberships['X']
+
+
+def get_number_of_communities(membership):
+    return len(set(membership))
+
+
+def get_canonical_membership(membership):
+    """
+    :return: Membership with the communities numbered in the order of their first vertex
+    """
+    community_ids = {}
+    return [community_ids.setdefault(community, len(community_ids)) for community in membership]
+
+
+def test_both_modes_find_separated_contexts():
+    # X after A or C, the contexts are disjoint, so there are no edges between the two groups
+    log = get_log([('AXB', 10), ('AXD', 3), ('CXD', 10), ('CXB', 3)])
+
+    modularity_membership = get_memberships(log, use_node_sizes=False)
+    cpm_membership = get_memberships(log, use_node_sizes=True)
+
+    assert get_number_of_communities(modularity_membership) == 2
+    assert get_canonical_membership(cpm_membership) == get_canonical_membership(modularity_membership)
+
+
+def test_node_sizes_change_the_objective():
+    # Three variants of 20 cases with X, the edge weights are the similarity times 400, the node sizes 20
+    log = get_log([('AXB', 20), ('CXB', 20), ('CXD', 20)])
+
+    modularity_membership = get_memberships(log, use_node_sizes=False)
+    cpm_membership = get_memberships(log, use_node_sizes=True)
+
+    # Modularity keeps the three variants apart, CPM with the default resolution merges the two most similar ones
+    assert get_canonical_membership(modularity_membership) == [0, 1, 2]
+    assert get_canonical_membership(cpm_membership) == [0, 1, 1]
+    # The partition of CPM depends on the resolution
+    assert get_number_of_communities(get_memberships(log, use_node_sizes=True, resolution=0.1)) == 1
+    assert get_number_of_communities(get_memberships(log, use_node_sizes=True, resolution=1.5)) == 3
+
+
+@pytest.mark.parametrize('resolution', [0.1, 1.5])
+def test_threshold_path_uses_the_resolution(resolution):
+    log = get_log([('AXB', 20), ('CXB', 20), ('CXD', 20)])
+    event_graphs = get_event_graphs_from_event_log(log, ['X'])
+    label_splitter = LabelSplitter(io.StringIO(), ['X'], window_size=1, threshold=0.5,
+                                   distance_variant=Distance.SET_DISTANCE, use_frequency=True,
+                                   event_graphs_variant_based=event_graphs, use_node_sizes=True,
+                                   resolution=resolution)
+
+    assert label_splitter.get_threshold_path([0.5])[0]['X'] == get_memberships(log, True, resolution)
+
+
+def test_threshold_path_equals_single_thresholds():
+    log = get_log([('AXB', 20), ('CXB', 20), ('CXD', 20), ('AXD', 5)])
+    event_graphs = get_event_graphs_from_event_log(log, ['X'])
+    thresholds = [0.9, 0.1, 0.5, 0.6, 0.5]
+    label_splitter = LabelSplitter(io.StringIO(), ['X'], window_size=1, threshold=min(thresholds),
+                                   distance_variant=Distance.SET_DISTANCE, use_frequency=True,
+                                   event_graphs_variant_based=event_graphs)
+
+    path = label_splitter.get_threshold_path(thresholds)
+
+    assert [memberships['X'] for memberships in path] == \
+           [get_memberships(log, False, threshold=threshold) for threshold in thresholds]
+    assert label_splitter.get_threshold_path([]) == []
+
+
+def test_grid_cell_releases_the_distances(monkeypatch):
+    log = get_log([('AXB', 20), ('CXB', 20), ('CXD', 20)])
+    event_graphs = get_event_graphs_from_event_log(log, ['X'])
+    input_data = InputData(labels_to_split=['X'], use_frequency=True, original_log=log)
+    cell_distances = []
+
+    def find_communities(input_data, distance, window_size, threshold, best_score, event_graphs_variant_based,
+                         result_sink, memberships):
+        label_splitter = pipeline_runner.get_label_splitter(distance, input_data, result_sink.outfile, threshold,
+                                                            window_size, event_graphs_variant_based)
+        label_splitter.find_communities()
+        cell_distances.append(len(event_graphs_variant_based.context_distances))
+        return 0, 0, []
+
+    monkeypatch.setattr(pipeline_runner, 'apply_pipeline_to_log', find_communities)
+    for window_size in [1, 2]:
+        pipeline_runner.run_grid_cell(input_data, event_graphs, window_size, Distance.SET_DISTANCE, 0, ResultSink())
+
+        assert event_graphs.context_distances == {}
+    # The thresholds of a cell share the distances of the label
+    assert cell_distances == [1] * len(cell_distances)
+
+
+def test_parallel_grid_marks_partition_cache_hits_in_grid_order(monkeypatch):
+    def run_grid_cell(input_data, event_graphs_variant_based, window_size, distance, best_score, result_sink):
+        # The first cell finishes last
+        time.sleep(0.5 if window_size == 1 else 0)
+        for threshold, partition_key in [(0.1, 'shared'), (0.2, f'cell {window_size}'), (0.3, 'shared')]:
+            partition_cache_hit = partition_key in input_data.partition_results
+            input_data.partition_results.setdefault(partition_key, (window_size, 0, 0, 0, 0))
+            result_sink.write_record([window_size, threshold] + [0] * (len(RESULT_COLUMNS) - 3)
+                                     + [partition_cache_hit], partition_key)
+        return [(threshold, 0, 0) for threshold in [0.1, 0.2, 0.3]]
+
+    monkeypatch.setattr(pipeline_runner, 'run_grid_cell', run_grid_cell)
+    input_data = InputData(number_of_workers=2, result_sink=ResultSink())
+    grid = [(1, Distance.SET_DISTANCE), (2, Distance.SET_DISTANCE)]
+
+    list(pipeline_runner.run_grid_cells_in_parallel(input_data, None, grid))
+
+    _, records = input_data.result_sink.get_buffered()
+    assert [(record[0], record[1], record[-1]) for record in records] == \
+           [(1, 0.1, False), (1, 0.2, False), (1, 0.3, True), (2, 0.1, True), (2, 0.2, False), (2, 0.3, True)]
+    assert input_data.partition_results['shared'][0] == 1
@@ -0,0 +1,70 @@
+import copy
+import random
+
+from igraph import Clustering
+from pm4py.objects.log.obj import Event, EventLog, Trace
+
+from pipeline.pipeline_helpers import filter_duplicate_xor
+from utils.relabeled_log import RelabeledLog
+
+
+def get_labels(log):
+    return [[event['concept:name'] for event in trace] for trace in log]
+
+
+def get_overrides(log, seed: int = 2):
+    generator = random.Random(seed)
+    return [(case_index, position, f'X_{generator.randint(0, 3)}')
+            for case_index, trace in enumerate(log)
+            for position, event in enumerate(trace) if event['concept:name'] == 'X']
+
+
+def test_relabeled_log_equals_relabeled_copy(random_log):
+    overrides = get_overrides(random_log)
+    original_labels = get_labels(random_log)
+    # Previous approach: deep copy of the log, relabeled in place
+    expected_log = copy.deepcopy(random_log)
+    for case_index, position, label in overrides:
+        expected_log[case_index][position]['concept:name'] = label
+
+    relabeled_log = RelabeledLog(random_log)
+    for case_index, position, label in overrides:
+        relabeled_log.set_label(case_index, position, label)
+    split_log = relabeled_log.to_event_log()
+
+    assert len(relabeled_log) == len(overrides)
+    assert get_labels(split_log) == get_labels(expected_log)
+    for split_trace, expected_trace in zip(split_log, expected_log):
+        assert split_trace.attributes == expected_trace.attributes
+        assert [dict(event) for event in split_trace] == [dict(event) for event in expected_trace]
+    assert get_labels(random_log) == original_labels
+
+
+def test_rename_labels_merges_labels(random_log):
+    relabeled_log = RelabeledLog(random_log)
+    for case_index, position, label in get_overrides(random_log):
+        relabeled_log.set_label(case_index, position, label)
+
+    relabeled_log.rename_labels({'X_1': 'X_0', 'X_3': 'X_2'})
+
+    labels = {label for trace in relabeled_log.get_overrides_by_case().values() for label in trace.values()}
+    assert labels <= {'X_0', 'X_2'}
+    assert {label for trace in get_labels(relabeled_log.to_event_log()) for label in trace} <= set('ABCDEF') | labels
+
+
+def test_filter_duplicate_xor_does_not_modify_original_log():
+    # Events that already have a split label are shared with the original log, only the first case is relabeled
+    log = EventLog()
+    for case_index in range(4):
+        log.append(Trace([Event({'concept:name': label}) for label in ['A', f'X_{case_index % 2}', 'B']],
+                         attributes={'concept:name': str(case_index)}))
+    original_labels = get_labels(log)
+    relabeled_log = RelabeledLog(log)
+    relabeled_log.set_label(0, 1, 'X_0')
+    split_log = relabeled_log.to_event_log()
+
+    clustering = filter_duplicate_xor(split_log, ['X'], Clustering([0, 1, 0, 1]), relabeled_log=relabeled_log)
+
+    assert len(set(clustering.membership)) == 1
+    assert len({trace[1] for trace in get_labels(split_log)}) == 1
+    assert get_labels(log) == original_labels
@@ -0,0 +1,67 @@
+import csv
+
+import pytest
+
+from utils.result_sink import RESULT_COLUMNS, ResultSink, read_csv_header, rotate_result_file
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as csv_file:
+        csv.writer(csv_file).writerows(rows)
+
+
+def test_rotate_result_file_with_other_columns(tmp_path):
+    csv_path = tmp_path / 'results.csv'
+    write_csv(csv_path, [RESULT_COLUMNS[:-1], ['a'] * (len(RESULT_COLUMNS) - 1)])
+
+    assert read_csv_header(csv_path) == RESULT_COLUMNS[:-1]
+    rotated_path = rotate_result_file(csv_path)
+
+    assert not csv_path.exists()
+    assert read_csv_header(rotated_path) == RESULT_COLUMNS[:-1]
+    assert rotated_path.endswith('.csv')
+
+
+def test_read_header_of_empty_file(tmp_path):
+    csv_path = tmp_path / 'results.csv'
+    csv_path.touch()
+
+    assert read_csv_header(csv_path) == []
+
+
+def get_record(value):
+    return [value] * len(RESULT_COLUMNS)
+
+
+def test_sink_moves_file_with_other_columns_aside(tmp_path):
+    csv_path = tmp_path / 'results.csv'
+    write_csv(csv_path, [RESULT_COLUMNS[:-1], ['a'] * (len(RESULT_COLUMNS) - 1)])
+    sink = ResultSink(str(tmp_path / 'output.txt'), str(csv_path))
+
+    sink.write_record(get_record('b'))
+    sink.close()
+
+    with open(csv_path, newline='') as csv_file:
+        assert list(csv.reader(csv_file)) == [RESULT_COLUMNS, get_record('b')]
+    assert len(list(tmp_path.glob('results_*.csv'))) == 1
+
+
+def test_sink_appends_to_file_with_result_columns(tmp_path):
+    csv_path = tmp_path / 'results.csv'
+    write_csv(csv_path, [RESULT_COLUMNS, get_record('a')])
+    sink = ResultSink(str(tmp_path / 'output.txt'), str(csv_path))
+
+    sink.write_record(get_record('b'))
+    sink.close()
+
+    with open(csv_path, newline='') as csv_file:
+        assert list(csv.reader(csv_file)) == [RESULT_COLUMNS, get_record('a'), get_record('b')]
+
+
+def test_buffered_records_with_other_columns_are_rejected():
+    worker_sink = ResultSink()
+    worker_sink.write_record(get_record('a')[:-1])
+    sink = ResultSink()
+
+    with pytest.raises(ValueError):
+        sink.write_buffered(*worker_sink.get_buffered())
@@ -0,0 +1,63 @@
+import pytest
+from pm4py.algo.discovery.inductive import algorithm as inductive_miner
+from pm4py.algo.evaluation.generalization import evaluator as generalization_evaluator
+from pm4py.algo.evaluation.precision import evaluator as precision_evaluator
+from pm4py.algo.evaluation.replay_fitness import evaluator as replay_fitness_evaluator
+from pm4py.objects.petri_net.obj import Marking, PetriNet
+from pm4py.objects.petri_net.utils import petri_utils
+from pm4py.objects.petri_net.utils.check_soundness import check_easy_soundness_net_in_fin_marking
+
+from conftest import get_random_log
+from evaluation.variant_conformance import get_etc_precision, get_generalization, get_token_fitness, replay_variants
+from utils.variant_index import get_variant_index
+
+
+def get_unsound_net():
+    """
+    :return: Net whose final marking cannot be reached, B always leaves a token in a place without output arcs
+    """
+    net = PetriNet('unsound')
+    places = [PetriNet.Place(f'p{i}') for i in range(3)]
+    for place in places:
+        net.places.add(place)
+    for name, source, target in [('A', 0, 1), ('B', 1, 2), ('C', 1, 1), ('D', 2, 0)]:
+        transition = PetriNet.Transition(name, name)
+        net.transitions.add(transition)
+        petri_utils.add_arc_from_to(places[source], transition, net)
+        petri_utils.add_arc_from_to(transition, places[target], net)
+    leftover_place = PetriNet.Place('leftover')
+    net.places.add(leftover_place)
+    petri_utils.add_arc_from_to([transition for transition in net.transitions if transition.label == 'B'][0],
+                                leftover_place, net)
+    return net, Marking({places[0]: 1}), Marking({places[2]: 1})
+
+
+def get_models(log):
+    return [inductive_miner.apply(log), inductive_miner.apply(get_random_log(20, seed=5)), get_unsound_net()]
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+@pytest.mark.parametrize('model_index', [0, 1, 2])
+def test_variant_conformance_equals_pm4py(seed, model_index):
+    log = get_random_log(seed=seed, alphabet='ABCD')
+    net, initial_marking, final_marking = get_models(log)[model_index]
+    variant_index = get_variant_index(log)
+    replayed_variants = replay_variants(variant_index, net, initial_marking, final_marking)
+
+    assert get_token_fitness(variant_index, replayed_variants) == replay_fitness_evaluator.apply(
+        log, net, initial_marking, final_marking, variant=replay_fitness_evaluator.Variants.TOKEN_BASED)
+    assert get_etc_precision(variant_index, net, initial_marking, final_marking) == precision_evaluator.apply(
+        log, net, initial_marking, final_marking, variant=precision_evaluator.Variants.ETCONFORMANCE_TOKEN)
+    assert get_generalization(variant_index, replayed_variants, net) == generalization_evaluator.apply(
+        log, net, initial_marking, final_marking)
+
+
+def test_precision_of_unsound_net_as_pm4py():
+    # pm4py's token-based ETConformance does not check the soundness either, it is the variant pm4py itself falls
+    # back to for nets that are not easy sound
+    net, initial_marking, final_marking = get_unsound_net()
+    assert not check_easy_soundness_net_in_fin_marking(net, initial_marking, final_marking)
+    log = get_random_log(alphabet='ABCD')
+
+    assert get_etc_precision(get_variant_index(log), net, initial_marking, final_marking) == precision_evaluator.apply(
+        log, net, initial_marking, final_marking)
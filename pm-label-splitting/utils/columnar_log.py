@@ -0,0 +1,171 @@
+import gzip
+import os
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from lxml import etree
+from pm4py.objects.log.obj import Event, EventLog, Trace
+
+# Increase when the layout of the cache files changes, older cache files are then parsed again
+COLUMNAR_CACHE_VERSION = 2
+COLUMNAR_CACHE_SUFFIX = '.columns.npz'
+EVENT_ATTRIBUTES = ['concept:name', 'OrgLabel', 'original_label']
+TIMESTAMP_KEY = 'time:timestamp'
+MISSING_TIMESTAMP = np.iinfo(np.int64).min
+
+
+class ColumnarLog:
+    """
+    Columnar representation of the attributes of an XES log the pipeline uses: case id, activity label, original
+    label (OrgLabel and original_label) and timestamp. Case i covers the events case_offsets[i]:case_offsets[i + 1].
+    The string attributes are stored as codes into their vocabulary, -1 if the event does not have the attribute.
+    Timestamps are stored as nanoseconds since the epoch in UTC and returned as UTC datetimes. Timestamps without
+    timezone in the log are taken as UTC, so they keep their meaning whichever pm4py version imported the log before.
+    Loading the columns from the cache takes milliseconds, but to_event_log still builds one pm4py Event per event in
+    Python, about 5 microseconds per event, e.g., 0.56 s for 111k events compared to 5.6 s for pm4py's import.
+    """
+
+    def __init__(self, case_ids: np.ndarray, case_offsets: np.ndarray, attribute_codes: Dict[str, np.ndarray],
+                 attribute_values: Dict[str, np.ndarray], timestamps: np.ndarray):
+        self.case_ids = case_ids
+        self.case_offsets = case_offsets
+        self.attribute_codes = attribute_codes
+        self.attribute_values = attribute_values
+        self.timestamps = timestamps
+
+    @property
+    def number_of_cases(self) -> int:
+        return len(self.case_offsets) - 1
+
+    def to_event_log(self, max_number_of_traces: int = None) -> EventLog:
+        """
+        :return: Event log with the stored attributes of the first max_number_of_traces cases
+        """
+        number_of_cases = self.number_of_cases if max_number_of_traces is None \
+            else min(max_number_of_traces, self.number_of_cases)
+        number_of_events = int(self.case_offsets[number_of_cases])
+
+        event_attributes = []
+        for key in EVENT_ATTRIBUTES:
+            values = self.attribute_values[key].tolist()
+            event_attributes.append((key, [values[code] if code >= 0 else None
+                                           for code in self.attribute_codes[key][:number_of_events].tolist()]))
+        timestamps = self.timestamps[:number_of_events]
+        has_timestamp = (timestamps != MISSING_TIMESTAMP).tolist()
+        datetimes = pd.to_datetime(np.where(timestamps == MISSING_TIMESTAMP, 0, timestamps), utc=True).to_pydatetime()
+
+        log = EventLog()
+        case_ids = self.case_ids.tolist()
+        case_offsets = self.case_offsets.tolist()
+        for case_index in range(number_of_cases):
+            trace = Trace()
+            if case_ids[case_index]:
+                trace.attributes['concept:name'] = case_ids[case_index]
+            for event_index in range(case_offsets[case_index], case_offsets[case_index + 1]):
+                event = Event()
+                for key, values in event_attributes:
+                    if values[event_index] is not None:
+                        event[key] = values[event_index]
+                if has_timestamp[event_index]:
+                    event[TIMESTAMP_KEY] = datetimes[event_index]
+                trace.append(event)
+            log.append(trace)
+        return log
+
+
+def load_columnar_log(path: str, use_cache: bool = True) -> ColumnarLog:
+    """
+    Loads the columns of the XES log from the binary cache next to the log. If there is no cache for the current
+    version of the log file, the log is parsed and the cache is written.
+    """
+    cache_path = f'{path}{COLUMNAR_CACHE_SUFFIX}'
+    stat = os.stat(path)
+    source_signature = np.array([COLUMNAR_CACHE_VERSION, stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+    if use_cache and os.path.isfile(cache_path):
+        columnar_log = _load_cache(cache_path, source_signature)
+        if columnar_log is not None:
+            return columnar_log
+
+    columnar_log = parse_xes_columns(path)
+    if use_cache:
+        _save_cache(cache_path, source_signature, columnar_log)
+    return columnar_log
+
+
+def parse_xes_columns(path: str) -> ColumnarLog:
+    """
+    Parses only the used attributes of the XES log, without building the pm4py objects.
+    """
+    case_ids = []
+    case_offsets = [0]
+    vocabularies = {key: {} for key in EVENT_ATTRIBUTES}
+    codes = {key: [] for key in EVENT_ATTRIBUTES}
+    timestamps = []
+
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as log_file:
+        for _, trace in etree.iterparse(log_file, events=('end',), tag='{*}trace'):
+            case_id = ''
+            for element in trace:
+                tag = etree.QName(element).localname
+                if tag == 'event':
+                    event_values = {}
+                    for attribute in element:
+                        event_values[attribute.get('key')] = attribute.get('value')
+                    for key in EVENT_ATTRIBUTES:
+                        value = event_values.get(key)
+                        codes[key].append(-1 if value is None
+                                          else vocabularies[key].setdefault(value, len(vocabularies[key])))
+                    timestamps.append(event_values.get(TIMESTAMP_KEY))
+                elif element.get('key') == 'concept:name':
+                    case_id = element.get('value')
+            case_ids.append(case_id)
+            case_offsets.append(len(timestamps))
+            trace.clear()
+            while trace.getprevious() is not None:
+                del trace.getparent()[0]
+
+    return ColumnarLog(np.array(case_ids, dtype=str),
+                       np.array(case_offsets, dtype=np.int64),
+                       {key: np.array(codes[key], dtype=np.int32) for key in EVENT_ATTRIBUTES},
+                       {key: np.array(list(vocabularies[key].keys()), dtype=str) for key in EVENT_ATTRIBUTES},
+                       _get_timestamp_array(timestamps))
+
+
+def _get_timestamp_array(timestamps: List[str]) -> np.ndarray:
+    datetimes = pd.to_datetime(pd.Series(timestamps, dtype=object), utc=True, errors='coerce')
+    nanoseconds = datetimes.values.astype('datetime64[ns]').astype(np.int64)
+    return np.where(datetimes.isna().values, MISSING_TIMESTAMP, nanoseconds)
+
+
+def _save_cache(cache_path: str, source_signature: np.ndarray, columnar_log: ColumnarLog) -> None:
+    columns = {'source_signature': source_signature,
+               'case_ids': columnar_log.case_ids,
+               'case_offsets': columnar_log.case_offsets,
+               'timestamps': columnar_log.timestamps}
+    for i, key in enumerate(EVENT_ATTRIBUTES):
+        columns[f'codes_{i}'] = columnar_log.attribute_codes[key]
+        columns[f'values_{i}'] = columnar_log.attribute_values[key]
+    temporary_path = f'{cache_path}.{os.getpid()}.tmp.npz'
+    try:
+        # Not compressed, so the columns are read without decompression
+        np.savez(temporary_path, **columns)
+        os.replace(temporary_path, cache_path)
+    except OSError as e:
+        print(f'Could not write the columnar cache {cache_path}: {e}')
+
+
+def _load_cache(cache_path: str, source_signature: np.ndarray):
+    try:
+        with np.load(cache_path, allow_pickle=False) as columns:
+            if not np.array_equal(columns['source_signature'], source_signature):
+                return None
+            return ColumnarLog(columns['case_ids'],
+                               columns['case_offsets'],
+                               {key: columns[f'codes_{i}'] for i, key in enumerate(EVENT_ATTRIBUTES)},
+                               {key: columns[f'values_{i}'] for i, key in enumerate(EVENT_ATTRIBUTES)},
+                               columns['timestamps'])
+    except (OSError, KeyError, ValueError):
+        return None
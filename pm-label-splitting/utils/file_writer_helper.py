@@ -3,6 +3,7 @@ import datetime
 import os
 from datetime import datetime
 from pathlib import Path
+from typing import Dict, List
 
 from pm4py.objects.petri_net.exporter import exporter as pnml_exporter
 from pm4py.objects.process_tree.exporter import exporter as ptml_exporter
@@ -10,6 +11,7 @@ from pm4py.visualization.petri_net import visualizer as pn_visualizer
 from pm4py.visualization.process_tree import visualizer as pt_visualizer
 
 from pipeline.pipeline_variant import PipelineVariant
+from utils.result_sink import RESULT_COLUMNS, read_csv_header, rotate_result_file
 
 
 def write_summary_file_with_parameters(best_configs, best_score, best_precision, name, summary_file_name):
@@ -28,25 +30,21 @@ def setup_result_folder(folder_name: str, pipeline_variant: PipelineVariant):
     if not os.path.exists('../../outputs/best_results'):
         os.makedirs('../../outputs/best_results')
 
-    header = [
-        'Name', 'max_number_of_traces', 'labels_to_split', 'original labels', 'original_precision',
-        'original_simplicity',
-        'original_generalization', 'original_fitness', 'Xixi number of Clusters found', 'Xixi Precision', 'Xixi ARI',
-        'use_combined_context', 'use_frequency', 'window_size', 'distance_metric', 'threshold',
-        'Number of Clusters found',
-        'Precision Align', 'ARI', 'Simplicity', 'Generalization', 'Fitness', 'Runtime']
-
     Path(f'./outputs/{folder_name}').mkdir(parents=True, exist_ok=True)
 
     csv_file_path = Path(f'./results/{folder_name}_{pipeline_variant}_NEW.csv')
     if csv_file_path.is_file():
-        print(csv_file_path)
-        print('Warning: File already existis exiting')
-        return
+        if read_csv_header(csv_file_path) == RESULT_COLUMNS:
+            print(csv_file_path)
+            print('Warning: File already existis exiting')
+            return
+        # Rows with the current columns must not be appended below the header of other columns
+        rotated_path = rotate_result_file(csv_file_path)
+        print(f'Warning: Columns of {csv_file_path} do not match the result columns, moved to {rotated_path}')
 
     with open(f'./results/{folder_name}_{pipeline_variant}_NEW.csv', 'w') as f:
         writer = csv.writer(f)
-        writer.writerow(header)
+        writer.writerow(RESULT_COLUMNS)
 
 
 def run_start_string():
@@ -131,6 +129,33 @@ def export_models_and_pngs(final_marking, initial_marking, net, original_tree, i
                        original_tree)
 
 
+def get_exported_model_paths(suffix) -> List[str]:
+    return [f'./outputs/{suffix}.pnml', f'./outputs/{suffix}.ptml', f'./outputs/{suffix}_tree.png',
+            f'./outputs/{suffix}_net.png']
+
+
+def read_exported_models(suffix) -> Dict[str, bytes]:
+    """
+    :return: Content of the files written by export_models_and_pngs for the suffix, per path
+    """
+    exported_models = {}
+    for path in get_exported_model_paths(suffix):
+        if os.path.isfile(path):
+            with open(path, 'rb') as exported_file:
+                exported_models[path] = exported_file.read()
+    return exported_models
+
+
+def restore_exported_models(exported_models: Dict[str, bytes]) -> None:
+    """
+    Writes the files read by read_exported_models again, e.g., into a new output folder
+    """
+    for path, content in exported_models.items():
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as exported_file:
+            exported_file.write(content)
+
+
 def save_models_as_png(name, final_marking, initial_marking, net, tree):
     gviz = pt_visualizer.apply(tree)
     pt_visualizer.save(gviz,
@@ -1,10 +1,18 @@
 from dataclasses import dataclass, field
-from typing import Iterable
+from typing import Dict, Iterable, Tuple
 
 from igraph import *
 
+from evaluation.baseline_cache import BaselineCache
 from evaluation.golden_standard_model import GoldenStandardModel
+from evaluation.model_cache import ModelCache
+from label_splitter.batched_distance import DEFAULT_MEMORY_BUDGET
+from label_splitter.label_splitter_variant_based import DEFAULT_CPM_RESOLUTION
 from pipeline.pipeline_variant import PipelineVariant
+from utils.log_registry import LogRegistry
+from utils.relabeled_log_exporter import SplitLogExport
+from utils.result_sink import OutputLevel, ResultSink
+from utils.variant_index import VariantIndex
 
 
 @dataclass
@@ -32,8 +40,37 @@ class InputData:
     labels_to_split: Iterable[str] = field(default_factory=list)
     original_labels: Iterable[str] = field(default_factory=list)
     original_log: object = None
+    # Logs imported for this input, shared by all components that read a log file
+    log_registry: LogRegistry = None
+    variant_index: VariantIndex = None
     original_log_precision: float = 0
     original_log_simplicity: float = 0
     original_log_generalization: float = 0
     original_log_fitness: float = 0
     concurrent_labels: Iterable[str] = field(default_factory=list)
+    number_of_workers: int = 1
+    # Number of processes used to replay the variants when evaluating a model
+    conformance_workers: int = 1
+    # Starts the community detection of a threshold from the partition of the previous threshold of the same cell
+    warm_start_leiden: bool = False
+    # Finds the partitions of all thresholds of a cell on one event graph per label, only for the variant-based variant
+    use_threshold_path: bool = False
+    # With frequencies, uses the variant counts as node sizes of a CPM objective instead of self-loops
+    use_node_sizes: bool = False
+    # Resolution of the CPM objective used with node sizes, modularity has no resolution
+    cpm_resolution: float = DEFAULT_CPM_RESOLUTION
+    # Number of processes used to find the communities of the labels to split
+    label_workers: int = 1
+    # Memory budget in bytes for the temporary arrays while building the edges of one label
+    edge_memory_budget: int = DEFAULT_MEMORY_BUDGET
+    # Models and evaluation results of the split logs, shared by all cells of the parameter space
+    model_cache: ModelCache = field(default_factory=ModelCache)
+    # ARI, precision, simplicity, generalization and fitness per partition key of the found clustering
+    partition_results: Dict[str, Tuple[float, float, float, float, float]] = field(default_factory=dict)
+    # Level of detail of the text output and the writers of the outputs of this input
+    output_level: OutputLevel = OutputLevel.VERBOSE
+    result_sink: ResultSink = None
+    # Which split logs are exported for the cells of the parameter space
+    split_log_export: SplitLogExport = SplitLogExport.ALL
+    # Baseline results of the input, persisted across runs if the cache has a folder
+    baseline_cache: BaselineCache = field(default_factory=BaselineCache)
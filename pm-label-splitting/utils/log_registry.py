@@ -0,0 +1,47 @@
+import os
+from typing import Dict
+
+from pm4py.objects.log.importer.xes import importer as xes_importer
+from pm4py.objects.log.obj import EventLog
+
+from utils.columnar_log import load_columnar_log
+
+
+class LogRegistry:
+    """
+    Registry of the event logs imported for one input, so every XES file is parsed only once.
+    All logs are imported with the same maximum number of traces. The logs are shared between the components.
+    The imported logs are not pickled, e.g., when the input data is sent to the workers of a process pool.
+    By default the logs are imported with all attributes by pm4py. With the columnar cache, only the attributes in
+    EVENT_ATTRIBUTES, the timestamp and the case id are imported, from a binary cache next to the log file; all other
+    event and trace attributes are dropped, so it is only suited for runs that use no other attributes.
+    """
+
+    def __init__(self, max_number_of_traces: int = None, use_columnar_cache: bool = False):
+        self.max_number_of_traces = max_number_of_traces
+        self.use_columnar_cache = use_columnar_cache
+        self._logs: Dict[str, EventLog] = {}
+
+    def get_log(self, path: str) -> EventLog:
+        key = os.path.abspath(path)
+        if key not in self._logs and self.use_columnar_cache:
+            self._logs[key] = load_columnar_log(path).to_event_log(self.max_number_of_traces)
+        elif key not in self._logs:
+            parameters = {}
+            if self.max_number_of_traces is not None:
+                parameters[xes_importer.Variants.ITERPARSE.value.Parameters.MAX_TRACES] = self.max_number_of_traces
+            self._logs[key] = xes_importer.apply(path, parameters=parameters)
+        return self._logs[key]
+
+    def __getstate__(self):
+        return {'max_number_of_traces': self.max_number_of_traces, 'use_columnar_cache': self.use_columnar_cache,
+                '_logs': {}}
+
+
+def get_log(path: str, log_registry: LogRegistry = None) -> EventLog:
+    """
+    :return: Log from the registry if given, otherwise a newly imported log
+    """
+    if log_registry is None:
+        return xes_importer.apply(path)
+    return log_registry.get_log(path)
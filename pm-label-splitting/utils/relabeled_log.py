@@ -0,0 +1,77 @@
+from array import array
+from typing import Dict, List
+
+from pm4py.objects.log.obj import EventLog, Trace, Event
+
+
+class RelabeledLog:
+    """
+    Copy-on-write view of an event log with split labels.
+    The original log is never modified, only the new labels are stored as (case index, position, label id) entries.
+    """
+
+    def __init__(self, log: EventLog, activity_key: str = 'concept:name'):
+        self.log = log
+        self.activity_key = activity_key
+        self.labels: List[str] = []
+        self._label_ids: Dict[str, int] = {}
+        self.case_indices = array('q')
+        self.positions = array('i')
+        self.label_ids = array('i')
+
+    def __len__(self) -> int:
+        return len(self.case_indices)
+
+    def set_label(self, case_index: int, position: int, label: str) -> None:
+        """
+        Overrides the label of the event at the position of the case
+        """
+        if label not in self._label_ids:
+            self._label_ids[label] = len(self.labels)
+            self.labels.append(label)
+        self.case_indices.append(case_index)
+        self.positions.append(position)
+        self.label_ids.append(self._label_ids[label])
+
+    def rename_labels(self, label_mapping: Dict[str, str]) -> None:
+        """
+        Renames the new labels, e.g., to merge split labels. Labels not in the mapping are kept.
+        """
+        self.labels = [label_mapping.get(label, label) for label in self.labels]
+        self._label_ids = {}
+        for label_id, label in enumerate(self.labels):
+            self._label_ids.setdefault(label, label_id)
+
+    def get_overrides_by_case(self) -> Dict[int, Dict[int, str]]:
+        """
+        :return: New labels, by case index and position
+        """
+        overrides = {}
+        for case_index, position, label_id in zip(self.case_indices, self.positions, self.label_ids):
+            overrides.setdefault(case_index, {})[position] = self.labels[label_id]
+        return overrides
+
+    def to_event_log(self) -> EventLog:
+        """
+        Materializes the relabeled log, e.g., to export or mine it.
+        Events without a new label are shared with the original log, relabeled events are shallow copies.
+        Traces are always new, so code changing events of the materialized log must replace them in their trace
+        instead of modifying them, as filter_duplicate_xor does. Otherwise the original log is changed as well.
+        """
+        overrides = self.get_overrides_by_case()
+        relabeled_log = EventLog(attributes=self.log.attributes, extensions=self.log.extensions,
+                                 omni_present=self.log.omni_present, classifiers=self.log.classifiers,
+                                 properties=self.log.properties)
+        for case_index, trace in enumerate(self.log):
+            if case_index not in overrides:
+                relabeled_log.append(Trace(trace, attributes=trace.attributes, properties=trace.properties))
+                continue
+            case_overrides = overrides[case_index]
+            events = []
+            for position, event in enumerate(trace):
+                if position in case_overrides:
+                    event = Event(event)
+                    event[self.activity_key] = case_overrides[position]
+                events.append(event)
+            relabeled_log.append(Trace(events, attributes=trace.attributes, properties=trace.properties))
+        return relabeled_log
@@ -0,0 +1,99 @@
+import gzip
+import json
+from enum import Enum
+
+from lxml import etree
+
+from utils.relabeled_log import RelabeledLog
+from utils.variant_index import VariantIndex
+
+
+class SplitLogExport(Enum):
+    """
+    Which split logs are exported for the cells of the parameter space
+    """
+    # XES file of the split log of every cell
+    ALL = 'ALL'
+    # XES file of the split log only if the cell has a new best score
+    BEST = 'BEST'
+    # Mapping of the split labels per variant and position of every cell, instead of a XES file
+    MAPPING = 'MAPPING'
+    NONE = 'NONE'
+
+    def __str__(self):
+        return str(self.value)
+
+
+def export_relabeled_log(relabeled_log: RelabeledLog, source_path: str, output_path: str,
+                         max_number_of_traces: int = None) -> None:
+    """
+    Streams the original XES file to the output file and replaces the labels of the relabeled events on the way.
+    Only one trace is held in memory at a time, all other attributes are written as in the original file.
+    As for the import, only the first max_number_of_traces traces are written.
+    """
+    overrides = relabeled_log.get_overrides_by_case()
+    source_opener = gzip.open if source_path.endswith('.gz') else open
+    output_opener = gzip.open if output_path.endswith('.gz') else open
+
+    with source_opener(source_path, 'rb') as source_file, output_opener(output_path, 'wb') as output_file:
+        context = etree.iterparse(source_file, events=('start', 'end'))
+        _, root = next(context)
+        with etree.xmlfile(output_file, encoding='utf-8') as xml_file:
+            xml_file.write_declaration()
+            with xml_file.element(root.tag, dict(root.attrib), nsmap=root.nsmap):
+                depth = 1
+                case_index = 0
+                for event, element in context:
+                    if event == 'start':
+                        depth += 1
+                        continue
+                    depth -= 1
+                    if depth != 1:
+                        continue
+                    if etree.QName(element).localname == 'trace':
+                        if max_number_of_traces is None or case_index < max_number_of_traces:
+                            if case_index in overrides:
+                                _relabel_trace(element, overrides[case_index], relabeled_log.activity_key)
+                            xml_file.write(element)
+                        case_index += 1
+                    else:
+                        xml_file.write(element)
+                    # Children of the log are written once they are complete and then dropped
+                    root.remove(element)
+
+
+def _relabel_trace(trace, case_overrides, activity_key: str) -> None:
+    events = [element for element in trace if etree.QName(element).localname == 'event']
+    for position, label in case_overrides.items():
+        for attribute in events[position]:
+            if attribute.get('key') == activity_key:
+                attribute.set('value', label)
+                break
+
+
+def export_label_mapping(relabeled_log: RelabeledLog, variant_index: VariantIndex, output_path: str) -> None:
+    """
+    Exports the split labels as mapping instead of the whole log.
+    The labels of the representative case are stored per variant and position, only cases that differ from their
+    variant, e.g., for the event-based splitting, are stored per case and position.
+    """
+    overrides = relabeled_log.get_overrides_by_case()
+    representative_cases = variant_index.representative_cases.tolist()
+    variant_labels = {}
+    for variant_id, case_index in enumerate(representative_cases):
+        if case_index in overrides:
+            variant_labels[variant_id] = overrides[case_index]
+
+    case_labels = {}
+    for case_index, variant_id in enumerate(variant_index.case_variants.tolist()):
+        if case_index != representative_cases[variant_id] \
+                and overrides.get(case_index, {}) != variant_labels.get(variant_id, {}):
+            case_labels[case_index] = overrides.get(case_index, {})
+
+    mapping = {'activity_key': relabeled_log.activity_key,
+               'variants': [list(variant) for variant in variant_index.variants],
+               'variant_labels': variant_labels,
+               'case_labels': case_labels}
+    opener = gzip.open if output_path.endswith('.gz') else open
+    with opener(output_path, 'wt') as outfile:
+        json.dump(mapping, outfile)
@@ -0,0 +1,170 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from enum import IntEnum
+from pathlib import Path
+from typing import List, TextIO, Tuple
+
+RESULT_COLUMNS = [
+    'Name', 'max_number_of_traces', 'labels_to_split', 'original labels', 'original_precision',
+    'original_simplicity',
+    'original_generalization', 'original_fitness', 'Xixi number of Clusters found', 'Xixi Precision', 'Xixi ARI',
+    'use_combined_context', 'use_frequency', 'window_size', 'distance_metric', 'threshold',
+    'Number of Clusters found',
+    'Precision Align', 'ARI', 'Simplicity', 'Generalization', 'Fitness', 'Runtime', 'Partition cache hit']
+DEFAULT_BATCH_SIZE = 64
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+
+def read_csv_header(csv_path: str) -> List[str]:
+    """
+    :return: First row of the CSV file, empty if the file is empty
+    """
+    with open(csv_path, newline='') as csv_file:
+        return next(csv.reader(csv_file), [])
+
+
+def rotate_result_file(csv_path: str) -> str:
+    """
+    Moves a results file aside, e.g., one written with other result columns, so that no rows with the current columns
+    are appended to it.
+    :return: Path of the moved file
+    """
+    path = Path(csv_path)
+    rotated_path = path.with_name(f'{path.stem}_{datetime.now():%Y%m%d%H%M%S}{path.suffix}')
+    os.replace(path, rotated_path)
+    return str(rotated_path)
+
+
+class OutputLevel(IntEnum):
+    """
+    Level of detail of the text output. Entries of a higher level than the level of the sink are not written.
+    """
+    DEFAULT = 1
+    # Also writes the found partitions of every configuration
+    VERBOSE = 2
+
+
+class ResultSink:
+    """
+    Writers of the outputs of one input: the text output, the results CSV and the results as JSON lines.
+    The files are opened once and kept open with a large buffer until the sink is closed, result records are
+    collected and appended to the CSV and JSON lines files in batches. An existing CSV file with other columns than
+    RESULT_COLUMNS is moved aside before the first batch is appended.
+    A sink without paths keeps everything in memory, e.g., in the workers of a process pool. The workers return their
+    buffered output, which the parent process appends to its sink in order, so only one process writes the files.
+    """
+
+    def __init__(self, output_path: str = None, csv_path: str = None, jsonl_path: str = None,
+                 output_level: OutputLevel = OutputLevel.VERBOSE, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.output_path = output_path
+        self.csv_path = csv_path
+        self.jsonl_path = jsonl_path
+        self.output_level = output_level
+        self.batch_size = batch_size
+        self._outfile = None
+        self._records: List[list] = []
+        self._partition_keys: List[str] = []
+        self._csv_header_checked = False
+
+    @property
+    def outfile(self) -> TextIO:
+        """
+        :return: Text output, opened on first use
+        """
+        if self._outfile is None:
+            self._outfile = io.StringIO() if self.output_path is None \
+                else open(self.output_path, 'a', buffering=OUTPUT_BUFFER_SIZE)
+        return self._outfile
+
+    def is_enabled(self, level: OutputLevel) -> bool:
+        return level <= self.output_level
+
+    def write(self, text: str, level: OutputLevel = OutputLevel.DEFAULT) -> None:
+        if self.is_enabled(level):
+            self.outfile.write(text)
+
+    def write_record(self, record: list, partition_key: str = None) -> None:
+        """
+        Adds a result row with the values of RESULT_COLUMNS. The rows are written once a batch is complete.
+
+        :param partition_key: key of the partition the row was found for, kept with the buffered rows
+        """
+        self._records.append(record)
+        self._partition_keys.append(partition_key)
+        if self.csv_path is not None and len(self._records) >= self.batch_size:
+            self._write_records()
+
+    def write_buffered(self, output: str, records: List[list]) -> None:
+        """
+        Appends the output and result records buffered by another sink
+        """
+        for record in records:
+            if len(record) != len(RESULT_COLUMNS):
+                raise ValueError(f'Buffered result record has {len(record)} values, expected one per result column '
+                                 f'({len(RESULT_COLUMNS)})')
+        self.outfile.write(output)
+        for record in records:
+            self.write_record(record)
+
+    def get_buffered(self) -> Tuple[str, List[list]]:
+        """
+        :return: Output and result records of an in-memory sink
+        """
+        return self.outfile.getvalue(), self._records
+
+    def get_partition_keys(self) -> List[str]:
+        """
+        :return: Partition key of every buffered result record
+        """
+        return self._partition_keys
+
+    def flush(self) -> None:
+        self._write_records()
+        if self._outfile is not None:
+            self._outfile.flush()
+
+    def close(self) -> None:
+        self.flush()
+        if self._outfile is not None and self.output_path is not None:
+            self._outfile.close()
+            self._outfile = None
+
+    def _write_records(self) -> None:
+        if self.csv_path is None or not self._records:
+            return
+        self._check_csv_header()
+        with open(self.csv_path, 'a', newline='') as csv_file:
+            csv.writer(csv_file).writerows(self._records)
+        if self.jsonl_path is not None:
+            with open(self.jsonl_path, 'a') as jsonl_file:
+                for record in self._records:
+                    jsonl_file.write(f'{json.dumps(dict(zip(RESULT_COLUMNS, record)), default=str)}\n')
+        self._records = []
+        self._partition_keys = []
+
+    def _check_csv_header(self) -> None:
+        """
+        Writes the header of a new CSV file, or of a file whose header does not match RESULT_COLUMNS after moving that
+        file aside
+        """
+        if self._csv_header_checked:
+            return
+        self._csv_header_checked = True
+        if os.path.isfile(self.csv_path) and os.path.getsize(self.csv_path) > 0:
+            if read_csv_header(self.csv_path) == RESULT_COLUMNS:
+                return
+            rotated_path = rotate_result_file(self.csv_path)
+            print(f'Warning: Columns of {self.csv_path} do not match the result columns, moved to {rotated_path}')
+        with open(self.csv_path, 'w', newline='') as csv_file:
+            csv.writer(csv_file).writerow(RESULT_COLUMNS)
+
+    def __getstate__(self):
+        # Open files and pending records stay with the process that owns the sink
+        state = self.__dict__.copy()
+        state['_outfile'] = None
+        state['_records'] = []
+        state['_partition_keys'] = []
+        return state
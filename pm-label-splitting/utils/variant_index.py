@@ -0,0 +1,58 @@
+from typing import Iterator, List, Tuple
+
+import numpy as np
+from pm4py.objects.log.obj import EventLog, Trace
+
+
+class VariantIndex:
+    """
+    Index of the variants of an event log, built in one pass over the log.
+    Variants are numbered in the order of their first occurrence, i.e., the order of variants_filter.get_variants,
+    and the representative case of a variant is its first case, i.e., variants_filter.apply(log, [variant])[0].
+    """
+
+    def __init__(self, log: EventLog, variants: List[Tuple[str, ...]], case_variants: np.ndarray,
+                 variant_counts: np.ndarray, representative_cases: np.ndarray):
+        self.log = log
+        self.variants = variants
+        self.case_variants = case_variants
+        self.variant_counts = variant_counts
+        self.representative_cases = representative_cases
+
+    def __len__(self) -> int:
+        return len(self.variants)
+
+    def get_cases(self, variant_id: int) -> np.ndarray:
+        """
+        :return: Indices of all cases of the variant, in log order
+        """
+        return np.nonzero(self.case_variants == variant_id)[0]
+
+    def get_representative_traces(self) -> Iterator[Tuple[Trace, int]]:
+        """
+        :return: Representative trace and number of cases of every variant, in the order of the variants
+        """
+        for case_index, count in zip(self.representative_cases.tolist(), self.variant_counts.tolist()):
+            yield self.log[case_index], count
+
+
+def get_variant_index(log: EventLog, activity_key: str = 'concept:name') -> VariantIndex:
+    variant_ids = {}
+    case_variants = []
+    variant_counts = []
+    representative_cases = []
+
+    for case_index, trace in enumerate(log):
+        variant = tuple(event[activity_key] for event in trace)
+        if variant not in variant_ids:
+            variant_ids[variant] = len(variant_ids)
+            variant_counts.append(0)
+            representative_cases.append(case_index)
+        variant_counts[variant_ids[variant]] += 1
+        case_variants.append(variant_ids[variant])
+
+    return VariantIndex(log,
+                        list(variant_ids.keys()),
+                        np.array(case_variants, dtype=np.int32),
+                        np.array(variant_counts, dtype=np.int64),
+                        np.array(representative_cases, dtype=np.int64))